@@ -0,0 +1,22 @@
+"""
+Backend de autenticación que carga el perfil junto con el usuario.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth import get_user_model
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend que obtiene el usuario de la sesión con su perfil en la
+    misma consulta, de modo que las comprobaciones de rol
+    (request.user.profile.is_admin) no consultan la base de datos en cada
+    request y siempre reflejan el rol vigente.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
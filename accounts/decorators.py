@@ -2,6 +2,8 @@ from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
 
+from .models import user_is_admin
+
 
 def admin_required(view_func):
     """
@@ -13,7 +15,7 @@ def admin_required(view_func):
             messages.error(request, 'Debes iniciar sesión para acceder a esta página.')
             return redirect('accounts:login')
         
-        if not hasattr(request.user, 'profile') or not request.user.profile.is_admin:
+        if not user_is_admin(request.user):
             messages.error(request, 'No tienes permisos para acceder a esta página.')
             return redirect('dashboard:dashboard')
         
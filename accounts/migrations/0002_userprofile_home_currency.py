@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:00
+
+import transactions.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='home_currency',
+            field=models.CharField(choices=[('COP', 'Peso colombiano'), ('USD', 'Dólar estadounidense'), ('EUR', 'Euro'), ('MXN', 'Peso mexicano'), ('ARS', 'Peso argentino'), ('CLP', 'Peso chileno'), ('PEN', 'Sol peruano'), ('BRL', 'Real brasileño'), ('GBP', 'Libra esterlina')], default=transactions.models.default_currency, max_length=3, verbose_name='Moneda principal'),
+        ),
+    ]
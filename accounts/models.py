@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from transactions.models import currency_field
+
 
 class UserProfile(models.Model):
     """
@@ -20,6 +22,7 @@ class UserProfile(models.Model):
         default='user',
         verbose_name="Rol"
     )
+    home_currency = currency_field(verbose_name="Moneda principal")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
     
@@ -41,11 +44,27 @@ class UserProfile(models.Model):
         return self.role == 'user'
 
 
+def user_is_admin(user):
+    """
+    True si el usuario autenticado tiene rol de administrador.
+    Usa el perfil ya cargado con el usuario (ver accounts.backends), sin consultas extra.
+    """
+    if not user.is_authenticated:
+        return False
+    try:
+        return user.profile.is_admin
+    except UserProfile.DoesNotExist:
+        return False
+
+
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, raw=False, update_fields=None, **kwargs):
     """
     Crea automáticamente un perfil y categorías por defecto cuando se crea un usuario.
     """
+    if raw:
+        return
+    
     if created:
         UserProfile.objects.create(user=instance)
         
@@ -58,14 +77,16 @@ def create_user_profile(sender, instance, created, **kwargs):
             import logging
             logger = logging.getLogger(__name__)
             logger.warning(f"No se pudieron crear categorías por defecto para {instance.username}: {e}")
-
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """
-    Guarda el perfil cuando se guarda el usuario.
-    """
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+        return
+    
+    # Los guardados parciales (p. ej. last_login al iniciar sesión) no tocan el perfil
+    if update_fields is not None:
+        return
+    
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None:
+        # Perfil cargado y quizá modificado junto con el usuario (user.profile.role = ...; user.save())
+        profile.save()
     else:
-        UserProfile.objects.create(user=instance)
+        # Usuarios creados antes de existir los perfiles
+        UserProfile.objects.get_or_create(user=instance)
@@ -1,3 +1,143 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.urls import reverse
 
-# Create your tests here.
+from finance import request_metrics
+from .models import UserProfile
+from transactions.models import Category
+
+
+class RequestMetricsTest(TestCase):
+    """
+    Pruebas del middleware de métricas por request y del ranking de endpoints.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        request_metrics.reset()
+        self.admin = User.objects.create_user(username='adminuser', password='testpass123')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.client.login(username='adminuser', password='testpass123')
+    
+    def test_server_timing_header_and_history(self):
+        """Cada request publica Server-Timing y queda en el historial."""
+        response = self.client.get(reverse('transactions:category_list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas", total;dur=[\d.]+$')
+        
+        ranking = request_metrics.top_endpoints()
+        self.assertEqual(ranking[0]['endpoint'], 'GET transactions:category_list')
+        self.assertEqual(ranking[0]['requests'], 1)
+        self.assertGreater(ranking[0]['avg_queries'], 0)
+    
+    def test_server_timing_hidden_from_regular_users(self):
+        """Un usuario común no recibe Server-Timing salvo con DEBUG, pero se mide igual."""
+        User.objects.create_user(username='regular', password='testpass123')
+        self.client.login(username='regular', password='testpass123')
+
+        response = self.client.get(reverse('transactions:category_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_metrics.top_endpoints()[0]['requests'], 1)
+
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('transactions:category_list'))
+        self.assertIn('Server-Timing', response)
+
+    def test_async_middleware(self):
+        """En una cadena async el middleware es una corrutina y mide las consultas ORM."""
+        async def async_view(request):
+            await sync_to_async(list)(Category.objects.all())
+            return HttpResponse('ok')
+
+        middleware = request_metrics.RequestMetricsMiddleware(async_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/async/')
+        request.user = self.admin
+
+        response = async_to_sync(middleware)(request)
+
+        self.assertRegex(response['Server-Timing'], r'desc="1 consultas"')
+        self.assertEqual(request_metrics.top_endpoints()[0]['endpoint'], 'GET /async/')
+
+    @override_settings(REQUEST_METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_query_warns_n_plus_one(self):
+        """Una consulta repetida más veces que el umbral se reporta como N+1."""
+        def view_with_n_plus_one(request):
+            for category in Category.objects.filter(user=self.admin):
+                list(category.transactions.all())
+            return HttpResponse('ok')
+        
+        middleware = request_metrics.RequestMetricsMiddleware(view_with_n_plus_one)
+        with self.assertLogs('finance.request_metrics', level='WARNING') as logs:
+            middleware(RequestFactory().get('/lento/'))
+        self.assertIn('Posible N+1 en GET /lento/', logs.output[0])
+        self.assertIn('consulta repetida', logs.output[0])
+        
+        ranking = request_metrics.top_endpoints()
+        self.assertEqual(ranking[0]['n_plus_one'], 1)
+        self.assertGreater(ranking[0]['max_queries'], 3)
+    
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled(self):
+        """Con la medición desactivada no se agrega cabecera ni historial."""
+        response = self.client.get(reverse('transactions:category_list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_metrics.top_endpoints(), [])
+    
+    def test_admin_page_lists_endpoints(self):
+        """La página de rendimiento muestra el ranking solo a administradores."""
+        self.client.get(reverse('transactions:category_list'))
+        response = self.client.get(reverse('accounts:request_metrics'), {'order': 'avg_queries'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'GET transactions:category_list')
+        self.assertIn('circuit_breakers', response.context)
+        
+        User.objects.create_user(username='regular', password='testpass123')
+        self.client.login(username='regular', password='testpass123')
+        response = self.client.get(reverse('accounts:request_metrics'))
+        self.assertRedirects(response, reverse('dashboard:dashboard'), fetch_redirect_response=False)
+
+
+class ProfileHandlingTest(TestCase):
+    """
+    Pruebas del manejo del perfil y del rol sin consultas extra.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='roluser', password='testpass123')
+    
+    def test_partial_user_save_skips_profile(self):
+        """Actualizar last_login (cada inicio de sesión) es un único UPDATE."""
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['last_login'])
+    
+    def test_full_save_persists_loaded_profile(self):
+        """Un guardado completo sigue guardando el perfil modificado junto al usuario."""
+        self.user.profile.role = 'admin'
+        self.user.save()
+        self.assertEqual(UserProfile.objects.get(user=self.user).role, 'admin')
+    
+    def test_role_checks_do_not_query_profile(self):
+        """El perfil llega con el usuario de la sesión y el cambio de rol aplica al instante."""
+        self.client.login(username='roluser', password='testpass123')
+        with self.assertNumQueries(2):  # sesión y usuario con su perfil
+            response = self.client.get(reverse('accounts:user_list'))
+        self.assertRedirects(response, reverse('dashboard:dashboard'), fetch_redirect_response=False)
+        
+        UserProfile.objects.filter(user=self.user).update(role='admin')
+        response = self.client.get(reverse('accounts:user_list'))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_existing_model_backend_sessions_stay_logged_in(self):
+        """Las sesiones iniciadas con ModelBackend antes del cambio siguen siendo válidas."""
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('accounts:profile'))
+        self.assertEqual(response.status_code, 200)
+        
+        self.client.login(username='roluser', password='testpass123')
+        self.assertEqual(
+            self.client.session['_auth_user_backend'], 'accounts.backends.ProfileModelBackend'
+        )
@@ -14,6 +14,7 @@ urlpatterns = [
     
     # Rutas de administración
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/performance/', views.request_metrics_view, name='request_metrics'),
     path('admin/users/', views.UserListView.as_view(), name='user_list'),
     path('admin/users/<int:pk>/update/', views.UserUpdateView.as_view(), name='user_update'),
     path('admin/users/<int:user_id>/update-role/', views.update_user_role, name='update_user_role'),
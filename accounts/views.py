@@ -7,14 +7,19 @@ from django.contrib.auth.models import User
 from django.db import transaction, models
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.views.generic import ListView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.utils.translation import activate
 from django.conf import settings
 
-from .models import UserProfile
+from finance import http_client, request_metrics
+from transactions import aggregate_cache
+from transactions.currency import CURRENCY_CODES, CurrencyConverter
+from transactions.models import CURRENCY_CHOICES, default_currency
+
+from .models import UserProfile, user_is_admin
 from .decorators import admin_required
 
 
@@ -71,7 +76,13 @@ def profile(request):
     Vista para mostrar y editar el perfil del usuario.
     """
     if request.method == 'POST':
-        # Aquí se podría agregar lógica para actualizar el perfil
+        home_currency = request.POST.get('home_currency')
+        if home_currency:
+            if home_currency not in CURRENCY_CODES:
+                messages.error(request, 'Moneda no soportada.')
+                return redirect('accounts:profile')
+            request.user.profile.home_currency = home_currency
+            request.user.profile.save(update_fields=['home_currency', 'updated_at'])
         messages.success(request, 'Perfil actualizado exitosamente.')
         return redirect('accounts:profile')
     
@@ -81,8 +92,10 @@ def profile(request):
     
     user = request.user
     
-    # Estadísticas generales
-    total_transactions = Transaction.objects.filter(user=user).count()
+    # Estadísticas generales (en caché hasta que cambien los datos del usuario)
+    total_transactions = aggregate_cache.memoize(
+        user.id, 'transaction_count', lambda: Transaction.objects.filter(user=user).count()
+    )
     
     # Última actividad
     last_transaction = Transaction.objects.filter(user=user).order_by('-created_at').first()
@@ -91,6 +104,7 @@ def profile(request):
         'total_transactions': total_transactions,
         'last_transaction': last_transaction,
         'member_since': user.date_joined,
+        'currency_choices': CURRENCY_CHOICES,
     }
     
     return render(request, 'accounts/profile.html', context)
@@ -133,15 +147,14 @@ def admin_dashboard(request):
     # Usuarios recientes
     recent_users = User.objects.order_by('-date_joined')[:5]
     
-    # Estadísticas de transacciones
-    from transactions.models import Transaction
-    total_transactions = Transaction.objects.count()
-    total_income = Transaction.objects.filter(transaction_type='income').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    total_expenses = Transaction.objects.filter(transaction_type='expense').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Estadísticas de transacciones de todos los usuarios (en caché bajo la versión global)
+    converter = CurrencyConverter(default_currency())
+    transaction_stats = aggregate_cache.memoize(
+        None, f'admin_transaction_stats:{converter.cache_tag}', lambda: _global_transaction_stats(converter)
+    )
+    total_transactions = transaction_stats['total_transactions']
+    total_income = transaction_stats['total_income']
+    total_expenses = transaction_stats['total_expenses']
     
     context = {
         'total_users': total_users,
@@ -151,11 +164,47 @@ def admin_dashboard(request):
         'total_transactions': total_transactions,
         'total_income': total_income,
         'total_expenses': total_expenses,
+        'aggregate_cache_stats': aggregate_cache.stats(),
     }
     
     return render(request, 'accounts/admin_dashboard.html', context)
 
 
+@admin_required
+def request_metrics_view(request):
+    """
+    Ranking de los endpoints más costosos (consultas SQL y tiempo de
+    respuesta) entre los requests recientes de este proceso, y estado de
+    los circuit breakers de los servicios externos.
+    """
+    order = request.GET.get('order', 'total_ms')
+    if order not in request_metrics.ORDERINGS:
+        order = 'total_ms'
+    
+    context = {
+        'endpoints': request_metrics.top_endpoints(order=order),
+        'order': order,
+        'orderings': request_metrics.ORDERINGS,
+        'n_plus_one_threshold': getattr(
+            settings, 'REQUEST_METRICS_N_PLUS_ONE_THRESHOLD', request_metrics.DEFAULT_N_PLUS_ONE_THRESHOLD
+        ),
+        'metrics_enabled': getattr(settings, 'REQUEST_METRICS_ENABLED', True),
+        'circuit_breakers': http_client.metrics(),
+    }
+    return render(request, 'accounts/request_metrics.html', context)
+
+
+def _global_transaction_stats(converter=None):
+    """Calcula los totales de transacciones de todos los usuarios (convertidos con `converter`)."""
+    from transactions.models import Transaction
+    totals = Transaction.objects.totals(converter)
+    return {
+        'total_transactions': totals['count'],
+        'total_income': totals['income'],
+        'total_expenses': totals['expense'],
+    }
+
+
 class UserListView(LoginRequiredMixin, ListView):
     """
     Vista para listar todos los usuarios (solo administradores).
@@ -170,7 +219,7 @@ class UserListView(LoginRequiredMixin, ListView):
             messages.error(request, 'Debes iniciar sesión para acceder a esta página.')
             return redirect('accounts:login')
         
-        if not hasattr(request.user, 'profile') or not request.user.profile.is_admin:
+        if not user_is_admin(request.user):
             messages.error(request, 'No tienes permisos para acceder a esta página.')
             return redirect('dashboard:dashboard')
         
@@ -212,9 +261,7 @@ class UserUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     success_url = reverse_lazy('accounts:user_list')
     
     def test_func(self):
-        return (self.request.user.is_authenticated and 
-                hasattr(self.request.user, 'profile') and 
-                self.request.user.profile.is_admin)
+        return user_is_admin(self.request.user)
     
     def form_valid(self, form):
         messages.success(self.request, 'Usuario actualizado exitosamente.')
@@ -259,7 +306,7 @@ def toggle_user_status(request, user_id):
         return redirect('accounts:user_list')
     
     user.is_active = not user.is_active
-    user.save()
+    user.save(update_fields=['is_active'])
     
     status = 'activado' if user.is_active else 'desactivado'
     messages.success(request, f'Usuario {user.username} {status} exitosamente.')
@@ -276,9 +323,7 @@ class UserDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     success_url = reverse_lazy('accounts:user_list')
     
     def test_func(self):
-        return (self.request.user.is_authenticated and 
-                hasattr(self.request.user, 'profile') and 
-                self.request.user.profile.is_admin)
+        return user_is_admin(self.request.user)
     
     def delete(self, request, *args, **kwargs):
         user = self.get_object()
@@ -1,6 +1,7 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.views import redirect_to_login
 from django.views.generic import TemplateView
 from django.db.models import Sum, Count
 from django.utils import timezone
@@ -8,52 +9,59 @@ from datetime import datetime, timedelta
 import json
 from django.http import JsonResponse
 
-from transactions.models import Transaction, Category, Budget, SavingsGoal, RecurringTransaction
-from transactions.services import ExchangeRateService, FreeWeatherService
+from transactions.models import Transaction, Category, Budget, SavingsGoal, RecurringTransaction, MonthlyRollup
+from transactions.rollups import chart_data_from_rollups
+from transactions import aggregate_cache, async_services, recurrence
+from transactions.currency import CurrencyConverter
 
+# Días hacia adelante que cubre el widget de recurrencias próximas
+UPCOMING_RECURRING_DAYS = 30
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+# Ciudad del widget de clima
+WEATHER_CITY = "Medellin"
+
+
+class DashboardView(TemplateView):
     """
     Vista principal del dashboard con estadísticas y gráficos.
+    
+    Es asíncrona: clima y tipos de cambio se consultan a la vez con
+    async_services (con un plazo común) y las consultas a la base de datos
+    corren en un hilo con sync_to_async. Bajo ASGI se ejecuta en el event
+    loop; bajo WSGI Django la adapta con async_to_sync.
     """
     template_name = 'dashboard/dashboard.html'
     
+    async def dispatch(self, request, *args, **kwargs):
+        # Equivalente asíncrono de LoginRequiredMixin (request.user es perezoso y síncrono)
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super().dispatch(request, *args, **kwargs)
+    
+    async def get(self, request, *args, **kwargs):
+        external = await async_services.fetch_dashboard_data(WEATHER_CITY)
+        context = await sync_to_async(self.get_context_data)(
+            weather_data=external['weather_data'],
+            usd_to_cop=external['usd_to_cop'],
+            **kwargs
+        )
+        return self.render_to_response(context)
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         
-        # Estadísticas generales
-        total_income = Transaction.objects.filter(
-            user=user, 
-            transaction_type='income'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Montos agregados en la moneda principal del usuario, con las tasas vigentes
+        converter = CurrencyConverter.for_user(user)
         
-        total_expenses = Transaction.objects.filter(
-            user=user, 
-            transaction_type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        balance = total_income - total_expenses
-        
-        # Estadísticas del mes actual
+        # Estadísticas generales y del mes actual (en caché hasta que cambien los datos del usuario)
         current_month = timezone.now().date().replace(day=1)
-        next_month = (current_month.replace(day=28) + timedelta(days=4)).replace(day=1)
-        
-        month_income = Transaction.objects.filter(
-            user=user,
-            transaction_type='income',
-            date__gte=current_month,
-            date__lt=next_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        month_expenses = Transaction.objects.filter(
-            user=user,
-            transaction_type='expense',
-            date__gte=current_month,
-            date__lt=next_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        month_balance = month_income - month_expenses
+        stats = aggregate_cache.memoize(
+            user.id,
+            f"dashboard_stats:{current_month:%Y-%m}:{converter.cache_tag}",
+            lambda: self.get_stats(user, current_month, converter)
+        )
         
         # Transacciones recientes
         recent_transactions = Transaction.objects.filter(
@@ -61,11 +69,10 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         ).select_related('category').prefetch_related('tags').order_by('-date', '-created_at')[:10]
         
         # Presupuestos del mes actual
-        current_month = timezone.now().date().replace(day=1)
         current_budgets = Budget.objects.filter(
             user=user,
             month=current_month
-        ).select_related('category')
+        ).select_related('category').with_spending(converter.rates)
         
         # Metas de ahorro activas
         active_savings_goals = SavingsGoal.objects.filter(
@@ -73,99 +80,85 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             is_achieved=False
         ).order_by('target_date')[:5]
         
-        # Transacciones recurrentes próximas
-        upcoming_recurring = RecurringTransaction.objects.filter(
-            user=user,
-            is_active=True
-        ).select_related('category').order_by('next_occurrence')[:5]
-        
-        # Gastos por categoría del mes
-        category_expenses = Transaction.objects.filter(
-            user=user,
-            transaction_type='expense',
-            date__gte=current_month,
-            date__lt=next_month,
-            category__isnull=False
-        ).values('category__name', 'category__color').annotate(
-            total=Sum('amount')
-        ).order_by('-total')[:10]
+        # Próximas ocurrencias de transacciones recurrentes (incluye las vencidas)
+        upcoming_recurring = recurrence.upcoming(
+            RecurringTransaction.objects.filter(user=user, is_active=True).select_related('category'),
+            until=timezone.now().date() + timedelta(days=UPCOMING_RECURRING_DAYS),
+            limit=5,
+        )
         
         # Datos para gráficos
-        chart_data = self.get_chart_data(user)
+        chart_data = aggregate_cache.memoize(
+            user.id,
+            f"dashboard_chart:{timezone.now().date().isoformat()}:{converter.cache_tag}",
+            lambda: self.get_chart_data(user, converter)
+        )
         
         from django.utils import timezone as tz
         today = tz.now().date()
         
-        # Obtener información de servicios externos
-        weather_data = FreeWeatherService.get_weather_simple("Medellin")
-        exchange_rates = ExchangeRateService.get_exchange_rates()
-        usd_to_cop = ExchangeRateService.get_currency_rate('COP') if exchange_rates else None
-        
+        context.update(stats)
         context.update({
-            'total_income': total_income,
-            'total_expenses': total_expenses,
-            'balance': balance,
-            'month_income': month_income,
-            'month_expenses': month_expenses,
-            'month_balance': month_balance,
             'recent_transactions': recent_transactions,
             'current_budgets': current_budgets,
             'active_savings_goals': active_savings_goals,
             'upcoming_recurring': upcoming_recurring,
-            'category_expenses': category_expenses,
             'chart_data': json.dumps(chart_data),
+            'home_currency': converter.target,
+            'unconvertible_currencies': converter.unconvertible,
             'today': today,
-            'weather_data': weather_data,
-            'usd_to_cop': usd_to_cop,
         })
         
         return context
     
-    def get_chart_data(self, user):
+    def get_stats(self, user, current_month, converter=None):
+        """
+        Calcula los totales generales, los del mes y los gastos por categoría
+        del mes desde los acumulados mensuales (convertidos con `converter`).
+        """
+        rollups = MonthlyRollup.objects.filter(user=user)
+        totals = rollups.totals(converter)
+        month_totals = rollups.filter(month=current_month).totals(converter)
+        
+        # Gastos por categoría del mes
+        category_expenses = list(rollups.filter(
+            transaction_type='expense',
+            month=current_month,
+            category__isnull=False
+        ).values('category__name', 'category__color').annotate(
+            total=Sum(converter.expression('total') if converter else 'total')
+        ).order_by('-total')[:10])
+        
+        return {
+            'total_income': totals['income'],
+            'total_expenses': totals['expense'],
+            'balance': totals['balance'],
+            'month_income': month_totals['income'],
+            'month_expenses': month_totals['expense'],
+            'month_balance': month_totals['balance'],
+            'category_expenses': category_expenses,
+            # Transacciones que quedaron fuera de los totales por no tener tasa
+            'unconverted_count': totals.get('unconverted', 0),
+        }
+    
+    def get_chart_data(self, user, converter=None):
         """
         Genera datos para los gráficos del dashboard.
         """
         # Obtener datos de los últimos 6 meses
         end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=180)
+        start_month = (end_date - timedelta(days=180)).replace(day=1)
         
-        transactions = Transaction.objects.filter(
+        rollups = MonthlyRollup.objects.filter(
             user=user,
-            date__gte=start_date,
-            date__lte=end_date
-        ).select_related('category')
-        
-        # Datos para gráfico de línea (ingresos vs gastos por mes)
-        monthly_data = {}
-        for transaction in transactions:
-            month_key = transaction.date.strftime('%Y-%m')
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {'income': 0, 'expense': 0}
-            
-            if transaction.transaction_type == 'income':
-                monthly_data[month_key]['income'] += float(transaction.amount)
-            else:
-                monthly_data[month_key]['expense'] += float(transaction.amount)
-        
-        # Datos para gráfico de torta (gastos por categoría - TODOS los meses, no solo el actual)
-        # Obtener todos los gastos con categoría de los últimos 6 meses
-        category_data = {}
-        category_expenses_qs = Transaction.objects.filter(
-            user=user,
-            transaction_type='expense',
-            date__gte=start_date,
-            date__lte=end_date,
-            category__isnull=False
-        ).select_related('category')
+            month__gte=start_month,
+            month__lte=end_date
+        )
         
-        for transaction in category_expenses_qs:
-            cat_name = transaction.category.name
-            if cat_name not in category_data:
-                category_data[cat_name] = {
-                    'amount': 0,
-                    'color': transaction.category.color
-                }
-            category_data[cat_name]['amount'] += float(transaction.amount)
+        # Serie mensual (ingresos vs gastos) y gastos por categoría en una sola consulta
+        chart_data = chart_data_from_rollups(rollups, converter)
+        monthly_data = chart_data['monthly_data']
+        category_data = chart_data['category_data']
         
         # Convertir category_data a formato simple para el gráfico
         category_expenses = {}
@@ -188,24 +181,19 @@ def dashboard_stats_api(request):
     
     # Estadísticas del mes actual
     current_month = timezone.now().date().replace(day=1)
-    next_month = (current_month.replace(day=28) + timedelta(days=4)).replace(day=1)
-    
-    month_income = Transaction.objects.filter(
-        user=user,
-        transaction_type='income',
-        date__gte=current_month,
-        date__lt=next_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    converter = CurrencyConverter.for_user(user)
     
-    month_expenses = Transaction.objects.filter(
-        user=user,
-        transaction_type='expense',
-        date__gte=current_month,
-        date__lt=next_month
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    month_totals = aggregate_cache.memoize(
+        user.id,
+        f"month_totals:{current_month:%Y-%m}:{converter.cache_tag}",
+        lambda: MonthlyRollup.objects.filter(user=user, month=current_month).totals(converter)
+    )
+    month_income = month_totals['income']
+    month_expenses = month_totals['expense']
     
     return JsonResponse({
         'month_income': float(month_income),
         'month_expenses': float(month_expenses),
         'month_balance': float(month_income - month_expenses),
+        'currency': converter.target,
     })
@@ -3,6 +3,10 @@ ASGI config for finance project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served through ASGI (e.g. ``uvicorn finance.asgi:application``), async views
+such as the dashboard run on the event loop, so their concurrent calls to
+external services don't hold a worker thread while they wait.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
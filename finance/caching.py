@@ -0,0 +1,111 @@
+"""
+Configuración de la caché compartida.
+
+build_caches() arma CACHES a partir del entorno, para que todos los workers
+compartan la misma caché (tipos de cambio, clima, agregados, locks de
+service_cache) en lugar de una LocMemCache por proceso:
+
+- CACHE_BACKEND=redis (o solo REDIS_URL): RedisCache de Django contra
+  REDIS_URL, con timeouts de socket cortos para no colgar los requests.
+- CACHE_BACKEND=file: FileBasedCache en CACHE_LOCATION (compartida entre
+  los workers de un mismo host).
+- CACHE_BACKEND=database: DatabaseCache en la tabla CACHE_LOCATION (crearla
+  con `python manage.py createcachetable`).
+- CACHE_BACKEND=locmem (por defecto): caché en memoria de cada proceso.
+
+CACHE_VERSION se aplica a todas las claves (el VERSION de Django):
+incrementarlo en un despliegue que cambia el formato de los valores hace que
+los workers nuevos ignoren las entradas de los viejos. CACHE_KEY_PREFIX
+separa varios entornos que usan el mismo Redis.
+
+Cada espacio de nombres de la caché tiene su TTL en CACHE_TTLS (se puede
+cambiar con CACHE_TTL_<NOMBRE>, en segundos o "none" para no expirar); el
+código lo lee con ttl().
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'database': 'django.core.cache.backends.db.DatabaseCache',
+}
+
+# TTL por defecto de cada espacio de nombres, en segundos (None = sin expiración)
+TTL_DEFAULTS = {
+    'aggregates': None,  # Agregados por versión de datos (aggregate_cache)
+    'exchange_rates': 3600,  # Respuesta del servicio de tipos de cambio
+    'weather': 1800,  # Clima de wttr.in
+    'external_service': 300,  # Servicio del equipo anterior
+    'fx_rates': 3600,  # Tasas vigentes por fecha leídas de ExchangeRateSnapshot
+}
+
+
+def parse_timeout(value):
+    """Convierte un TTL del entorno a segundos (None con 'none')."""
+    if value is None or str(value).strip().lower() == 'none':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ImproperlyConfigured(f"TTL de caché inválido: {value!r}")
+
+
+def build_caches(env=None):
+    """
+    Retorna el valor de CACHES según las variables de entorno de `env`
+    (por defecto os.environ).
+    """
+    env = os.environ if env is None else env
+    backend = env.get('CACHE_BACKEND') or ('redis' if env.get('REDIS_URL') else 'locmem')
+    if backend not in BACKENDS:
+        raise ImproperlyConfigured(
+            f"CACHE_BACKEND no soportado: {backend!r} (use {', '.join(BACKENDS)})"
+        )
+
+    config = {
+        'BACKEND': BACKENDS[backend],
+        'KEY_PREFIX': env.get('CACHE_KEY_PREFIX', ''),
+        'VERSION': int(env.get('CACHE_VERSION', '1')),
+        'TIMEOUT': parse_timeout(env.get('CACHE_DEFAULT_TIMEOUT', '300')),
+    }
+    max_entries = int(env.get('CACHE_MAX_ENTRIES', '10000'))
+    if backend == 'redis':
+        config['LOCATION'] = env.get('REDIS_URL', 'redis://localhost:6379/0')
+        # Opciones del pool de conexiones de redis-py
+        config['OPTIONS'] = {
+            'socket_connect_timeout': float(env.get('REDIS_CONNECT_TIMEOUT', '1')),
+            'socket_timeout': float(env.get('REDIS_SOCKET_TIMEOUT', '1')),
+            'max_connections': int(env.get('REDIS_MAX_CONNECTIONS', '50')),
+        }
+    elif backend == 'file':
+        config['LOCATION'] = env.get('CACHE_LOCATION') or os.path.join(tempfile.gettempdir(), 'finance_cache')
+        config['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+    elif backend == 'database':
+        config['LOCATION'] = env.get('CACHE_LOCATION', 'finance_cache')
+        config['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+    else:
+        config['LOCATION'] = 'finance'
+        config['OPTIONS'] = {'MAX_ENTRIES': max_entries}
+    return {'default': config}
+
+
+def build_ttls(env=None):
+    """Retorna CACHE_TTLS: TTL_DEFAULTS con los CACHE_TTL_<NOMBRE> del entorno aplicados."""
+    env = os.environ if env is None else env
+    ttls = dict(TTL_DEFAULTS)
+    for name in TTL_DEFAULTS:
+        value = env.get(f'CACHE_TTL_{name.upper()}')
+        if value is not None:
+            ttls[name] = parse_timeout(value)
+    return ttls
+
+
+def ttl(namespace, default=None):
+    """TTL configurado del espacio de nombres `namespace` (o `default` si no está en CACHE_TTLS)."""
+    ttls = getattr(settings, 'CACHE_TTLS', {})
+    return ttls[namespace] if namespace in ttls else default
@@ -0,0 +1,240 @@
+"""
+Cliente HTTP compartido para las llamadas a servicios externos.
+
+Todas las peticiones salientes usan una única requests.Session con un pool
+de conexiones keep-alive por host, así que solo la primera petición a cada
+host paga el handshake TCP+TLS. Los errores de conexión y las respuestas
+502/503/504 se reintentan con backoff exponencial y jitter completo, sin
+pasar del timeout total de la llamada. Un timeout de lectura no se reintenta:
+el host está colgado y volver a esperarlo solo multiplica la espera.
+
+Cada host tiene además un circuit breaker: tras OUTBOUND_CIRCUIT_FAILURE_THRESHOLD
+fallos seguidos se abre y las peticiones fallan de inmediato con
+CircuitOpenError (sin tocar la red) durante OUTBOUND_CIRCUIT_RESET_TIMEOUT
+segundos; después deja pasar una sola petición de prueba (half-open) que
+lo cierra si responde bien o lo vuelve a abrir si falla. metrics() expone
+el estado y los contadores de cada host.
+"""
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Estados HTTP que indican un fallo transitorio del servicio
+RETRY_STATUSES = {502, 503, 504}
+
+DEFAULT_TIMEOUT = 5
+
+
+class CircuitOpenError(requests.RequestException):
+    """El circuito del host está abierto: la petición no se envió."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un host (seguro entre hilos).
+    """
+
+    def __init__(self, host, failure_threshold, reset_timeout):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    def allow(self):
+        """Indica si se puede enviar una petición ahora."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.counters['rejected'] += 1
+                    return False
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_in_flight:
+                    self.counters['rejected'] += 1
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.counters['successes'] += 1
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.counters['failures'] += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                self.counters['opened'] += 1
+                self._transition(OPEN)
+
+    def release(self):
+        """Libera la petición de prueba half-open sin contar éxito ni fallo (p. ej. si se canceló)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _transition(self, state):
+        if state == OPEN:
+            logger.warning(f"Circuito abierto para {self.host} tras {self.consecutive_failures} fallos")
+        else:
+            logger.info(f"Circuito de {self.host}: {self.state} -> {state}")
+        self.state = state
+
+    def snapshot(self):
+        """Estado y contadores del breaker."""
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+            return {
+                'host': self.host,
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'retry_in': retry_in,
+                **self.counters,
+            }
+
+
+_lock = threading.Lock()
+_session = None
+_breakers = {}
+
+
+def get_session():
+    """Retorna la sesión compartida (con pool de conexiones keep-alive)."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=_setting('OUTBOUND_POOL_CONNECTIONS', 10),
+                pool_maxsize=_setting('OUTBOUND_POOL_MAXSIZE', 10),
+            )
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def breaker_for(url):
+    """Retorna el circuit breaker del host de `url`."""
+    host = urlsplit(url).netloc
+    with _lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                failure_threshold=_setting('OUTBOUND_CIRCUIT_FAILURE_THRESHOLD', 5),
+                reset_timeout=_setting('OUTBOUND_CIRCUIT_RESET_TIMEOUT', 30),
+            )
+            _breakers[host] = breaker
+        return breaker
+
+
+def backoff_delay(attempt):
+    """Espera antes del reintento `attempt` (0, 1, ...): backoff exponencial con jitter completo."""
+    base = _setting('OUTBOUND_RETRY_BACKOFF', 0.2)
+    cap = _setting('OUTBOUND_RETRY_BACKOFF_MAX', 2)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get(url, timeout=DEFAULT_TIMEOUT, retries=None, **kwargs):
+    """
+    GET a través de la sesión compartida, con reintentos y circuit breaker.
+
+    Args:
+        url: URL a consultar
+        timeout: Segundos de espera en total, sumando intentos y esperas entre ellos
+        retries: Reintentos ante fallos transitorios (por defecto OUTBOUND_RETRIES)
+        **kwargs: Argumentos adicionales para requests
+
+    Returns:
+        requests.Response (la última, aunque sea un 5xx tras agotar los reintentos)
+
+    Raises:
+        CircuitOpenError: Si el circuito del host está abierto
+        requests.RequestException: Si el último intento falla por conexión o timeout
+    """
+    if retries is None:
+        retries = _setting('OUTBOUND_RETRIES', 2)
+    breaker = breaker_for(url)
+    session = get_session()
+    deadline = time.monotonic() + timeout
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuito abierto para {breaker.host}")
+        try:
+            response = session.get(url, timeout=max(deadline - time.monotonic(), 0.001), **kwargs)
+        except requests.ConnectionError as exc:
+            # Incluye ConnectTimeout: el host no aceptó la conexión
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            last = exc
+        except requests.Timeout:
+            # Timeout de lectura: el host aceptó y no respondió, no se reintenta
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Error que no depende del host (URL inválida, interrupción...)
+            breaker.release()
+            raise
+        else:
+            if response.status_code < 500:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            last = response
+        delay = backoff_delay(attempt)
+        if time.monotonic() + delay >= deadline:
+            # No queda tiempo para otro intento: se entrega el último resultado
+            if isinstance(last, BaseException):
+                raise last
+            return last
+        time.sleep(delay)
+
+def metrics():
+    """Estado y contadores del circuit breaker de cada host, ordenados por host."""
+    with _lock:
+        breakers = list(_breakers.values())
+    return sorted((breaker.snapshot() for breaker in breakers), key=lambda item: item['host'])
+
+
+def reset():
+    """Cierra la sesión compartida y olvida los circuit breakers."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _breakers.clear()
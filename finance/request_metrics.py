@@ -0,0 +1,247 @@
+"""
+Instrumentación de costo por request.
+
+RequestMetricsMiddleware registra, para cada request, la cantidad de
+consultas SQL, el tiempo total en SQL, las consultas más lentas, la vista
+resuelta y el tiempo de respuesta. Los publica en un log estructurado
+(JSON) y, con DEBUG o para usuarios staff/administradores, en la cabecera
+Server-Timing (no se expone a cualquier cliente). Emite una advertencia
+cuando la misma sentencia SQL se repite más de
+REQUEST_METRICS_N_PLUS_ONE_THRESHOLD veces (patrón N+1 probable).
+
+Las últimas REQUEST_METRICS_HISTORY mediciones se guardan en memoria (por
+proceso) para el ranking de endpoints costosos del panel de administración.
+Las consultas que se ejecutan mientras se consume una respuesta en
+streaming no se cuentan. El middleware funciona tanto bajo WSGI como ASGI.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from accounts.models import user_is_admin
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+DEFAULT_SLOW_QUERIES = 3
+DEFAULT_HISTORY = 1000
+DEFAULT_TOP_N = 20
+SQL_PREVIEW_LENGTH = 300
+
+ORDERINGS = {
+    'total_ms': 'Tiempo total',
+    'avg_ms': 'Tiempo promedio',
+    'avg_queries': 'Consultas promedio',
+    'avg_sql_ms': 'Tiempo SQL promedio',
+}
+
+_history_lock = threading.Lock()
+_history = deque(maxlen=getattr(settings, 'REQUEST_METRICS_HISTORY', DEFAULT_HISTORY))
+
+
+class QueryRecorder:
+    """execute_wrapper que guarda (sql, segundos) de cada consulta ejecutada."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+
+def _preview(sql):
+    sql = ' '.join(sql.split())
+    if len(sql) > SQL_PREVIEW_LENGTH:
+        return sql[:SQL_PREVIEW_LENGTH] + '…'
+    return sql
+
+
+def _endpoint(request):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else request.path
+    return f"{request.method} {view}"
+
+
+def build_metrics(request, queries, duration):
+    """Arma el registro de métricas de un request a partir de las consultas grabadas."""
+    threshold = getattr(settings, 'REQUEST_METRICS_N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+    slow_count = getattr(settings, 'REQUEST_METRICS_SLOW_QUERIES', DEFAULT_SLOW_QUERIES)
+
+    slowest = sorted(queries, key=lambda query: -query[1])[:slow_count]
+    repeated = Counter(sql for sql, _ in queries)
+    return {
+        'endpoint': _endpoint(request),
+        'path': request.path,
+        'duration_ms': round(duration * 1000, 2),
+        'queries': len(queries),
+        'sql_ms': round(sum(seconds for _, seconds in queries) * 1000, 2),
+        'slowest': [
+            {'sql': _preview(sql), 'ms': round(seconds * 1000, 2)} for sql, seconds in slowest
+        ],
+        'n_plus_one': [
+            {'sql': _preview(sql), 'count': count}
+            for sql, count in repeated.most_common()
+            if count > threshold
+        ],
+    }
+
+
+def record(metrics):
+    """Agrega una medición al historial del proceso."""
+    with _history_lock:
+        _history.append(metrics)
+
+
+def reset():
+    """Vacía el historial (usado en pruebas)."""
+    with _history_lock:
+        _history.clear()
+
+
+def top_endpoints(limit=None, order='total_ms'):
+    """
+    Ranking de endpoints por costo dentro del historial reciente.
+
+    Returns:
+        list de dicts con 'endpoint', 'requests', 'avg_ms', 'max_ms',
+        'total_ms', 'avg_queries', 'max_queries', 'avg_sql_ms',
+        'n_plus_one' (requests con N+1 sospechoso) y 'slowest_sql'
+    """
+    limit = limit or getattr(settings, 'REQUEST_METRICS_TOP_N', DEFAULT_TOP_N)
+    if order not in ORDERINGS:
+        order = 'total_ms'
+    with _history_lock:
+        history = list(_history)
+
+    endpoints = {}
+    for metrics in history:
+        item = endpoints.setdefault(metrics['endpoint'], {
+            'endpoint': metrics['endpoint'], 'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'queries': 0, 'max_queries': 0, 'sql_ms': 0.0, 'n_plus_one': 0, 'slowest_sql': None,
+            '_slowest_ms': -1,
+        })
+        item['requests'] += 1
+        item['total_ms'] += metrics['duration_ms']
+        item['max_ms'] = max(item['max_ms'], metrics['duration_ms'])
+        item['queries'] += metrics['queries']
+        item['max_queries'] = max(item['max_queries'], metrics['queries'])
+        item['sql_ms'] += metrics['sql_ms']
+        item['n_plus_one'] += bool(metrics['n_plus_one'])
+        if metrics['slowest'] and metrics['slowest'][0]['ms'] > item['_slowest_ms']:
+            item['_slowest_ms'] = metrics['slowest'][0]['ms']
+            item['slowest_sql'] = metrics['slowest'][0]
+
+    ranking = []
+    for item in endpoints.values():
+        requests = item['requests']
+        ranking.append({
+            'endpoint': item['endpoint'],
+            'requests': requests,
+            'total_ms': round(item['total_ms'], 2),
+            'avg_ms': round(item['total_ms'] / requests, 2),
+            'max_ms': item['max_ms'],
+            'avg_queries': round(item['queries'] / requests, 1),
+            'max_queries': item['max_queries'],
+            'avg_sql_ms': round(item['sql_ms'] / requests, 2),
+            'n_plus_one': item['n_plus_one'],
+            'slowest_sql': item['slowest_sql'],
+        })
+    ranking.sort(key=lambda item: -item[order])
+    return ranking[:limit]
+
+
+def server_timing(metrics):
+    """Valor de la cabecera Server-Timing para una medición."""
+    return (
+        f'db;dur={metrics["sql_ms"]};desc="{metrics["queries"]} consultas", '
+        f'total;dur={metrics["duration_ms"]}'
+    )
+
+
+def show_server_timing(request):
+    """True si la respuesta puede llevar Server-Timing: con DEBUG o para staff/administradores."""
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and (user.is_staff or user_is_admin(user))
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide consultas SQL y tiempo de respuesta de cada request.
+
+    Se desactiva con REQUEST_METRICS_ENABLED = False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self._recording(recorder):
+            response = self.get_response(request)
+        metrics = self._finish(request, recorder, start)
+        if show_server_timing(request):
+            response['Server-Timing'] = server_timing(metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        # Las conexiones son por hilo: el ORM de una vista async corre en el
+        # hilo de sync_to_async (thread_sensitive), así que los wrappers se
+        # instalan y se quitan en ese mismo hilo
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        stack = await sync_to_async(self._recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        metrics = self._finish(request, recorder, start)
+        # Resolver el usuario puede consultar la base de datos
+        if await sync_to_async(show_server_timing)(request):
+            response['Server-Timing'] = server_timing(metrics)
+        return response
+
+    def _recording(self, recorder):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def _finish(self, request, recorder, start):
+        """Arma la medición, la guarda en el historial y la registra en el log."""
+        metrics = build_metrics(request, recorder.queries, time.perf_counter() - start)
+        record(metrics)
+        # Serializar cada request tiene costo; solo si el log INFO está activo
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(metrics, ensure_ascii=False))
+        for repeated in metrics['n_plus_one']:
+            logger.warning(
+                f"Posible N+1 en {metrics['endpoint']}: consulta repetida {repeated['count']} veces: {repeated['sql']}"
+            )
+        return metrics
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from finance import caching
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,7 +28,7 @@ SECRET_KEY = 'django-insecure-u2x7#$*wwd@i)x9*53+eb7&gcis6s#wy0#kr$0y0wa70ed$hx%
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-ALLOWED_HOSTS = [18.208.130.66]
+ALLOWED_HOSTS = ['18.208.130.66']
 
 
 # Application definition
@@ -49,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'finance.request_metrics.RequestMetricsMiddleware',  # Primero, para medir también sesión y autenticación
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',  # Agregado para soporte multiidioma
@@ -85,13 +89,67 @@ WSGI_APPLICATION = 'finance.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql usa el PostgreSQL de docker-compose (o el indicado por las
+# variables DB_*); por defecto se usa SQLite ajustado para un solo nodo.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE in ('postgres', 'postgresql'):
+    # Pool de conexiones de psycopg 3 (Django 5.1+); con pool, CONN_MAX_AGE debe ser 0
+    DB_POOL = os.environ.get('DB_POOL', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'finance_db'),
+            'USER': os.environ.get('DB_USER', 'finance_user'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', 'finance_password'),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            # Las exportaciones recorren los resultados con cursores del lado del servidor
+            # (QuerySet.iterator); desactivarlos solo detrás de PgBouncer en modo transacción
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Tomar el bloqueo de escritura al inicio de cada transacción evita
+                # errores "database is locked" al promover lecturas a escrituras
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+# PRAGMAs aplicados a cada conexión SQLite nueva (ver finance/db.py): WAL permite
+# lecturas concurrentes con una escritura y busy_timeout espera al bloqueo en vez de fallar
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
 }
 
+# Cache
+# CACHE_BACKEND=redis|file|database|locmem elige la caché compartida entre workers
+# (ver finance/caching.py: REDIS_URL, CACHE_LOCATION, CACHE_VERSION, CACHE_KEY_PREFIX...)
+CACHES = caching.build_caches()
+
+# TTL en segundos de cada espacio de nombres de la caché (None = sin expiración);
+# cada uno se puede cambiar con CACHE_TTL_<NOMBRE>, p. ej. CACHE_TTL_WEATHER=900
+CACHE_TTLS = caching.build_ttls()
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -154,6 +212,13 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Authentication settings
+# Carga el perfil (rol) junto con el usuario de la sesión en una sola consulta.
+# ModelBackend sigue en la lista para que las sesiones iniciadas con él antes
+# del cambio (guardan la ruta del backend) no se cierren.
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_REDIRECT_URL = 'dashboard:dashboard'  # Usar el nombre de la URL para evitar problemas con i18n
 LOGOUT_REDIRECT_URL = 'accounts:login'  # Usar el nombre de la URL para evitar problemas con i18n
 
@@ -167,9 +232,58 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Métricas por request (consultas SQL, tiempos, N+1) y ranking de endpoints
+REQUEST_METRICS_ENABLED = True
+REQUEST_METRICS_N_PLUS_ONE_THRESHOLD = 10  # Misma SQL repetida más veces que esto => advertencia
+REQUEST_METRICS_SLOW_QUERIES = 3  # Consultas más lentas incluidas en el log
+REQUEST_METRICS_HISTORY = 1000  # Requests recientes que se conservan por proceso
+REQUEST_METRICS_TOP_N = 20
+
+# Log estructurado (una línea JSON por request con nivel INFO; las advertencias de N+1 con WARNING)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'finance.request_metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Paginación por cursor de /api/transactions/
+TRANSACTION_API_PAGE_SIZE = 50
+TRANSACTION_API_MAX_PAGE_SIZE = 500
+
 # External Service Configuration
 # Configurar la URL del servicio del equipo precedente aquí
 # Ejemplo: "https://api-equipo-previo.example.com/api/"
 EXTERNAL_SERVICE_BASE_URL = None  # Cambiar por la URL real cuando la tengas
 # Ejemplo:
 # EXTERNAL_SERVICE_BASE_URL = "https://api-equipo-previo.herokuapp.com/api/"
+
+# Plazo total (segundos) para consultar clima y tipos de cambio en el dashboard
+EXTERNAL_SERVICES_DEADLINE = float(os.environ.get('EXTERNAL_SERVICES_DEADLINE', '5'))
+
+# Caché stale-while-revalidate de servicios externos (transactions.service_cache), en segundos:
+# cuánto se sirve un valor vencido mientras se refresca, cuánto se recuerda un fallo
+# y cuánto dura el lock que evita consultas simultáneas al mismo servicio
+SERVICE_CACHE_STALE_TIMEOUT = 86400
+SERVICE_CACHE_NEGATIVE_TIMEOUT = 60
+SERVICE_CACHE_LOCK_TIMEOUT = 10
+
+# Cliente HTTP saliente compartido (finance.http_client)
+OUTBOUND_POOL_CONNECTIONS = 10  # Hosts con pool propio
+OUTBOUND_POOL_MAXSIZE = 10  # Conexiones keep-alive por host
+OUTBOUND_RETRIES = 2  # Reintentos ante errores de conexión y 502/503/504 (no timeouts de lectura)
+OUTBOUND_RETRY_BACKOFF = 0.2  # Segundos base del backoff exponencial (con jitter)
+OUTBOUND_RETRY_BACKOFF_MAX = 2
+OUTBOUND_CIRCUIT_FAILURE_THRESHOLD = 5  # Fallos seguidos que abren el circuito
+OUTBOUND_CIRCUIT_RESET_TIMEOUT = 30  # Segundos abierto antes de la petición de prueba
+
+# Moneda por defecto de transacciones, presupuestos y perfiles nuevos (código ISO 4217)
+DEFAULT_CURRENCY = os.environ.get('DEFAULT_CURRENCY', 'COP')
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction
+from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction, MonthlyRollup, ReportJob, ExchangeRateSnapshot
 
 
 @admin.register(Category)
@@ -34,8 +34,8 @@ class TagAdmin(admin.ModelAdmin):
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
-    list_display = ['user', 'transaction_type', 'amount', 'category', 'date', 'description_short', 'created_at']
-    list_filter = ['transaction_type', 'date', 'category', 'created_at', 'user']
+    list_display = ['user', 'transaction_type', 'amount', 'currency', 'category', 'date', 'description_short', 'created_at']
+    list_filter = ['transaction_type', 'currency', 'date', 'category', 'created_at', 'user']
     search_fields = ['description', 'user__username']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'date'
@@ -43,7 +43,7 @@ class TransactionAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Información Básica', {
-            'fields': ('user', 'transaction_type', 'amount', 'category')
+            'fields': ('user', 'transaction_type', 'amount', 'currency', 'category')
         }),
         ('Detalles', {
             'fields': ('description', 'date', 'tags', 'recurring_transaction')
@@ -64,7 +64,7 @@ class TransactionAdmin(admin.ModelAdmin):
 
 @admin.register(Budget)
 class BudgetAdmin(admin.ModelAdmin):
-    list_display = ['user', 'category', 'amount', 'month', 'spent_display', 'percentage_used_display', 'is_over_budget_display']
+    list_display = ['user', 'category', 'amount', 'currency', 'month', 'spent_display', 'percentage_used_display', 'is_over_budget_display']
     list_filter = ['month', 'created_at', 'user']
     search_fields = ['category__name', 'user__username']
     readonly_fields = ['created_at', 'updated_at', 'spent_display', 'percentage_used_display']
@@ -78,8 +78,8 @@ class BudgetAdmin(admin.ModelAdmin):
         percentage = obj.percentage_used
         color = 'red' if percentage > 100 else 'orange' if percentage > 80 else 'green'
         return format_html(
-            '<span style="color: {};">{:.1f}%</span>',
-            color, percentage
+            '<span style="color: {};">{}%</span>',
+            color, f"{percentage:.1f}"
         )
     percentage_used_display.short_description = '% Usado'
     
@@ -88,6 +88,9 @@ class BudgetAdmin(admin.ModelAdmin):
             return format_html('<span style="color: red;">⚠ Excedido</span>')
         return format_html('<span style="color: green;">✓ Dentro</span>')
     is_over_budget_display.short_description = 'Estado'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'category').with_spending()
 
 
 @admin.register(SavingsGoal)
@@ -108,8 +111,45 @@ class SavingsGoalAdmin(admin.ModelAdmin):
 
 @admin.register(RecurringTransaction)
 class RecurringTransactionAdmin(admin.ModelAdmin):
-    list_display = ['name', 'user', 'transaction_type', 'amount', 'frequency', 'next_occurrence', 'is_active']
+    list_display = ['name', 'user', 'transaction_type', 'amount', 'currency', 'frequency', 'next_occurrence', 'is_active']
     list_filter = ['transaction_type', 'frequency', 'is_active', 'created_at']
     search_fields = ['name', 'description', 'user__username']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'next_occurrence'
+
+
+@admin.register(MonthlyRollup)
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ['user', 'month', 'transaction_type', 'category', 'currency', 'total', 'count']
+    list_filter = ['transaction_type', 'month', 'user']
+    search_fields = ['user__username', 'category__name']
+    date_hierarchy = 'month'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'category')
+    
+    def has_add_permission(self, request):
+        # Los acumulados se mantienen con señales o con el comando rebuild_rollups
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ExchangeRateSnapshot)
+class ExchangeRateSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['date', 'currency', 'rate', 'created_at']
+    list_filter = ['currency']
+    date_hierarchy = 'date'
+    readonly_fields = ['created_at']
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'format_type', 'status', 'created_at', 'finished_at']
+    list_filter = ['status', 'format_type', 'created_at']
+    search_fields = ['user__username', 'filter_hash']
+    readonly_fields = ['filter_hash', 'created_at', 'started_at', 'finished_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
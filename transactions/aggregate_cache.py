@@ -0,0 +1,116 @@
+"""
+Caché versionada de agregados financieros por usuario.
+
+Cada usuario tiene un número de versión de datos que las señales de
+Transaction, Budget, SavingsGoal, RecurringTransaction y Category
+incrementan en cada escritura. Los agregados se guardan bajo una clave que
+incluye esa versión, así que se reutilizan hasta que los datos del usuario
+cambian de verdad; las entradas de versiones anteriores quedan inalcanzables
+y el backend de caché las descarta, sin depender de TTLs adivinados.
+
+Además de la versión por usuario existe una versión global (scope None) que
+se incrementa con cualquier escritura, para agregados de todos los usuarios
+como los del panel de administración.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+from finance import caching
+
+KEY_PREFIX = 'finance:agg'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _scope(user_id):
+    return 'all' if user_id is None else f'u{user_id}'
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{_scope(user_id)}'
+
+
+def _initial_version():
+    # Basada en el reloj: si la clave de versión se pierde (LRU o reinicio del
+    # backend), la nueva versión nunca coincide con la de entradas anteriores.
+    return int(time.time() * 1000)
+
+
+def get_version(user_id=None):
+    """Retorna la versión de datos actual del usuario (o la global si user_id es None)."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _incr(user_id):
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La clave no existe todavía
+        cache.set(key, _initial_version(), None)
+
+
+def bump_version(user_id):
+    """Invalida los agregados del usuario y los globales incrementando sus versiones."""
+    if user_id is not None:
+        _incr(user_id)
+    _incr(None)
+
+
+def memoize(user_id, name, compute, timeout=None):
+    """
+    Retorna el agregado `name` del usuario desde la caché o lo calcula con
+    `compute()` y lo guarda bajo la versión de datos actual.
+
+    Args:
+        user_id: Id del usuario, o None para agregados globales
+        name: Nombre del agregado; debe incluir cualquier parámetro del cálculo
+              que no dependa de los datos (p. ej. el mes actual)
+        compute: Función sin argumentos que calcula el valor
+        timeout: Segundos de vida; por defecto el TTL 'aggregates' de CACHE_TTLS (None = sin expiración)
+    """
+    key = f'{KEY_PREFIX}:{_scope(user_id)}:{get_version(user_id)}:{name}'
+    value = cache.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+
+    _count('misses')
+    value = compute()
+    if timeout is None:
+        timeout = caching.ttl('aggregates')
+    cache.set(key, value, timeout)
+    return value
+
+
+def _count(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def stats():
+    """Contadores de aciertos y fallos de la caché de agregados en este proceso."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 1) if total else 0.0,
+    }
+
+
+def reset_stats():
+    """Reinicia los contadores de aciertos y fallos."""
+    with _stats_lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .api_views import (
     TransactionViewSet, CategoryViewSet,
-    BudgetViewSet, SavingsGoalViewSet
+    BudgetViewSet, SavingsGoalViewSet, ForecastView
 )
 
 router = DefaultRouter()
@@ -12,6 +12,7 @@ router.register(r'budgets', BudgetViewSet, basename='budget')
 router.register(r'savings-goals', SavingsGoalViewSet, basename='savings-goal')
 
 urlpatterns = [
+    path('forecast/', ForecastView.as_view(), name='forecast'),
     path('', include(router.urls)),
 ]
 
@@ -2,11 +2,16 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Q
+from rest_framework.views import APIView
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
+import numpy as np
 
 from .models import Transaction, Category, Budget, SavingsGoal
+from .pagination import TransactionCursorPagination
+from . import forecast, search
+from .currency import CurrencyConverter
 from .serializers import (
     TransactionSerializer, CategorySerializer,
     BudgetSerializer, SavingsGoalSerializer
@@ -20,11 +25,12 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionCursorPagination
     
     def get_queryset(self):
         """Filtra las transacciones del usuario autenticado."""
         user = self.request.user
-        queryset = Transaction.objects.filter(user=user).select_related('category').order_by('-date', '-created_at')
+        queryset = Transaction.objects.filter(user=user).select_related('category').order_by('-date', '-created_at', '-id')
         
         # Filtros opcionales
         transaction_type = self.request.query_params.get('type', None)
@@ -35,29 +41,46 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         
+        search_text = self.request.query_params.get('search', None)
+        if search_text:
+            # Solo filtra: el orden lo fija la paginación por cursor
+            queryset = search.search_transactions(queryset, user, search_text, rank=False)
+        
         return queryset
     
     def list(self, request, *args, **kwargs):
-        """Lista las transacciones del usuario con información relevante."""
+        """
+        Lista las transacciones del usuario paginadas por cursor.
+        El resumen de totales se obtiene aparte en /transactions/summary/.
+        """
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        
-        # Información adicional
-        total_income = queryset.filter(transaction_type='income').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        total_expenses = queryset.filter(transaction_type='expense').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        
+        response = self.get_paginated_response(serializer.data)
+        response.data['filters'] = {
+            'type': request.query_params.get('type', None),
+            'category': request.query_params.get('category', None),
+            'search': request.query_params.get('search', None),
+        }
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Retorna los totales de las transacciones filtradas en una sola consulta,
+        convertidos a la moneda principal del usuario.
+        """
+        converter = CurrencyConverter.for_user(request.user)
+        totals = self.get_queryset().totals(converter)
         
         return Response({
-            'transactions': serializer.data,
             'summary': {
-                'total_income': float(total_income),
-                'total_expenses': float(total_expenses),
-                'balance': float(total_income - total_expenses),
-                'count': queryset.count()
+                'total_income': float(totals['income']),
+                'total_expenses': float(totals['expense']),
+                'balance': float(totals['balance']),
+                'count': totals['count'],
+                'currency': converter.target,
             },
             'filters': {
                 'type': request.query_params.get('type', None),
@@ -88,7 +111,7 @@ class BudgetViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """Filtra los presupuestos del usuario autenticado."""
         user = self.request.user
-        queryset = Budget.objects.filter(user=user).select_related('category').order_by('-month')
+        queryset = Budget.objects.filter(user=user).select_related('category').with_spending().order_by('-month')
         
         # Filtro por mes opcional
         month = self.request.query_params.get('month', None)
@@ -99,25 +122,29 @@ class BudgetViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def current_month(self, request):
-        """Retorna los presupuestos del mes actual."""
+        """Retorna los presupuestos del mes actual (resumen en la moneda principal del usuario)."""
         current_month = timezone.now().date().replace(day=1)
-        budgets = Budget.objects.filter(
+        converter = CurrencyConverter.for_user(request.user)
+        budgets = list(Budget.objects.filter(
             user=request.user,
             month=current_month
-        ).select_related('category')
+        ).select_related('category').with_spending(converter.rates))
         
         serializer = self.get_serializer(budgets, many=True)
         
-        total_budget = budgets.aggregate(total=Sum('amount'))['total'] or 0
-        total_spent = sum(budget.spent for budget in budgets)
+        currencies = [budget.currency for budget in budgets]
+        # Los presupuestos en monedas sin tasa no entran al resumen
+        total_budget = np.nansum(converter.convert_array([budget.amount for budget in budgets], currencies))
+        total_spent = np.nansum(converter.convert_array([budget.spent for budget in budgets], currencies))
         
         return Response({
             'budgets': serializer.data,
             'summary': {
-                'total_budget': float(total_budget),
-                'total_spent': float(total_spent),
-                'remaining': float(total_budget - total_spent),
-                'month': current_month.strftime('%Y-%m')
+                'total_budget': round(float(total_budget), 2),
+                'total_spent': round(float(total_spent), 2),
+                'remaining': round(float(total_budget - total_spent), 2),
+                'month': current_month.strftime('%Y-%m'),
+                'currency': converter.target,
             }
         })
 
@@ -164,3 +191,25 @@ class SavingsGoalViewSet(viewsets.ReadOnlyModelViewSet):
             }
         })
 
+
+class ForecastView(APIView):
+    """
+    Proyección del saldo diario para los próximos meses a partir de las
+    transacciones recurrentes activas y los promedios históricos por categoría.
+    
+    Parámetros opcionales: months (1-60, por defecto 12) e history (meses de
+    historial para los promedios, 1-24, por defecto 6).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get_int_param(self, name, default, maximum):
+        try:
+            value = int(self.request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            value = default
+        return max(1, min(value, maximum))
+    
+    def get(self, request):
+        months = self.get_int_param('months', forecast.DEFAULT_MONTHS, forecast.MAX_MONTHS)
+        history_months = self.get_int_param('history', forecast.DEFAULT_HISTORY_MONTHS, forecast.MAX_HISTORY_MONTHS)
+        return Response(forecast.get_forecast(request.user, months, history_months))
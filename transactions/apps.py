@@ -12,6 +12,8 @@ class TransactionsConfig(AppConfig):
         """
         from django.conf import settings
         from .external_service_consumer import ExternalServiceConsumer
+        from . import signals  # noqa: F401 - registra los receptores de señales
+        from finance import db  # noqa: F401 - ajustes por conexión (PRAGMAs de SQLite)
         
         # Configurar URL del servicio externo si está definida en settings
         if hasattr(settings, 'EXTERNAL_SERVICE_BASE_URL') and settings.EXTERNAL_SERVICE_BASE_URL:
@@ -0,0 +1,195 @@
+"""
+Cliente asíncrono (httpx) para los servicios externos del dashboard.
+
+Versión asíncrona de ExchangeRateService.get_exchange_rates y
+FreeWeatherService.get_weather_simple: usa las mismas URLs, claves de caché
+y formato de datos que services.py y la misma caché stale-while-revalidate
+(service_cache), de modo que ambas versiones comparten las entradas.
+fetch_dashboard_data lanza las dos consultas a la vez con un plazo común,
+así el dashboard espera como máximo lo que tarde la más lenta (y nunca más
+que el plazo).
+
+Como la requests.Session de http_client, el httpx.AsyncClient es compartido
+(get_client) para reutilizar las conexiones keep-alive entre requests. Sus
+conexiones pertenecen al event loop que las abrió, así que hay un cliente
+por loop: bajo ASGI es uno solo para todo el proceso.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+
+from finance import caching, http_client
+
+from . import service_cache
+from .services import ExchangeRateService, FreeWeatherService
+
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo de cada petición individual, en segundos
+REQUEST_TIMEOUT = 5
+
+# Fracción del plazo de fetch_dashboard_data que puede usar cada petición: así
+# un servicio colgado falla por timeout (y cuenta en su circuit breaker) antes
+# de que el plazo cancele la consulta
+REQUEST_TIMEOUT_SHARE = 0.8
+
+_lock = threading.Lock()
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """Retorna el cliente compartido del event loop en curso (lo crea la primera vez)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        # Los clientes de loops ya cerrados no se pueden usar ni cerrar con await
+        for closed_loop in [other for other in _clients if other.is_closed()]:
+            del _clients[closed_loop]
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            max_connections = getattr(settings, 'OUTBOUND_POOL_MAXSIZE', 10)
+            client = httpx.AsyncClient(
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            )
+            _clients[loop] = client
+        return client
+
+
+async def aclose():
+    """Cierra el cliente compartido del event loop en curso."""
+    with _lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def reset():
+    """Olvida los clientes compartidos (para pruebas)."""
+    with _lock:
+        _clients.clear()
+
+
+async def fetch_json(client, url, timeout=REQUEST_TIMEOUT):
+    """
+    GET asíncrono que retorna el JSON de la respuesta, o None si el status no es 200.
+
+    Comparte con http_client el circuit breaker del host (sin reintentos: el
+    plazo de fetch_dashboard_data no deja margen para ellos). Los timeouts y
+    la cancelación por el plazo cuentan como fallos del host.
+    """
+    breaker = http_client.breaker_for(url)
+    if not breaker.allow():
+        raise http_client.CircuitOpenError(f"Circuito abierto para {breaker.host}")
+    try:
+        response = await client.get(url, timeout=timeout)
+    except (httpx.TransportError, asyncio.CancelledError):
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # Error ajeno al host (URL inválida...): no cuenta como fallo
+        breaker.release()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    if response.status_code != 200:
+        logger.warning(f"Error al consumir {url}: {response.status_code}")
+        return None
+    return response.json()
+
+
+async def get_exchange_rates(client, timeout=REQUEST_TIMEOUT):
+    """
+    Obtiene los tipos de cambio desde USD (o None si la API falla).
+    """
+    async def fetch():
+        try:
+            return await fetch_json(client, ExchangeRateService.BASE_URL, timeout)
+        except Exception as e:
+            logger.error(f"Error al consumir API de tipos de cambio: {str(e)}")
+            return None
+
+    return await service_cache.aget_or_refresh(
+        ExchangeRateService.CACHE_KEY,
+        fetch,
+        caching.ttl('exchange_rates', ExchangeRateService.CACHE_TIMEOUT),
+        refresh=ExchangeRateService.fetch_exchange_rates,
+    )
+
+
+async def get_weather_simple(client, city="Medellin", timeout=REQUEST_TIMEOUT):
+    """
+    Obtiene el clima desde wttr.in (o los datos por defecto si el servicio falla).
+    """
+    async def fetch():
+        try:
+            data = await fetch_json(client, FreeWeatherService.BASE_URL.format(city=city), timeout)
+        except Exception as e:
+            logger.error(f"Error al obtener clima desde wttr.in: {str(e)}")
+            return None
+        return FreeWeatherService.parse_weather(city, data) if data is not None else None
+
+    weather_data = await service_cache.aget_or_refresh(
+        FreeWeatherService.cache_key(city),
+        fetch,
+        caching.ttl('weather', FreeWeatherService.CACHE_TIMEOUT),
+        refresh=lambda: FreeWeatherService.fetch_weather(city),
+    )
+    if weather_data is None:
+        return FreeWeatherService.default_weather(city)
+    return weather_data
+
+
+async def fetch_dashboard_data(city="Medellin", deadline=None):
+    """
+    Consulta clima y tipos de cambio de forma concurrente.
+
+    Args:
+        city: Ciudad para el clima
+        deadline: Plazo total en segundos (por defecto EXTERNAL_SERVICES_DEADLINE).
+            Cada petición tiene un timeout menor (REQUEST_TIMEOUT_SHARE del
+            plazo); las consultas que aun así no terminan a tiempo se cancelan
+            y se usa su valor por defecto.
+
+    Returns:
+        dict con 'weather_data', 'exchange_rates' y 'usd_to_cop'
+    """
+    if deadline is None:
+        deadline = getattr(settings, 'EXTERNAL_SERVICES_DEADLINE', REQUEST_TIMEOUT)
+    request_timeout = min(REQUEST_TIMEOUT, deadline * REQUEST_TIMEOUT_SHARE)
+    defaults = {
+        'weather_data': FreeWeatherService.default_weather(city),
+        'exchange_rates': None,
+    }
+
+    client = get_client()
+    tasks = {
+        'weather_data': asyncio.create_task(get_weather_simple(client, city, request_timeout)),
+        'exchange_rates': asyncio.create_task(get_exchange_rates(client, request_timeout)),
+    }
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    result = {}
+    for name, task in tasks.items():
+        if task not in done:
+            logger.warning(f"Servicio externo '{name}' sin respuesta tras {deadline}s")
+            result[name] = defaults[name]
+        elif task.exception() is not None:
+            logger.error(f"Error en servicio externo '{name}': {task.exception()}")
+            result[name] = defaults[name]
+        else:
+            result[name] = task.result()
+    result['usd_to_cop'] = ExchangeRateService.extract_rate(result['exchange_rates'], 'COP')
+    return result
@@ -0,0 +1,93 @@
+"""
+Suite de benchmark de las vistas y endpoints principales.
+
+Recorre cada endpoint con el cliente de pruebas de Django autenticado como
+un usuario dado y mide el tiempo de respuesta (incluido el consumo de las
+respuestas en streaming) y la cantidad de consultas SQL. La primera
+ejecución se hace con la caché de agregados del usuario invalidada (fría)
+y las siguientes con la caché caliente.
+"""
+import statistics
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import aggregate_cache
+
+ENDPOINTS = [
+    ('dashboard', lambda: reverse('dashboard:dashboard')),
+    ('dashboard_stats_api', lambda: reverse('dashboard:dashboard_stats_api')),
+    ('transaction_list', lambda: reverse('transactions:transaction_list')),
+    ('transaction_list_last_page', lambda: reverse('transactions:transaction_list') + '?page=last'),
+    ('transaction_search', lambda: reverse('transactions:transaction_list') + '?search=super'),
+    ('budget_list', lambda: reverse('transactions:budget_list')),
+    ('recurring_list', lambda: reverse('transactions:recurring_transaction_list')),
+    ('stats_api', lambda: reverse('transactions:transaction_stats_api') + '?months=12'),
+    ('export_csv', lambda: reverse('transactions:export_transactions')),
+    ('export_excel', lambda: reverse('transactions:export_report', args=['excel'])),
+    ('export_pdf', lambda: reverse('transactions:export_report', args=['pdf'])),
+    ('api_transactions', lambda: reverse('transaction-list')),
+    ('api_transactions_summary', lambda: reverse('transaction-summary')),
+    ('api_categories', lambda: reverse('category-list')),
+    ('api_budgets', lambda: reverse('budget-list')),
+    ('api_budgets_current_month', lambda: reverse('budget-current-month')),
+    ('api_savings_goals', lambda: reverse('savings-goal-list')),
+    ('api_forecast', lambda: reverse('forecast')),
+]
+
+
+def _consume(response):
+    if response.streaming:
+        return sum(len(part) for part in response.streaming_content)
+    return len(response.content)
+
+
+def measure(client, url):
+    """Ejecuta un GET y retorna (segundos, consultas, bytes, status)."""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        size = _consume(response)
+        elapsed = time.perf_counter() - started
+    return elapsed, len(queries), size, response.status_code
+
+
+def run(user, repeat=3, only=None, skip=()):
+    """
+    Mide cada endpoint para `user`.
+
+    Args:
+        user: Usuario con el que se autentica el cliente
+        repeat: Ejecuciones por endpoint (la primera en frío)
+        only: Nombres de endpoints a medir (por defecto todos)
+        skip: Nombres de endpoints a omitir
+
+    Returns:
+        list de dicts con 'endpoint', 'status', 'cold_ms', 'warm_ms'
+        (mediana de las ejecuciones en caliente), 'cold_queries',
+        'warm_queries' y 'bytes'
+    """
+    client = Client()
+    client.force_login(user)
+    results = []
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        for name, url in ENDPOINTS:
+            if (only and name not in only) or name in skip:
+                continue
+            url = url()
+            aggregate_cache.bump_version(user.pk)
+            cold_seconds, cold_queries, size, status = measure(client, url)
+            warm = [measure(client, url) for _ in range(max(repeat - 1, 0))]
+            results.append({
+                'endpoint': name,
+                'status': status,
+                'cold_ms': round(cold_seconds * 1000, 1),
+                'warm_ms': round(statistics.median(sample[0] for sample in warm) * 1000, 1) if warm else None,
+                'cold_queries': cold_queries,
+                'warm_queries': warm[-1][1] if warm else None,
+                'bytes': size,
+            })
+    return results
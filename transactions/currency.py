@@ -0,0 +1,264 @@
+"""
+Conversión de montos entre monedas.
+
+Las tasas se guardan a diario en ExchangeRateSnapshot (unidades de cada
+moneda por 1 USD) desde ExchangeRateService. CurrencyConverter carga una
+vez las tasas vigentes en una fecha y convierte a una moneda de reporte:
+
+- dentro de la base de datos, con expression(): un CASE sobre la columna de
+  moneda con un factor constante por moneda, de modo que totals(),
+  category_totals() y los acumulados mensuales suman ya convertido en la
+  misma consulta agregada;
+- en memoria, con convert_array() / convert_queryset(): arreglos numpy
+  multiplicados por el factor de cada moneda en una sola pasada.
+
+Las tasas vigentes de cada fecha se guardan en la caché bajo una versión
+que snapshot_rates() incrementa, así que la conversión no agrega consultas
+a los requests mientras no lleguen tasas nuevas.
+
+Los montos en una moneda sin tasa conocida no se suman a los totales
+convertidos (mezclarían monedas): expression() los deja en NULL y
+convert_array() en NaN. unconvertible lista esas monedas y los totales de
+los querysets cuentan las filas excluidas en 'unconverted', para avisarlo.
+"""
+import logging
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from finance import caching
+
+from .models import CURRENCY_CHOICES, ExchangeRateSnapshot, default_currency
+
+logger = logging.getLogger(__name__)
+
+CURRENCY_CODES = [code for code, _ in CURRENCY_CHOICES]
+BASE_CURRENCY = 'USD'
+
+KEY_PREFIX = 'finance:fx'
+VERSION_KEY = f'{KEY_PREFIX}:version'
+
+# Tipo de salida de las expresiones convertidas
+CONVERTED_FIELD = models.DecimalField(max_digits=20, decimal_places=2)
+RATE_FIELD = models.DecimalField(max_digits=18, decimal_places=6)
+
+
+def home_currency(user):
+    """Moneda principal del usuario (la de su perfil, o DEFAULT_CURRENCY)."""
+    try:
+        return user.profile.home_currency
+    except Exception:
+        return default_currency()
+
+
+def _rates_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Basada en el reloj, como en aggregate_cache: si la clave se pierde,
+        # la nueva versión no coincide con la de entradas anteriores
+        version = int(time.time() * 1000)
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _bump_rates_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def rates_on(day=None):
+    """
+    Tasas vigentes en `day` (por defecto hoy): las de la última fecha con
+    tasas guardadas que no sea posterior. Se leen de la caché, o de la base
+    de datos en una sola consulta (TTL 'fx_rates' de CACHE_TTLS).
+
+    Returns:
+        (dict moneda -> Decimal unidades por USD, fecha de las tasas o None)
+    """
+    day = day or timezone.now().date()
+    key = f'{KEY_PREFIX}:{_rates_version()}:{day.isoformat()}'
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    latest = ExchangeRateSnapshot.objects.filter(date__lte=day).order_by('-date').values('date')[:1]
+    rates = {BASE_CURRENCY: Decimal('1')}
+    rates_date = None
+    for rates_date, code, rate in (
+        ExchangeRateSnapshot.objects.filter(date=Subquery(latest)).values_list('date', 'currency', 'rate')
+    ):
+        rates[code] = rate
+    cache.set(key, (rates, rates_date), caching.ttl('fx_rates', 3600))
+    return rates, rates_date
+
+
+def snapshot_rates(day=None, data=None):
+    """
+    Guarda las tasas del día desde ExchangeRateService (o desde `data`, con el
+    mismo formato {'rates': {...}}) para las monedas soportadas. Reemplaza las
+    del mismo día si ya existían.
+
+    Returns:
+        int: Número de tasas guardadas (0 si el servicio no respondió)
+    """
+    if data is None:
+        from .services import ExchangeRateService
+        data = ExchangeRateService.get_exchange_rates()
+    if not data or 'rates' not in data:
+        return 0
+
+    day = day or timezone.now().date()
+    snapshots = [
+        ExchangeRateSnapshot(date=day, currency=code, rate=Decimal(str(data['rates'][code])))
+        for code in CURRENCY_CODES
+        if data['rates'].get(code)
+    ]
+    ExchangeRateSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['date', 'currency'],
+        update_fields=['rate'],
+    )
+    _bump_rates_version()
+    return len(snapshots)
+
+
+def rate_expression(currency_field, rates):
+    """CASE con la tasa (unidades por USD) de la moneda de cada fila; NULL si no se conoce."""
+    return Case(
+        *[When(**{currency_field: code}, then=Value(rate)) for code, rate in rates.items()],
+        default=Value(None),
+        output_field=RATE_FIELD,
+    )
+
+
+def to_outer_currency_expression(field, rates, outer_rate, currency_field='currency'):
+    """
+    Expresión de `field` convertido a la moneda de la fila externa de una
+    subconsulta, cuya tasa está anotada en `outer_rate`. Las filas en la
+    misma moneda no se convierten; sin tasa conocida quedan en NULL (fuera
+    de la suma).
+    """
+    return Case(
+        When(**{currency_field: OuterRef(currency_field)}, then=F(field)),
+        default=F(field) * OuterRef(outer_rate) / rate_expression(currency_field, rates),
+        output_field=CONVERTED_FIELD,
+    )
+
+
+class CurrencyConverter:
+    """
+    Convierte montos a la moneda `target` con un juego fijo de tasas.
+    """
+
+    def __init__(self, target, rates=None, rates_date=None):
+        self.target = target
+        if rates is None:
+            rates, rates_date = rates_on()
+        self.rates = rates
+        self.rates_date = rates_date
+        self.missing = set()
+
+    @classmethod
+    def for_user(cls, user, day=None):
+        """Conversor a la moneda principal del usuario con las tasas vigentes en `day`."""
+        rates, rates_date = rates_on(day)
+        return cls(home_currency(user), rates, rates_date)
+
+    @property
+    def cache_tag(self):
+        """Identifica moneda y tasas, para incluirlo en claves de caché de agregados convertidos."""
+        return f"{self.target}@{self.rates_date.isoformat() if self.rates_date else 'none'}"
+
+    @property
+    def unconvertible(self):
+        """Monedas soportadas que no se pueden convertir a la moneda destino (sin tasa)."""
+        return [code for code in CURRENCY_CODES if code != self.target and not self._has_rate(code)]
+
+    def _has_rate(self, currency):
+        return bool(self.rates.get(currency)) and bool(self.rates.get(self.target))
+
+    def factor(self, currency):
+        """Factor por el que se multiplica un monto en `currency` (None si falta la tasa)."""
+        if currency == self.target:
+            return Decimal('1')
+        source, target = self.rates.get(currency), self.rates.get(self.target)
+        if not source or not target:
+            if currency not in self.missing:
+                self.missing.add(currency)
+                logger.warning(f"Sin tasa de cambio para convertir {currency} a {self.target}")
+            return None
+        return target / source
+
+    def convert(self, amount, currency):
+        """Convierte un monto suelto (Decimal redondeado a centavos; None sin tasa)."""
+        factor = self.factor(currency)
+        if factor is None:
+            return None
+        return (Decimal(str(amount)) * factor).quantize(Decimal('0.01'))
+
+    def expression(self, field='amount', currency_field='currency'):
+        """
+        Expresión de `field` convertido a la moneda destino, para usar dentro
+        de Sum() u otras agregaciones. Las filas en monedas sin tasa conocida
+        valen NULL, así que Sum() las deja fuera.
+        """
+        whens = [When(**{currency_field: self.target}, then=F(field))]
+        for code in CURRENCY_CODES:
+            if code != self.target and self._has_rate(code):
+                whens.append(When(**{currency_field: code}, then=F(field) * Value(self.factor(code))))
+        return Case(*whens, default=Value(None), output_field=CONVERTED_FIELD)
+
+    def unconverted_count(self, field='id', currency_field='currency'):
+        """
+        Agregado que cuenta las filas en monedas sin tasa (las que expression()
+        deja fuera); con field='count' suma la cantidad de los acumulados.
+        """
+        unconvertible = self.unconvertible
+        if not unconvertible:
+            return Value(0)
+        condition = models.Q(**{f'{currency_field}__in': unconvertible})
+        if field == 'id':
+            return models.Count('id', filter=condition)
+        return Coalesce(models.Sum(field, filter=condition), 0)
+
+    def convert_array(self, amounts, currencies):
+        """
+        Convierte arreglos paralelos de montos y monedas en una sola pasada.
+
+        Returns:
+            numpy.ndarray de float con los montos convertidos (NaN en las
+            monedas sin tasa; sumar con numpy.nansum)
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        currencies = np.asarray(currencies)
+        if amounts.size == 0:
+            return amounts
+        codes, inverse = np.unique(currencies, return_inverse=True)
+        factors = np.array([
+            float(factor) if (factor := self.factor(code)) is not None else np.nan
+            for code in codes
+        ])
+        return amounts * factors[inverse.reshape(amounts.shape)]
+
+    def convert_queryset(self, queryset, amount_field='amount', currency_field='currency'):
+        """
+        Lee solo monto y moneda del queryset y los convierte con convert_array.
+
+        Returns:
+            numpy.ndarray de float, en el orden del queryset
+        """
+        rows = list(queryset.values_list(amount_field, currency_field))
+        if not rows:
+            return np.array([], dtype=float)
+        amounts, currencies = zip(*rows)
+        return self.convert_array(amounts, currencies)
@@ -0,0 +1,94 @@
+"""
+Utilidades para exportar transacciones en streaming.
+
+Recorren el queryset por bloques con un cursor del lado del servidor
+(QuerySet.iterator) y leen solo las columnas necesarias con values_list,
+de modo que la memoria del worker se mantiene constante sin importar
+cuántas filas se exporten.
+
+En PostgreSQL la lectura se hace dentro de una transacción: fuera de ella
+Django declara el cursor WITH HOLD y el servidor materializa el resultado
+completo al confirmar.
+"""
+import csv
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.db import connections, transaction as db_transaction
+
+from .models import Transaction
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = ('id', 'date', 'transaction_type', 'amount', 'currency', 'description', 'category__name')
+
+
+class Echo:
+    """Objeto tipo archivo que devuelve lo escrito en vez de almacenarlo (para csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+def _tags_for(transaction_ids):
+    """Retorna {transaction_id: [nombres de etiquetas]} para un bloque de transacciones."""
+    through = Transaction.tags.through
+    tags = defaultdict(list)
+    rows = (
+        through.objects
+        .filter(transaction_id__in=transaction_ids)
+        .order_by('tag__name')
+        .values_list('transaction_id', 'tag__name')
+    )
+    for transaction_id, tag_name in rows:
+        tags[transaction_id].append(tag_name)
+    return tags
+
+
+def iter_transaction_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE, with_tags=True):
+    """
+    Itera las transacciones del queryset como tuplas
+    (id, date, transaction_type, amount, currency, description, category_name, tags).
+
+    Las etiquetas se resuelven con una consulta por bloque de `chunk_size`
+    filas, nunca una por fila.
+    """
+    streaming = (
+        db_transaction.atomic(using=queryset.db)
+        if connections[queryset.db].vendor == 'postgresql'
+        else nullcontext()
+    )
+    with streaming:
+        rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield from _with_tags(chunk, with_tags)
+                chunk = []
+        if chunk:
+            yield from _with_tags(chunk, with_tags)
+
+
+def _with_tags(chunk, with_tags):
+    tags = _tags_for([row[0] for row in chunk]) if with_tags else {}
+    for row in chunk:
+        yield row + (tags.get(row[0], []),)
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Genera el CSV de transacciones línea por línea."""
+    type_display = dict(Transaction.TRANSACTION_TYPES)
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Fecha', 'Tipo', 'Monto', 'Moneda', 'Descripción', 'Categoría', 'Etiquetas'])
+    rows = iter_transaction_rows(queryset, chunk_size)
+    for _, date, transaction_type, amount, currency, description, category_name, tags in rows:
+        yield writer.writerow([
+            date.strftime('%d/%m/%Y'),
+            type_display.get(transaction_type, transaction_type),
+            amount,
+            currency,
+            description,
+            category_name or '',
+            ', '.join(tags),
+        ])
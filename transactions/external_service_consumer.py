@@ -2,10 +2,12 @@
 Consumidor de servicios externos de otros equipos.
 Este módulo se encarga de consumir APIs de equipos precedentes.
 """
-import requests
-from django.core.cache import cache
 import logging
 
+from finance import caching, http_client
+
+from . import service_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +20,7 @@ class ExternalServiceConsumer:
     # TODO: Configurar la URL del servicio del equipo precedente
     # Ejemplo: "https://api-equipo-previo.example.com/api/"
     BASE_URL = None
+    CACHE_TIMEOUT = 300  # 5 minutos
     
     @classmethod
     def set_base_url(cls, url):
@@ -40,27 +43,29 @@ class ExternalServiceConsumer:
             logger.warning("Base URL del servicio externo no configurada")
             return None
         
-        cache_key = f'external_service_{endpoint}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
+        url = f"{ExternalServiceConsumer.BASE_URL.rstrip('/')}/{endpoint.lstrip('/')}"
+        return service_cache.get_or_refresh(
+            f'external_service_{url}',
+            lambda: ExternalServiceConsumer.request_json(url, timeout),
+            caching.ttl('external_service', ExternalServiceConsumer.CACHE_TIMEOUT),
+        )
+    
+    @staticmethod
+    def request_json(url, timeout=10):
+        """
+        GET al servicio externo sin pasar por la caché.
         
+        Returns:
+            dict o list con la respuesta JSON, o None si hay error
+        """
         try:
-            url = f"{ExternalServiceConsumer.BASE_URL.rstrip('/')}/{endpoint.lstrip('/')}"
-            response = requests.get(url, timeout=timeout)
-            
+            response = http_client.get(url, timeout=timeout)
             if response.status_code == 200:
-                data = response.json()
-                # Cachear por 5 minutos
-                cache.set(cache_key, data, 300)
-                return data
-            else:
-                logger.warning(f"Error al consumir servicio externo: {response.status_code}")
-                return None
+                return response.json()
+            logger.warning(f"Error al consumir servicio externo: {response.status_code}")
         except Exception as e:
             logger.error(f"Error al consumir servicio externo: {str(e)}")
-            return None
+        return None
     
     @staticmethod
     def get_external_items(endpoint='items/'):
@@ -0,0 +1,180 @@
+"""
+Proyección de flujo de caja.
+
+Proyecta el saldo diario de los próximos meses a partir de las
+transacciones recurrentes activas y del gasto/ingreso histórico promedio
+por categoría que no proviene de recurrencias. Todo el cálculo se hace
+sobre arrays de NumPy (un elemento por día del horizonte): las ocurrencias
+de cada recurrencia se obtienen con el motor vectorizado de recurrence y
+se suman por día con bincount. Los montos se expresan en la moneda
+principal del usuario (con las tasas vigentes en la fecha de referencia).
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import MonthlyRollup, RecurringTransaction, Transaction
+from . import aggregate_cache, recurrence
+from .currency import CurrencyConverter
+
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 60
+DEFAULT_HISTORY_MONTHS = 6
+MAX_HISTORY_MONTHS = 24
+
+
+def _add_months(value, months):
+    """Primer día del mes que está `months` meses después del de `value`."""
+    return (np.datetime64(value, 'M') + months).astype('datetime64[D]').astype(object)
+
+
+def category_averages(user, today, history_months, converter):
+    """
+    Promedio mensual por (categoría, tipo) de los últimos `history_months`
+    meses completos, descontando lo generado por recurrencias (que ya se
+    proyecta por separado).
+
+    Returns:
+        list de dicts con 'category_id', 'category', 'transaction_type' y 'monthly_average'
+    """
+    window_end = today.replace(day=1)
+    window_start = _add_months(window_end, -history_months)
+
+    totals = {}
+    rollup_rows = (
+        MonthlyRollup.objects
+        .filter(user=user, month__gte=window_start, month__lt=window_end)
+        .values('category_id', 'category__name', 'transaction_type')
+        .annotate(amount=Sum(converter.expression('total')))
+    )
+    for row in rollup_rows:
+        key = (row['category_id'], row['transaction_type'])
+        totals[key] = [row['category__name'], float(row['amount'])]
+
+    recurring_rows = (
+        Transaction.objects
+        .filter(user=user, date__gte=window_start, date__lt=window_end, recurring_transaction__isnull=False)
+        .order_by()
+        .values('category_id', 'transaction_type')
+        .annotate(amount=Sum(converter.expression('amount')))
+    )
+    for row in recurring_rows:
+        key = (row['category_id'], row['transaction_type'])
+        if key in totals:
+            totals[key][1] -= float(row['amount'])
+
+    averages = []
+    for (category_id, transaction_type), (name, amount) in totals.items():
+        average = round(amount / history_months, 2)
+        if average > 0:
+            averages.append({
+                'category_id': category_id,
+                'category': name or 'Sin categoría',
+                'transaction_type': transaction_type,
+                'monthly_average': average,
+            })
+    averages.sort(key=lambda item: -item['monthly_average'])
+    return averages
+
+
+def build_forecast(user, months=DEFAULT_MONTHS, history_months=DEFAULT_HISTORY_MONTHS, today=None,
+                   converter=None):
+    """
+    Calcula la proyección de saldo diario desde mañana hasta `months` meses.
+
+    Las ocurrencias recurrentes vencidas y aún no registradas se cuentan el
+    primer día del horizonte.
+
+    Returns:
+        dict serializable con el saldo inicial, la serie diaria, el resumen
+        mensual y los promedios por categoría usados
+    """
+    today = today or timezone.now().date()
+    converter = converter or CurrencyConverter.for_user(user, today)
+    start = today + timedelta(days=1)
+    end = _add_months(start, months) - timedelta(days=1)
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    n_days = len(days)
+
+    starting_balance = float(MonthlyRollup.objects.filter(user=user).totals(converter)['balance'])
+
+    # Recurrencias: todas las ocurrencias del horizonte en una sola expansión,
+    # sumadas por día con bincount
+    recurrences = list(
+        RecurringTransaction.objects.filter(user=user, is_active=True)
+        .only('amount', 'currency', 'transaction_type', 'frequency', 'start_date', 'end_date', 'next_occurrence')
+    )
+    owners, dates = recurrence.expand_series(recurrences, end)
+    offsets = np.clip((dates - days[0]).astype(np.int64), 0, None)
+    # Las recurrencias en monedas sin tasa quedan fuera (NaN -> 0)
+    converted = np.nan_to_num(converter.convert_array(
+        [recurring.amount for recurring in recurrences],
+        [recurring.currency for recurring in recurrences],
+    ))
+    types = np.array([recurring.transaction_type for recurring in recurrences])
+    daily = {}
+    for transaction_type in ('income', 'expense'):
+        amounts = np.where(types == transaction_type, converted, 0.0) if len(recurrences) else np.zeros(0)
+        weights = amounts[owners] if len(owners) else None
+        daily[transaction_type] = np.bincount(offsets, weights=weights, minlength=n_days).astype(float)
+    recurring_income = daily['income'].sum()
+    recurring_expense = daily['expense'].sum()
+
+    # Promedios históricos: tasa diaria constante (promedio mensual * 12 / 365)
+    averages = category_averages(user, today, history_months, converter)
+    for item in averages:
+        daily[item['transaction_type']] += item['monthly_average'] * 12 / 365
+
+    net = daily['income'] - daily['expense']
+    balance = starting_balance + np.cumsum(net)
+
+    # Resumen mensual con reduceat sobre los inicios de cada mes
+    month_of_day = days.astype('datetime64[M]')
+    month_starts = np.flatnonzero(np.r_[True, month_of_day[1:] != month_of_day[:-1]])
+    monthly_income = np.add.reduceat(daily['income'], month_starts)
+    monthly_expense = np.add.reduceat(daily['expense'], month_starts)
+    month_end_balance = balance[np.r_[month_starts[1:] - 1, n_days - 1]]
+
+    return {
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'months': months,
+        'history_months': history_months,
+        'currency': converter.target,
+        'starting_balance': round(starting_balance, 2),
+        'ending_balance': round(float(balance[-1]), 2),
+        'lowest_balance': round(float(balance.min()), 2),
+        'lowest_balance_date': str(days[int(balance.argmin())]),
+        'recurring_count': len(recurrences),
+        'recurring_income': round(float(recurring_income), 2),
+        'recurring_expense': round(float(recurring_expense), 2),
+        'daily': {
+            'dates': days.astype(str).tolist(),
+            'balance': np.round(balance, 2).tolist(),
+        },
+        'monthly': [
+            {
+                'month': str(month_of_day[index]),
+                'income': round(float(income), 2),
+                'expense': round(float(expense), 2),
+                'balance': round(float(closing), 2),
+            }
+            for index, income, expense, closing in zip(
+                month_starts, monthly_income, monthly_expense, month_end_balance
+            )
+        ],
+        'category_averages': averages,
+    }
+
+
+def get_forecast(user, months=DEFAULT_MONTHS, history_months=DEFAULT_HISTORY_MONTHS, today=None):
+    """Proyección memoizada bajo la versión de datos del usuario."""
+    today = today or timezone.now().date()
+    converter = CurrencyConverter.for_user(user, today)
+    return aggregate_cache.memoize(
+        user.id,
+        f"forecast:{today.isoformat()}:{months}:{history_months}:{converter.cache_tag}",
+        lambda: build_forecast(user, months, history_months, today, converter),
+    )
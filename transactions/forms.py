@@ -2,16 +2,38 @@ from django import forms
 from django.utils import timezone
 from django.db import models
 from datetime import datetime
-from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction
+import os
+from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction, default_currency
+from .currency import home_currency
 
 
-class TransactionForm(forms.ModelForm):
+class CurrencyFormMixin:
+    """
+    Campo de moneda opcional: si no se envía se conserva la moneda actual o,
+    al crear, se usa la moneda principal del usuario (así los clientes que no
+    conocen el campo siguen funcionando).
+    """
+    def setup_currency(self, user):
+        if self.instance.pk:
+            self.default_currency = self.instance.currency
+        else:
+            self.default_currency = home_currency(user) if user else default_currency()
+        self.fields['currency'].required = False
+        self.fields['currency'].widget.attrs.update({'class': 'form-select', 'style': 'max-width: 7rem'})
+        if not self.instance.pk:
+            self.initial.setdefault('currency', self.default_currency)
+    
+    def clean_currency(self):
+        return self.cleaned_data.get('currency') or self.default_currency
+
+
+class TransactionForm(CurrencyFormMixin, forms.ModelForm):
     """
     Formulario para crear y editar transacciones.
     """
     class Meta:
         model = Transaction
-        fields = ['amount', 'description', 'date', 'transaction_type', 'category', 'tags']
+        fields = ['amount', 'currency', 'description', 'date', 'transaction_type', 'category', 'tags']
         widgets = {
             'amount': forms.NumberInput(attrs={
                 'class': 'form-control',
@@ -42,6 +64,7 @@ class TransactionForm(forms.ModelForm):
     
     def __init__(self, user=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.setup_currency(user)
         # Establecer fecha por defecto
         if not self.instance.pk:
             self.fields['date'].initial = timezone.now().date()
@@ -171,11 +194,11 @@ class TagForm(forms.ModelForm):
         }
 
 
-class BudgetForm(forms.ModelForm):
+class BudgetForm(CurrencyFormMixin, forms.ModelForm):
     """Formulario para crear y editar presupuestos."""
     class Meta:
         model = Budget
-        fields = ['category', 'amount', 'month']
+        fields = ['category', 'amount', 'currency', 'month']
         widgets = {
             'category': forms.Select(attrs={
                 'class': 'form-select'
@@ -194,6 +217,7 @@ class BudgetForm(forms.ModelForm):
     
     def __init__(self, user=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.setup_currency(user)
         # Configurar formato de entrada para aceptar YYYY-MM
         self.fields['month'].input_formats = ['%Y-%m', '%Y-%m-%d']
         if user:
@@ -318,11 +342,11 @@ class SavingsGoalForm(forms.ModelForm):
                 self.fields['icon'].choices = [(current_icon, f'Icono actual ({current_icon})')] + self.ICON_CHOICES
 
 
-class RecurringTransactionForm(forms.ModelForm):
+class RecurringTransactionForm(CurrencyFormMixin, forms.ModelForm):
     """Formulario para crear y editar transacciones recurrentes."""
     class Meta:
         model = RecurringTransaction
-        fields = ['name', 'amount', 'transaction_type', 'category', 'frequency', 'start_date', 'end_date', 'description']
+        fields = ['name', 'amount', 'currency', 'transaction_type', 'category', 'frequency', 'start_date', 'end_date', 'description']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -360,6 +384,7 @@ class RecurringTransactionForm(forms.ModelForm):
     
     def __init__(self, user=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.setup_currency(user)
         if user:
             self.fields['category'].queryset = Category.objects.filter(user=user)
         
@@ -417,3 +442,48 @@ class TransactionFilterForm(forms.Form):
             raise forms.ValidationError('La fecha de inicio no puede ser posterior a la fecha de fin.')
         
         return cleaned_data
+
+
+class TransactionImportForm(forms.Form):
+    """Formulario para importar transacciones desde un archivo CSV u OFX."""
+    
+    FORMAT_CHOICES = [
+        ('', 'Detectar por extensión'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    ]
+    
+    file = forms.FileField(
+        label='Archivo',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.ofx,.qfx,text/csv'
+        })
+    )
+    
+    file_format = forms.ChoiceField(
+        label='Formato',
+        choices=FORMAT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    create_missing = forms.BooleanField(
+        label='Crear categorías y etiquetas que no existan',
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('file_format'):
+            extension = os.path.splitext(upload.name)[1].lower()
+            if extension == '.csv':
+                cleaned_data['file_format'] = 'csv'
+            elif extension in ('.ofx', '.qfx'):
+                cleaned_data['file_format'] = 'ofx'
+            else:
+                raise forms.ValidationError('No se pudo detectar el formato del archivo. Selecciónalo manualmente.')
+        return cleaned_data
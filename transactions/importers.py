@@ -0,0 +1,305 @@
+"""
+Importación masiva de transacciones desde archivos CSV u OFX.
+
+El archivo se lee en streaming, fila por fila. Las categorías y etiquetas
+se resuelven contra un diccionario en memoria cargado con una consulta por
+usuario, y las transacciones se insertan con bulk_create por lotes dentro
+de una transacción de base de datos, junto con sus filas M2M de etiquetas.
+Las filas inválidas se reportan con su número de fila sin abortar el resto.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction as db_transaction
+
+from .models import Category, Tag, Transaction
+from . import aggregate_cache, currency, rollups, search
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+MAX_AMOUNT = Decimal('99999999.99')
+
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%Y/%m/%d', '%Y%m%d')
+
+# Encabezados aceptados (en minúsculas) para cada campo de Transaction.
+# Incluye los del CSV que genera export_transactions.
+COLUMN_ALIASES = {
+    'date': ('fecha', 'date'),
+    'transaction_type': ('tipo', 'type', 'transaction_type'),
+    'amount': ('monto', 'amount', 'valor', 'value'),
+    'description': ('descripción', 'descripcion', 'description', 'concepto', 'memo'),
+    'category': ('categoría', 'categoria', 'category'),
+    'tags': ('etiquetas', 'tags'),
+    'currency': ('moneda', 'currency'),
+}
+
+TYPE_ALIASES = {
+    'income': 'income',
+    'ingreso': 'income',
+    'credit': 'income',
+    'expense': 'expense',
+    'gasto': 'expense',
+    'debit': 'expense',
+}
+
+# TRNTYPE de OFX que solo pueden ser salidas de dinero. En OFX la dirección
+# la da el signo de TRNAMT; estos tipos solo cuentan como gasto cuando el
+# banco exporta el monto sin signo.
+OFX_DEBIT_TYPES = {'DEBIT', 'POS', 'ATM', 'CHECK', 'FEE', 'SRVCHG', 'PAYMENT', 'DIRECTDEBIT', 'REPEATPMT'}
+
+
+class ImportRowError(ValueError):
+    """Error de validación de una fila del archivo importado."""
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    # OFX: 20250131 o 20250131120000[-5:EST]
+    if len(value) >= 8 and value[:8].isdigit():
+        value = value[:8]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ImportRowError(f'Fecha inválida: "{value}"')
+
+
+def parse_amount(value):
+    raw = (value or '').strip().replace('$', '').replace(' ', '')
+    # Aceptar "1.234,56" además de "1234.56"
+    if ',' in raw and '.' in raw and raw.rfind(',') > raw.rfind('.'):
+        raw = raw.replace('.', '').replace(',', '.')
+    elif ',' in raw and '.' not in raw:
+        raw = raw.replace(',', '.')
+    else:
+        raw = raw.replace(',', '')
+    try:
+        amount = Decimal(raw)
+        if not amount.is_finite():
+            raise InvalidOperation
+        return amount.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ImportRowError(f'Monto inválido: "{value}"')
+
+
+def iter_csv_rows(fileobj, encoding='utf-8-sig'):
+    """
+    Itera las filas de un CSV como diccionarios {campo: valor} usando
+    COLUMN_ALIASES para mapear los encabezados a campos de Transaction.
+    """
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+
+    header = next(reader, None)
+    if not header:
+        return
+    columns = {}
+    for index, name in enumerate(header):
+        name = name.strip().lower()
+        for field, aliases in COLUMN_ALIASES.items():
+            if name in aliases and field not in columns:
+                columns[field] = index
+
+    missing = {'date', 'amount'} - set(columns)
+    if missing:
+        raise ImportRowError(f'Faltan columnas obligatorias: {", ".join(sorted(missing))}')
+
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        yield {
+            field: values[index] if index < len(values) else ''
+            for field, index in columns.items()
+        }
+
+
+OFX_FIELD_RE = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def iter_ofx_rows(fileobj, encoding='latin-1'):
+    """
+    Itera los movimientos (STMTTRN) de un archivo OFX, tanto en formato
+    SGML (OFX 1.x, sin etiquetas de cierre) como XML (OFX 2.x).
+    Lee el archivo por líneas y solo conserva el bloque en curso.
+    """
+    text = io.TextIOWrapper(fileobj, encoding=encoding, errors='replace')
+    block = None
+    for line in text:
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            block = []
+        if block is not None:
+            block.append(line)
+        if '</STMTTRN>' in upper and block is not None:
+            fields = {
+                name.upper(): value.strip()
+                for name, value in OFX_FIELD_RE.findall(''.join(block))
+            }
+            block = None
+            yield {
+                'date': fields.get('DTPOSTED', ''),
+                'amount': fields.get('TRNAMT', ''),
+                'ofx_type': fields.get('TRNTYPE', ''),
+                'description': fields.get('MEMO') or fields.get('NAME', ''),
+            }
+
+
+def build_transaction(user, row, categories, tags, create_missing=True):
+    """
+    Convierte una fila ya mapeada en una Transaction sin guardar y la lista
+    de ids de etiquetas. Lanza ImportRowError si la fila es inválida.
+    """
+    amount = parse_amount(row.get('amount'))
+    if 'ofx_type' in row:
+        # OFX: el signo de TRNAMT decide; TRNTYPE solo se usa para montos sin signo
+        ofx_type = (row.get('ofx_type') or '').strip().upper()
+        transaction_type = 'expense' if amount < 0 or ofx_type in OFX_DEBIT_TYPES else 'income'
+    else:
+        raw_type = (row.get('transaction_type') or '').strip().lower()
+        transaction_type = TYPE_ALIASES.get(raw_type)
+        if transaction_type is None:
+            if raw_type:
+                raise ImportRowError(f'Tipo inválido: "{row.get("transaction_type")}"')
+            # Sin columna de tipo: el signo del monto decide
+            transaction_type = 'expense' if amount < 0 else 'income'
+    amount = abs(amount)
+    if amount < Decimal('0.01') or amount > MAX_AMOUNT:
+        raise ImportRowError(f'Monto fuera de rango: {amount}')
+
+    transaction_date = parse_date(row.get('date'))
+
+    raw_currency = (row.get('currency') or '').strip().upper()
+    if raw_currency and raw_currency not in currency.CURRENCY_CODES:
+        raise ImportRowError(f'Moneda inválida: "{row.get("currency")}"')
+
+    category_name = (row.get('category') or '').strip()
+    if category_name and not create_missing and category_name.lower() not in categories:
+        raise ImportRowError(f'Categoría desconocida: "{category_name}"')
+
+    tag_names = [name.strip() for name in (row.get('tags') or '').split(',') if name.strip()]
+    if not create_missing:
+        for tag_name in tag_names:
+            if tag_name.lower() not in tags:
+                raise ImportRowError(f'Etiqueta desconocida: "{tag_name}"')
+
+    # La fila es válida: recién ahora se crean las categorías y etiquetas que falten
+    category_id = None
+    if category_name:
+        category_id = categories.get(category_name.lower())
+        if category_id is None:
+            category = Category.objects.create(
+                user=user, name=category_name[:100], transaction_type=transaction_type
+            )
+            category_id = categories[category_name.lower()] = category.id
+
+    tag_ids = []
+    for tag_name in tag_names:
+        tag_id = tags.get(tag_name.lower())
+        if tag_id is None:
+            tag_id = tags[tag_name.lower()] = Tag.objects.create(user=user, name=tag_name[:50]).id
+        tag_ids.append(tag_id)
+
+    instance = Transaction(
+        user=user,
+        amount=amount,
+        currency=raw_currency or currency.home_currency(user),
+        description=(row.get('description') or '').strip(),
+        date=transaction_date,
+        transaction_type=transaction_type,
+        category_id=category_id,
+    )
+    return instance, tag_ids
+
+
+def _flush(batch):
+    """Inserta un lote de transacciones y sus filas M2M de etiquetas."""
+    instances = [instance for instance, _ in batch]
+    Transaction.objects.bulk_create(instances)
+
+    through = Transaction.tags.through
+    links = [
+        through(transaction_id=instance.pk, tag_id=tag_id)
+        for instance, tag_ids in batch
+        for tag_id in set(tag_ids)
+    ]
+    if links:
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+    # bulk_create no dispara señales: actualizar acumulados e índice de búsqueda a mano
+    rollups.record_transactions(instances)
+    search.index_transactions([instance.pk for instance in instances])
+    return len(instances)
+
+
+def import_transactions(user, fileobj, file_format='csv', batch_size=IMPORT_BATCH_SIZE, create_missing=True):
+    """
+    Importa transacciones para `user` desde un archivo CSV u OFX.
+
+    Args:
+        user: Usuario dueño de las transacciones
+        fileobj: Archivo binario (p. ej. UploadedFile)
+        file_format: 'csv' u 'ofx'
+        batch_size: Filas por bulk_create
+        create_missing: Crear categorías y etiquetas que no existan
+
+    Returns:
+        dict con 'created', 'error_count' y 'errors' (lista de
+        {'row': n, 'error': mensaje}, limitada a MAX_REPORTED_ERRORS)
+    """
+    if file_format == 'ofx':
+        rows = iter_ofx_rows(fileobj)
+        first_row = 1
+    else:
+        rows = iter_csv_rows(fileobj)
+        first_row = 2  # la fila 1 es el encabezado
+
+    categories = {
+        name.lower(): pk
+        for pk, name in Category.objects.filter(user=user).values_list('id', 'name')
+    }
+    tags = {
+        name.lower(): pk
+        for pk, name in Tag.objects.filter(user=user).values_list('id', 'name')
+    }
+
+    created = 0
+    errors = []
+    error_count = 0
+    batch = []
+
+    with db_transaction.atomic():
+        try:
+            for row_number, row in enumerate(rows, start=first_row):
+                try:
+                    batch.append(build_transaction(user, row, categories, tags, create_missing))
+                except ImportRowError as e:
+                    error_count += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'row': row_number, 'error': str(e)})
+                    continue
+
+                if len(batch) >= batch_size:
+                    created += _flush(batch)
+                    batch = []
+        except (ImportRowError, UnicodeDecodeError, csv.Error) as e:
+            # Error que impide seguir leyendo el archivo (encabezado, codificación)
+            error_count += 1
+            errors.append({'row': None, 'error': str(e)})
+
+        if batch:
+            created += _flush(batch)
+
+    if created:
+        aggregate_cache.bump_version(user.id)
+
+    return {'created': created, 'error_count': error_count, 'errors': errors}
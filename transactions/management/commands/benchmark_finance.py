@@ -0,0 +1,78 @@
+"""
+Comando de management para medir las vistas y la API con distintos volúmenes de datos.
+
+Para cada tamaño crea un usuario sintético con seed_finance dentro de una
+transacción de base de datos que se revierte al final, mide cada endpoint
+(tiempo en frío y en caliente y cantidad de consultas SQL) y reporta una
+tabla por tamaño. Las cantidades de consultas deberían ser iguales en
+todos los tamaños; si crecen con las filas hay un N+1.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+
+from transactions import benchmark, seeding
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempos y consultas SQL del dashboard, listados, exportaciones y API con 1k/100k/1M transacciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=str, default='1000,100000,1000000',
+            help='Transacciones del usuario sintético, separadas por comas (por defecto 1000,100000,1000000)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Ejecuciones por endpoint (la primera en frío)')
+        parser.add_argument('--only', type=str, help='Endpoints a medir, separados por comas (opcional)')
+        parser.add_argument('--skip', type=str, default='', help='Endpoints a omitir, separados por comas')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del generador aleatorio')
+        parser.add_argument('--output', type=str, help='Archivo JSON donde agregar los resultados (opcional)')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError(f'Tamaños inválidos: {options["sizes"]}')
+        known = {name for name, _ in benchmark.ENDPOINTS}
+        only = [name for name in (options['only'] or '').split(',') if name]
+        skip = [name for name in options['skip'].split(',') if name]
+        unknown = set(only + skip) - known
+        if unknown:
+            raise CommandError(f'Endpoints desconocidos: {", ".join(sorted(unknown))}')
+
+        for size in sizes:
+            with db_transaction.atomic():
+                self.stdout.write(f'Generando {size} transacciones sintéticas...')
+                started = time.perf_counter()
+                user = seeding.seed(
+                    users=1, transactions=size, seed=options['seed'],
+                    prefix=f'benchmark_{int(time.time())}_',
+                )['users'][0]
+                self.stdout.write(f'Datos generados en {time.perf_counter() - started:.1f} s')
+
+                results = benchmark.run(user, repeat=options['repeat'], only=only, skip=skip)
+
+                # No dejar datos sintéticos en la base de datos
+                db_transaction.set_rollback(True)
+
+            self._write_table(size, results)
+            if options['output']:
+                with open(options['output'], 'a', encoding='utf-8') as fh:
+                    for result in results:
+                        fh.write(json.dumps({'rows': size, **result}) + '\n')
+
+    def _write_table(self, size, results):
+        self.stdout.write(self.style.SUCCESS(f'\n== {size} transacciones =='))
+        self.stdout.write(
+            f'{"endpoint":<28} {"status":>6} {"frío ms":>10} {"caliente ms":>12} '
+            f'{"consultas":>10} {"(caliente)":>10} {"bytes":>12}'
+        )
+        for result in results:
+            line = (
+                f'{result["endpoint"]:<28} {result["status"]:>6} {result["cold_ms"]:>10} '
+                f'{str(result["warm_ms"]):>12} {result["cold_queries"]:>10} '
+                f'{str(result["warm_queries"]):>10} {result["bytes"]:>12}'
+            )
+            self.stdout.write(self.style.ERROR(line) if result['status'] >= 400 else line)
@@ -0,0 +1,92 @@
+"""
+Comando de management para medir el generador de reportes PDF con muchas filas.
+
+Crea un usuario temporal con N transacciones sintéticas dentro de una
+transacción de base de datos que se revierte al final, genera el PDF y
+reporta el tiempo y el pico de memoria (RSS) del proceso.
+"""
+import json
+import random
+import resource
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+
+from transactions.models import Category, Transaction
+from transactions.report_generators import ReportGeneratorFactory
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS reporta bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class Command(BaseCommand):
+    help = 'Genera un reporte PDF de N transacciones sintéticas y mide tiempo y pico de RSS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Número de transacciones (por defecto 100000)')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del generador aleatorio')
+        parser.add_argument('--output', type=str, help='Archivo JSON donde agregar el resultado (opcional)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        rng = random.Random(options['seed'])
+
+        with db_transaction.atomic():
+            user = User.objects.create_user(username=f'benchmark_pdf_{int(time.time())}')
+            categories = list(Category.objects.filter(user=user)) or [None]
+
+            self.stdout.write(f'Creando {rows} transacciones sintéticas...')
+            start_date = date.today() - timedelta(days=3 * 365)
+            batch = []
+            for i in range(rows):
+                batch.append(Transaction(
+                    user=user,
+                    amount=Decimal(rng.randint(100, 500000)) / 100,
+                    description=f'Transacción de prueba {i}',
+                    date=start_date + timedelta(days=rng.randint(0, 3 * 365)),
+                    transaction_type='income' if rng.random() < 0.2 else 'expense',
+                    category=rng.choice(categories),
+                ))
+                if len(batch) >= 5000:
+                    Transaction.objects.bulk_create(batch)
+                    batch = []
+            if batch:
+                Transaction.objects.bulk_create(batch)
+
+            queryset = Transaction.objects.filter(user=user).select_related('category').order_by('-date')
+            generator = ReportGeneratorFactory.get_generator('pdf')
+
+            rss_before = peak_rss_mb()
+            started = time.perf_counter()
+            response = generator.generate(queryset, 'benchmark')
+            size = sum(len(part) for part in response.streaming_content) if response.streaming else len(response.content)
+            elapsed = time.perf_counter() - started
+            rss_after = peak_rss_mb()
+
+            # No dejar datos sintéticos en la base de datos
+            db_transaction.set_rollback(True)
+
+        result = {
+            'rows': rows,
+            'status': response.status_code,
+            'seconds': round(elapsed, 3),
+            'pdf_bytes': size,
+            'peak_rss_mb': round(rss_after, 1),
+            'peak_rss_delta_mb': round(rss_after - rss_before, 1),
+        }
+        self.stdout.write(self.style.SUCCESS(json.dumps(result)))
+
+        if options['output']:
+            with open(options['output'], 'a', encoding='utf-8') as fh:
+                fh.write(json.dumps(result) + '\n')
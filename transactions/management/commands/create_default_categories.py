@@ -1,9 +1,11 @@
 """
 Comando de management para crear categorías por defecto para usuarios existentes.
 """
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
-from transactions.utils import create_default_categories
+from transactions.utils import provision_default_categories
+
+BATCH_SIZE = 500
 
 
 class Command(BaseCommand):
@@ -18,58 +20,50 @@ class Command(BaseCommand):
         parser.add_argument(
             '--all',
             action='store_true',
-            help='Crear categorías para todos los usuarios',
+            help='Revisar todos los usuarios (los que ya tienen categorías se omiten salvo con --fill-missing)',
+        )
+        parser.add_argument(
+            '--fill-missing',
+            action='store_true',
+            help='Completar las categorías por defecto que falten aunque el usuario ya tenga categorías',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Usuarios por lote de inserción (por defecto {BATCH_SIZE})',
         )
 
     def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que cero.')
+
         if options['user']:
             try:
                 user = User.objects.get(username=options['user'])
-                self.create_categories_for_user(user)
             except User.DoesNotExist:
-                self.stdout.write(
-                    self.style.ERROR(f'Usuario "{options["user"]}" no encontrado.')
-                )
-        elif options['all']:
-            users = User.objects.all()
-            count = 0
-            for user in users:
-                if self.create_categories_for_user(user):
-                    count += 1
+                raise CommandError(f'Usuario "{options["user"]}" no encontrado.')
+            created = provision_default_categories([user], fill_missing=options['fill_missing'])
             self.stdout.write(
-                self.style.SUCCESS(f'Categorías creadas para {count} usuarios.')
+                self.style.SUCCESS(f'{created} categorías creadas para "{user.username}".')
             )
+            return
+
+        if options['all'] or options['fill_missing']:
+            users = User.objects.all()
+            description = 'usuarios revisados'
         else:
             # Por defecto, crear para usuarios sin categorías
-            users_without_categories = User.objects.filter(categories__isnull=True).distinct()
-            count = 0
-            for user in users_without_categories:
-                if self.create_categories_for_user(user):
-                    count += 1
-            self.stdout.write(
-                self.style.SUCCESS(f'Categorías creadas para {count} usuarios sin categorías.')
-            )
+            users = User.objects.filter(categories__isnull=True)
+            description = 'usuarios sin categorías'
 
-    def create_categories_for_user(self, user):
-        """Crea categorías por defecto para un usuario si no las tiene."""
-        from transactions.models import Category
-        
-        # Verificar si el usuario ya tiene categorías
-        if Category.objects.filter(user=user).exists():
-            self.stdout.write(
-                self.style.WARNING(f'El usuario "{user.username}" ya tiene categorías. Omitiendo...')
+        user_ids = list(users.order_by('pk').values_list('pk', flat=True).distinct())
+        created = 0
+        for start in range(0, len(user_ids), options['batch_size']):
+            created += provision_default_categories(
+                user_ids[start:start + options['batch_size']], fill_missing=options['fill_missing'],
             )
-            return False
-        
-        try:
-            create_default_categories(user)
-            self.stdout.write(
-                self.style.SUCCESS(f'Categorías creadas para "{user.username}"')
-            )
-            return True
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'Error creando categorías para "{user.username}": {e}')
-            )
-            return False
 
+        self.stdout.write(
+            self.style.SUCCESS(f'{created} categorías creadas para {len(user_ids)} {description}.')
+        )
@@ -0,0 +1,67 @@
+"""
+Comando de management que registra las transacciones recurrentes vencidas.
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from transactions import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Genera todas las ocurrencias pendientes de las transacciones recurrentes de todos los usuarios'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Fecha de corte YYYY-MM-DD (por defecto hoy)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=scheduler.BATCH_SIZE,
+            help=f'Recurrencias por transacción de base de datos (por defecto {scheduler.BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Quedarse en ejecución y procesar periódicamente',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=3600.0,
+            help='Segundos entre ejecuciones con --loop (por defecto 3600)',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Fecha inválida, use el formato YYYY-MM-DD.')
+        batch_size = max(1, options['batch_size'])
+
+        try:
+            while True:
+                close_old_connections()
+                result = scheduler.process_due(today=today, batch_size=batch_size)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{result["transactions"]} transacciones creadas de '
+                    f'{result["recurrences"]} recurrencias '
+                    f'({result["deactivated"]} finalizadas).'
+                ))
+                if result['failed']:
+                    self.stderr.write(self.style.ERROR(
+                        f'{len(result["failed"])} recurrencias con conflictos no se registraron: '
+                        f'{", ".join(str(pk) for pk in result["failed"])}'
+                    ))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Procesamiento de recurrencias detenido.')
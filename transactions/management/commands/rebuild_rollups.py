@@ -0,0 +1,50 @@
+"""
+Comando de management para reconstruir y verificar los acumulados mensuales.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from transactions import rollups
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los acumulados mensuales (MonthlyRollup) y los verifica contra las transacciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Nombre de usuario específico a reconstruir (opcional)',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Solo verificar los acumulados, sin reconstruirlos',
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuario "{options["user"]}" no encontrado.')
+
+        if not options['check']:
+            created = rollups.rebuild(user)
+            self.stdout.write(
+                self.style.SUCCESS(f'Acumulados reconstruidos: {created} filas.')
+            )
+
+        mismatches = rollups.verify(user)
+        if mismatches:
+            for key, expected, actual in mismatches[:20]:
+                user_id, month, transaction_type, category_id, currency = key
+                self.stdout.write(
+                    self.style.ERROR(
+                        f'Diferencia usuario={user_id} mes={month:%Y-%m} tipo={transaction_type} '
+                        f'categoría={category_id} moneda={currency}: esperado={expected} actual={actual}'
+                    )
+                )
+            raise CommandError(f'{len(mismatches)} acumulados no coinciden con las transacciones.')
+
+        self.stdout.write(self.style.SUCCESS('Los acumulados coinciden con las transacciones.'))
@@ -0,0 +1,35 @@
+"""
+Comando de management para reconstruir el índice de búsqueda de transacciones.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from transactions import search
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo de las transacciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Nombre de usuario específico a reindexar (opcional)',
+        )
+
+    def handle(self, *args, **options):
+        if search.backend(connection) is None:
+            raise CommandError(
+                f'El motor "{connection.vendor}" no tiene índice de búsqueda; se usa el filtro simple.'
+            )
+
+        user_id = None
+        if options['user']:
+            try:
+                user_id = User.objects.get(username=options['user']).pk
+            except User.DoesNotExist:
+                raise CommandError(f'Usuario "{options["user"]}" no encontrado.')
+
+        search.create_index(connection)
+        search.rebuild(connection, user_id=user_id)
+        self.stdout.write(self.style.SUCCESS('Índice de búsqueda reconstruido.'))
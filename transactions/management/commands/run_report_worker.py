@@ -0,0 +1,77 @@
+"""
+Comando de management que procesa la cola de reportes en segundo plano.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from transactions import report_jobs
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos de reportes pendientes (ReportJob) con un pool local de hilos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Número de hilos que generan reportes en paralelo (por defecto 2)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos de espera cuando no hay trabajos pendientes',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar los trabajos pendientes y terminar',
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=30,
+            help='Minutos tras los cuales un trabajo en proceso se considera abandonado',
+        )
+
+    def handle(self, *args, **options):
+        requeued = report_jobs.requeue_stale_jobs(timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'{requeued} trabajos abandonados devueltos a la cola.'))
+
+        workers = max(1, options['workers'])
+        self.stdout.write(f'Worker de reportes iniciado con {workers} hilos.')
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    processed = list(executor.map(self.work, range(workers)))
+                    done = sum(processed)
+                    if done:
+                        self.stdout.write(self.style.SUCCESS(f'{done} reportes procesados.'))
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write('Worker de reportes detenido.')
+
+    def work(self, _slot):
+        """Procesa trabajos en este hilo hasta vaciar la cola. Retorna cuántos procesó."""
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                job = report_jobs.process_next_job()
+                if job is None:
+                    return processed
+                processed += 1
+                self.stdout.write(f'Reporte {job.pk} ({job.format_type}): {job.get_status_display()}')
+        finally:
+            # Cada hilo tiene su propia conexión; cerrarla al terminar
+            connections.close_all()
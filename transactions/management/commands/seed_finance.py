@@ -0,0 +1,49 @@
+"""
+Comando de management para generar datos sintéticos de prueba de carga.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import seeding
+
+
+class Command(BaseCommand):
+    help = 'Genera usuarios con transacciones, etiquetas, presupuestos y recurrencias sintéticas (bulk_create, semilla fija)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Usuarios a crear (por defecto 1)')
+        parser.add_argument('--transactions', type=int, default=1000, help='Transacciones por usuario (por defecto 1000)')
+        parser.add_argument('--budgets', type=int, default=12, help='Presupuestos por usuario (por defecto 12)')
+        parser.add_argument('--recurring', type=int, default=5, help='Transacciones recurrentes por usuario (por defecto 5)')
+        parser.add_argument('--tags', type=int, default=8, help='Etiquetas por usuario (por defecto 8)')
+        parser.add_argument('--months', type=int, default=24, help='Meses hacia atrás que cubren las transacciones (por defecto 24)')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del generador aleatorio')
+        parser.add_argument('--prefix', type=str, default='seed_user_', help='Prefijo de los nombres de usuario')
+        parser.add_argument('--batch-size', type=int, default=seeding.BATCH_SIZE, help='Filas por bulk_create')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'transactions', 'budgets', 'recurring', 'tags', 'months', 'batch_size'):
+            if options[name] < (1 if name in ('users', 'months', 'batch_size') else 0):
+                raise CommandError(f'Valor inválido para --{name.replace("_", "-")}: {options[name]}')
+
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Ya existen usuarios con el prefijo "{options["prefix"]}"; usa otro --prefix.'
+            )
+
+        result = seeding.seed(
+            users=options['users'],
+            transactions=options['transactions'],
+            budgets=options['budgets'],
+            recurring=options['recurring'],
+            tags=options['tags'],
+            months=options['months'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Creados {len(result["users"])} usuarios, {result["transactions"]} transacciones, '
+            f'{result["tags"]} etiquetas, {result["budgets"]} presupuestos y '
+            f'{result["recurring"]} recurrencias. Contraseña: {seeding.SEED_PASSWORD}'
+        ))
@@ -0,0 +1,32 @@
+"""
+Comando de management que guarda las tasas de cambio del día.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import currency
+
+
+class Command(BaseCommand):
+    help = 'Guarda las tasas de cambio del día (unidades por USD) para convertir montos entre monedas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Fecha a la que se asignan las tasas, YYYY-MM-DD (por defecto hoy)',
+        )
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Fecha inválida, use el formato YYYY-MM-DD.')
+
+        saved = currency.snapshot_rates(day)
+        if not saved:
+            raise CommandError('El servicio de tipos de cambio no respondió; no se guardaron tasas.')
+        self.stdout.write(self.style.SUCCESS(f'{saved} tasas de cambio guardadas.'))
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# El DDL se copia aquí (y no se importa de transactions.search) para que la
+# migración siga creando el mismo esquema aunque el módulo cambie después.
+
+SQLITE_CREATE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_search_index USING fts5(
+        description, category, tags, user_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+SQLITE_FILL = """
+    INSERT INTO transactions_search_index (rowid, description, category, tags, user_id)
+    SELECT t.id, t.description, COALESCE(c.name, ''), COALESCE((
+        SELECT group_concat(g.name, ' ') FROM transactions_transaction_tags tt
+        JOIN transactions_tag g ON g.id = tt.tag_id WHERE tt.transaction_id = t.id
+    ), ''), t.user_id
+    FROM transactions_transaction t
+    LEFT JOIN transactions_category c ON c.id = t.category_id
+"""
+
+POSTGRES_CREATE = (
+    """
+    CREATE TABLE IF NOT EXISTS transactions_search_index (
+        transaction_id integer PRIMARY KEY
+            REFERENCES transactions_transaction (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        user_id integer NOT NULL,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS transactions_search_index_document "
+    "ON transactions_search_index USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS transactions_search_index_user ON transactions_search_index (user_id)",
+)
+
+POSTGRES_FILL = """
+    INSERT INTO transactions_search_index (transaction_id, user_id, document)
+    SELECT t.id, t.user_id,
+        setweight(to_tsvector('simple', COALESCE(t.description, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE((
+            SELECT string_agg(g.name, ' ') FROM transactions_transaction_tags tt
+            JOIN transactions_tag g ON g.id = tt.tag_id WHERE tt.transaction_id = t.id
+        ), '')), 'C')
+    FROM transactions_transaction t
+    LEFT JOIN transactions_category c ON c.id = t.category_id
+    ON CONFLICT (transaction_id) DO NOTHING
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            cursor.execute(SQLITE_CREATE)
+            cursor.execute(SQLITE_FILL)
+        elif vendor == 'postgresql':
+            for statement in POSTGRES_CREATE:
+                cursor.execute(statement)
+            cursor.execute(POSTGRES_FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS transactions_search_index")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_recurring_scheduler'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:00
+
+import transactions.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRateSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('currency', models.CharField(choices=[('COP', 'Peso colombiano'), ('USD', 'Dólar estadounidense'), ('EUR', 'Euro'), ('MXN', 'Peso mexicano'), ('ARS', 'Peso argentino'), ('CLP', 'Peso chileno'), ('PEN', 'Sol peruano'), ('BRL', 'Real brasileño'), ('GBP', 'Libra esterlina')], max_length=3, verbose_name='Moneda')),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=18, verbose_name='Unidades por USD')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Tasa de Cambio',
+                'verbose_name_plural': 'Tasas de Cambio',
+                'ordering': ['-date', 'currency'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='monthlyrollup',
+            name='unique_rollup_with_category',
+        ),
+        migrations.RemoveConstraint(
+            model_name='monthlyrollup',
+            name='unique_rollup_without_category',
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='currency',
+            field=models.CharField(choices=[('COP', 'Peso colombiano'), ('USD', 'Dólar estadounidense'), ('EUR', 'Euro'), ('MXN', 'Peso mexicano'), ('ARS', 'Peso argentino'), ('CLP', 'Peso chileno'), ('PEN', 'Sol peruano'), ('BRL', 'Real brasileño'), ('GBP', 'Libra esterlina')], default=transactions.models.default_currency, max_length=3, verbose_name='Moneda'),
+        ),
+        migrations.AddField(
+            model_name='monthlyrollup',
+            name='currency',
+            field=models.CharField(choices=[('COP', 'Peso colombiano'), ('USD', 'Dólar estadounidense'), ('EUR', 'Euro'), ('MXN', 'Peso mexicano'), ('ARS', 'Peso argentino'), ('CLP', 'Peso chileno'), ('PEN', 'Sol peruano'), ('BRL', 'Real brasileño'), ('GBP', 'Libra esterlina')], default=transactions.models.default_currency, max_length=3, verbose_name='Moneda'),
+        ),
+        migrations.AddField(
+            model_name='recurringtransaction',
+            name='currency',
+            field=models.CharField(choices=[('COP', 'Peso colombiano'), ('USD', 'Dólar estadounidense'), ('EUR', 'Euro'), ('MXN', 'Peso mexicano'), ('ARS', 'Peso argentino'), ('CLP', 'Peso chileno'), ('PEN', 'Sol peruano'), ('BRL', 'Real brasileño'), ('GBP', 'Libra esterlina')], default=transactions.models.default_currency, max_length=3, verbose_name='Moneda'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='currency',
+            field=models.CharField(choices=[('COP', 'Peso colombiano'), ('USD', 'Dólar estadounidense'), ('EUR', 'Euro'), ('MXN', 'Peso mexicano'), ('ARS', 'Peso argentino'), ('CLP', 'Peso chileno'), ('PEN', 'Sol peruano'), ('BRL', 'Real brasileño'), ('GBP', 'Libra esterlina')], default=transactions.models.default_currency, max_length=3, verbose_name='Moneda'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'month', 'transaction_type', 'category', 'currency'), name='unique_rollup_with_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'month', 'transaction_type', 'currency'), name='unique_rollup_without_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='exchangeratesnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'currency'), name='unique_rate_per_day'),
+        ),
+    ]
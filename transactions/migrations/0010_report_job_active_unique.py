@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Deja un solo trabajo activo por hash; los duplicados previos se marcan como fallidos."""
+    ReportJob = apps.get_model('transactions', 'ReportJob')
+    seen = set()
+    duplicates = []
+    active = ReportJob.objects.filter(status__in=['pending', 'running']).order_by('created_at', 'id')
+    for job_id, digest in active.values_list('id', 'filter_hash'):
+        if digest in seen:
+            duplicates.append(job_id)
+        seen.add(digest)
+    ReportJob.objects.filter(id__in=duplicates).update(
+        status='failed', error='Duplicado de otro trabajo activo idéntico.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_multi_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('filter_hash',), name='unique_active_report_job'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# transaction_id debe ser bigint como el BigAutoField de Transaction; la
+# 0008 lo creó como integer en PostgreSQL. SQLite no necesita cambios.
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE transactions_search_index ALTER COLUMN transaction_id TYPE bigint")
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("ALTER TABLE transactions_search_index ALTER COLUMN transaction_id TYPE integer")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_report_job_active_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# En PostgreSQL el índice pasa a la configuración finance_unaccent (simple +
+# unaccent) para que "cafe" encuentre "café" como en el FTS5 de SQLite
+# (remove_diacritics). Los documentos existentes se recalculan. El DDL se
+# copia aquí para no depender de transactions.search.
+
+CREATE_CONFIG = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'finance_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION finance_unaccent (COPY = simple);
+            ALTER TEXT SEARCH CONFIGURATION finance_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+        END IF;
+    END
+    $$
+    """,
+)
+
+REFILL = """
+    UPDATE transactions_search_index s SET document =
+        setweight(to_tsvector('{config}', COALESCE(t.description, '')), 'A') ||
+        setweight(to_tsvector('{config}', COALESCE(c.name, '')), 'B') ||
+        setweight(to_tsvector('{config}', COALESCE((
+            SELECT string_agg(g.name, ' ') FROM transactions_transaction_tags tt
+            JOIN transactions_tag g ON g.id = tt.tag_id WHERE tt.transaction_id = t.id
+        ), '')), 'C')
+    FROM transactions_transaction t
+    LEFT JOIN transactions_category c ON c.id = t.category_id
+    WHERE t.id = s.transaction_id
+"""
+
+
+def forwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            for statement in CREATE_CONFIG:
+                cursor.execute(statement)
+            cursor.execute(REFILL.format(config='finance_unaccent'))
+
+
+def backwards(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(REFILL.format(config='simple'))
+            cursor.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS finance_unaccent")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0011_search_index_bigint'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -1,8 +1,47 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
 from datetime import datetime, timedelta
+from decimal import Decimal
+
+from . import recurrence
+
+# Monedas soportadas (código ISO 4217). Las tasas se guardan en
+# ExchangeRateSnapshot como unidades de la moneda por 1 USD.
+CURRENCY_CHOICES = [
+    ('COP', 'Peso colombiano'),
+    ('USD', 'Dólar estadounidense'),
+    ('EUR', 'Euro'),
+    ('MXN', 'Peso mexicano'),
+    ('ARS', 'Peso argentino'),
+    ('CLP', 'Peso chileno'),
+    ('PEN', 'Sol peruano'),
+    ('BRL', 'Real brasileño'),
+    ('GBP', 'Libra esterlina'),
+]
+
+
+def default_currency():
+    """Moneda por defecto de montos y perfiles (DEFAULT_CURRENCY)."""
+    return getattr(settings, 'DEFAULT_CURRENCY', 'COP')
+
+
+def currency_field(verbose_name="Moneda"):
+    """CharField de moneda con las opciones y el valor por defecto comunes."""
+    return models.CharField(
+        max_length=3,
+        choices=CURRENCY_CHOICES,
+        default=default_currency,
+        verbose_name=verbose_name,
+    )
+
+
+def _amount_expression(field, converter):
+    """Expresión del monto `field`, convertida a la moneda de `converter` si se indica."""
+    return converter.expression(field) if converter is not None else models.F(field)
 
 
 class Category(models.Model):
@@ -58,6 +97,81 @@ class Tag(models.Model):
         return self.name
 
 
+class TransactionQuerySet(models.QuerySet):
+    """QuerySet con los totales de ingresos y gastos usados en vistas, API y reportes."""
+    
+    TRUNC_FUNCTIONS = {
+        'day': TruncDay,
+        'week': TruncWeek,
+        'month': TruncMonth,
+    }
+    
+    def _totals_expressions(self, converter=None):
+        amount = _amount_expression('amount', converter)
+        return {
+            'income': models.Sum(amount, filter=models.Q(transaction_type='income')),
+            'expense': models.Sum(amount, filter=models.Q(transaction_type='expense')),
+            'count': models.Count('id'),
+        }
+    
+    @staticmethod
+    def _with_balance(row):
+        income = row['income'] or Decimal('0')
+        expense = row['expense'] or Decimal('0')
+        row.update(income=income, expense=expense, balance=income - expense)
+        return row
+    
+    def totals(self, converter=None):
+        """
+        Retorna ingresos, gastos, balance y cantidad de transacciones del
+        queryset con una sola consulta de agregación condicional.
+        
+        Con `converter` (currency.CurrencyConverter) los montos se suman ya
+        convertidos a su moneda, dentro de la misma consulta; 'unconverted'
+        cuenta las transacciones que quedaron fuera por no tener tasa.
+        """
+        expressions = self._totals_expressions(converter)
+        if converter is not None:
+            expressions['unconverted'] = converter.unconverted_count()
+        return self._with_balance(self.order_by().aggregate(**expressions))
+    
+    def bucketed_totals(self, granularity='month', converter=None):
+        """
+        Igual que totals() pero agrupado por día, semana (inicia el lunes) o
+        mes, en una sola consulta. Retorna una lista de diccionarios con
+        'period' (primer día del periodo) ordenada cronológicamente.
+        """
+        trunc = self.TRUNC_FUNCTIONS[granularity]
+        rows = (
+            self.order_by()
+            .annotate(period=trunc('date'))
+            .values('period')
+            .annotate(**self._totals_expressions(converter))
+            .order_by('period')
+        )
+        return [self._with_balance(row) for row in rows]
+    
+    def monthly_totals(self, converter=None):
+        """
+        Igual que totals() pero agrupado por mes, en una sola consulta.
+        Retorna una lista de diccionarios con 'month' (primer día del mes)
+        ordenada cronológicamente.
+        """
+        rows = self.bucketed_totals('month', converter)
+        for row in rows:
+            row['month'] = row.pop('period')
+        return rows
+    
+    def category_totals(self, converter=None):
+        """Total y cantidad por categoría y tipo, de mayor a menor, en una sola consulta."""
+        return (
+            self.order_by()
+            .values('category__name', 'category__color', 'transaction_type')
+            .annotate(total=models.Sum(_amount_expression('amount', converter)), count=models.Count('id'))
+            .order_by('transaction_type', '-total')
+        )
+
+
 class Transaction(models.Model):
     """
     Modelo base para transacciones (ingresos y gastos).
@@ -74,6 +188,7 @@ class Transaction(models.Model):
         validators=[MinValueValidator(0.01)],
         verbose_name="Monto"
     )
+    currency = currency_field()
     description = models.TextField(blank=True, verbose_name="Descripción")
     date = models.DateField(default=timezone.now, verbose_name="Fecha")
     transaction_type = models.CharField(
@@ -101,6 +216,8 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
     
+    objects = TransactionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Transacción"
         verbose_name_plural = "Transacciones"
@@ -109,6 +226,15 @@ class Transaction(models.Model):
             models.Index(fields=['user', 'transaction_type']),
             models.Index(fields=['user', 'date']),
             models.Index(fields=['user', 'category']),
+            models.Index(fields=['user', 'date', 'created_at', 'id']),
+        ]
+        constraints = [
+            # Clave de idempotencia del procesamiento de recurrencias
+            models.UniqueConstraint(
+                fields=['recurring_transaction', 'date'],
+                condition=models.Q(recurring_transaction__isnull=False),
+                name='unique_recurring_occurrence',
+            ),
         ]
     
     def __str__(self):
@@ -125,6 +251,44 @@ class Transaction(models.Model):
         return self.transaction_type == 'expense'
 
 
+class BudgetQuerySet(models.QuerySet):
+    """QuerySet de presupuestos con cálculo del gasto en lote."""
+
+    def with_spending(self, rates=None):
+        """
+        Anota en cada presupuesto el total gastado en su categoría y mes
+        (`spent_total`), leyendo los acumulados mensuales en la misma consulta
+        en vez de lanzar un agregado por presupuesto.
+        
+        Los gastos en otras monedas se convierten a la del presupuesto con
+        `rates` (por defecto las últimas tasas guardadas, ver currency.rates_on).
+        """
+        from . import currency
+        if rates is None:
+            rates, _ = currency.rates_on()
+        rollup_rows = MonthlyRollup.objects.filter(
+            user=models.OuterRef('user'),
+            category=models.OuterRef('category'),
+            month=models.OuterRef('spent_month'),
+            transaction_type='expense',
+        )
+        spent = (
+            rollup_rows.order_by().values('user')
+            .annotate(spent=models.Sum(currency.to_outer_currency_expression('total', rates, 'budget_rate')))
+            .values('spent')[:1]
+        )
+        return self.annotate(
+            spent_month=TruncMonth('month'),
+            budget_rate=currency.rate_expression('currency', rates),
+        ).annotate(
+            spent_total=Coalesce(
+                models.Subquery(spent),
+                models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            )
+        )
+
+
 class Budget(models.Model):
     """
     Modelo para presupuestos mensuales por categoría.
@@ -143,6 +307,7 @@ class Budget(models.Model):
         validators=[MinValueValidator(0.01)],
         verbose_name="Monto del presupuesto"
     )
+    currency = currency_field()
     month = models.DateField(verbose_name="Mes del presupuesto")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Fecha de actualización")
@@ -153,25 +318,34 @@ class Budget(models.Model):
         ordering = ['-month', 'category__name']
         unique_together = [['user', 'category', 'month']]
     
+    objects = BudgetQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.category.name} - {self.month.strftime('%B %Y')} - {self.amount}"
     
     @property
     def spent(self):
-        """Calcula el total gastado en esta categoría para el mes."""
+        """
+        Calcula el total gastado en esta categoría para el mes.
+        Usa el valor anotado por Budget.objects.with_spending() si está disponible.
+        """
+        if hasattr(self, 'spent_total'):
+            return self.spent_total
+        
         start_date = self.month.replace(day=1)
         if self.month.month == 12:
             end_date = self.month.replace(year=self.month.year + 1, month=1, day=1)
         else:
             end_date = self.month.replace(month=self.month.month + 1, day=1)
         
+        from .currency import CurrencyConverter
         total = Transaction.objects.filter(
             user=self.user,
             category=self.category,
             transaction_type='expense',
             date__gte=start_date,
             date__lt=end_date
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        ).aggregate(total=models.Sum(CurrencyConverter(self.currency).expression('amount')))['total'] or 0
         
         return total
     
@@ -193,7 +367,7 @@ class Budget(models.Model):
         """Valor formateado para usar en CSS/atributos (usar punto decimal, no localizado)."""
         if self.amount == 0:
             return "0%"
-        val = min(100, (self.spent / self.amount) * 100)
+        val = self.percentage_used
         try:
             # Asegurar un string con punto decimal y 1 decimal y añadir '%'
             return format(float(val), '.1f') + '%'
@@ -302,6 +476,7 @@ class RecurringTransaction(models.Model):
         validators=[MinValueValidator(0.01)],
         verbose_name="Monto"
     )
+    currency = currency_field()
     transaction_type = models.CharField(
         max_length=10,
         choices=Transaction.TRANSACTION_TYPES,
@@ -332,45 +507,27 @@ class RecurringTransaction(models.Model):
         verbose_name = "Transacción Recurrente"
         verbose_name_plural = "Transacciones Recurrentes"
         ordering = ['next_occurrence']
+        indexes = [
+            models.Index(fields=['is_active', 'next_occurrence']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.get_frequency_display()}"
     
     def calculate_next_occurrence(self):
-        """Calcula la próxima fecha de ocurrencia."""
-        if self.next_occurrence < timezone.now().date():
-            base_date = timezone.now().date()
-        else:
-            base_date = self.next_occurrence
-        
-        if self.frequency == 'daily':
-            return base_date + timedelta(days=1)
-        elif self.frequency == 'weekly':
-            return base_date + timedelta(weeks=1)
-        elif self.frequency == 'biweekly':
-            return base_date + timedelta(weeks=2)
-        elif self.frequency == 'monthly':
-            # Agregar un mes
-            if base_date.month == 12:
-                return base_date.replace(year=base_date.year + 1, month=1)
-            else:
-                return base_date.replace(month=base_date.month + 1)
-        elif self.frequency == 'quarterly':
-            # Agregar 3 meses
-            if base_date.month <= 9:
-                return base_date.replace(month=base_date.month + 3)
-            else:
-                return base_date.replace(year=base_date.year + 1, month=base_date.month - 9)
-        elif self.frequency == 'yearly':
-            return base_date.replace(year=base_date.year + 1)
-        
-        return base_date
+        """Calcula la ocurrencia siguiente a next_occurrence, ajustando a fin de mes."""
+        return recurrence.following(self, self.next_occurrence)
+    
+    def occurrences(self, until, since=None):
+        """Lista de fechas pendientes de esta recurrencia hasta `until`."""
+        return recurrence.to_dates(recurrence.occurrences(self, until, since=since))
     
     def create_transaction(self):
         """Crea una instancia de transacción basada en esta recurrencia."""
         transaction = Transaction.objects.create(
             user=self.user,
             amount=self.amount,
+            currency=self.currency,
             description=self.description or self.name,
             date=self.next_occurrence,
             transaction_type=self.transaction_type,
@@ -387,3 +544,160 @@ class RecurringTransaction(models.Model):
         
         self.save()
         return transaction
+
+
+class MonthlyRollupQuerySet(models.QuerySet):
+    """QuerySet con agregados comunes sobre los acumulados mensuales."""
+
+    def totals(self, converter=None):
+        """
+        Retorna un diccionario con ingresos, gastos y balance de las filas
+        del queryset, resuelto en una sola consulta (convertidos a la moneda
+        de `converter` si se indica, con 'unconverted' como la cantidad de
+        transacciones que quedaron fuera por no tener tasa).
+        """
+        total = _amount_expression('total', converter)
+        expressions = {
+            'income': models.Sum(total, filter=models.Q(transaction_type='income')),
+            'expense': models.Sum(total, filter=models.Q(transaction_type='expense')),
+        }
+        if converter is not None:
+            expressions['unconverted'] = converter.unconverted_count('count')
+        totals = self.aggregate(**expressions)
+        income = totals['income'] or 0
+        expense = totals['expense'] or 0
+        result = {'income': income, 'expense': expense, 'balance': income - expense}
+        if converter is not None:
+            result['unconverted'] = totals['unconverted']
+        return result
+
+
+class MonthlyRollup(models.Model):
+    """
+    Acumulado mensual de transacciones por usuario, tipo, categoría y moneda.
+    Se mantiene incrementalmente con señales sobre Transaction para que
+    los dashboards no tengan que recorrer la tabla de transacciones.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuario", related_name='monthly_rollups')
+    month = models.DateField(verbose_name="Mes")
+    transaction_type = models.CharField(
+        max_length=10,
+        choices=Transaction.TRANSACTION_TYPES,
+        verbose_name="Tipo de transacción"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Categoría",
+        related_name='monthly_rollups'
+    )
+    currency = currency_field()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total")
+    count = models.PositiveIntegerField(default=0, verbose_name="Cantidad de transacciones")
+
+    objects = MonthlyRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Acumulado Mensual"
+        verbose_name_plural = "Acumulados Mensuales"
+        ordering = ['-month', 'transaction_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'transaction_type', 'category', 'currency'],
+                condition=models.Q(category__isnull=False),
+                name='unique_rollup_with_category',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'month', 'transaction_type', 'currency'],
+                condition=models.Q(category__isnull=True),
+                name='unique_rollup_without_category',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.month.strftime('%Y-%m')} - {self.transaction_type} - {self.total}"
+
+
+class ExchangeRateSnapshot(models.Model):
+    """
+    Tasa de cambio diaria de una moneda, en unidades por 1 USD.
+    Se llena desde ExchangeRateService con el comando snapshot_exchange_rates.
+    """
+    date = models.DateField(verbose_name="Fecha")
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, verbose_name="Moneda")
+    rate = models.DecimalField(max_digits=18, decimal_places=6, verbose_name="Unidades por USD")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+
+    class Meta:
+        verbose_name = "Tasa de Cambio"
+        verbose_name_plural = "Tasas de Cambio"
+        ordering = ['-date', 'currency']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'currency'], name='unique_rate_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.currency} - {self.rate}"
+
+
+class ReportJob(models.Model):
+    """
+    Solicitud de generación de un reporte en segundo plano.
+    Un worker (comando run_report_worker) toma los trabajos pendientes,
+    genera el archivo y lo guarda bajo MEDIA_ROOT.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En proceso'),
+        (STATUS_DONE, 'Completado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuario", related_name='report_jobs')
+    format_type = models.CharField(max_length=10, verbose_name="Formato")
+    filters = models.JSONField(default=dict, blank=True, verbose_name="Filtros")
+    filter_hash = models.CharField(max_length=64, db_index=True, verbose_name="Hash de filtros")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="Estado"
+    )
+    file = models.FileField(upload_to='reports/%Y/%m/', blank=True, verbose_name="Archivo")
+    error = models.TextField(blank=True, verbose_name="Error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de inicio")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de finalización")
+    
+    class Meta:
+        verbose_name = "Trabajo de Reporte"
+        verbose_name_plural = "Trabajos de Reporte"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            # Un solo trabajo activo por solicitud idéntica (el hash incluye al usuario)
+            models.UniqueConstraint(
+                fields=['filter_hash'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_report_job',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} - {self.format_type} - {self.get_status_display()}"
+    
+    @property
+    def is_finished(self):
+        """Retorna True si el trabajo terminó (con éxito o con error)."""
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
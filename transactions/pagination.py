@@ -0,0 +1,86 @@
+"""
+Paginación por cursor (keyset) para la API REST de transacciones.
+
+En lugar de OFFSET, cada página continúa a partir de la última fila vista
+según (date, created_at, id), de modo que el costo de cada página depende
+solo de su tamaño y no de cuántas filas tiene el usuario.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    Paginación keyset sobre (date, created_at, id) en orden descendente.
+    El tamaño de página se configura con TRANSACTION_API_PAGE_SIZE y el
+    cliente puede pedir otro con ?page_size= hasta TRANSACTION_API_MAX_PAGE_SIZE.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-date', '-created_at', '-id')
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'TRANSACTION_API_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'TRANSACTION_API_MAX_PAGE_SIZE', 500)
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            requested = default
+        return max(1, min(requested, maximum))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            last_date, last_created_at, last_id = position
+            queryset = queryset.filter(
+                Q(date__lt=last_date) |
+                Q(date=last_date, created_at__lt=last_created_at) |
+                Q(date=last_date, created_at=last_created_at, id__lt=last_id)
+            )
+
+        # Pedir una fila extra para saber si hay página siguiente sin hacer count()
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            raw_date, raw_created_at, raw_id = json.loads(base64.urlsafe_b64decode(padded))
+            return date.fromisoformat(raw_date), datetime.fromisoformat(raw_created_at), int(raw_id)
+        except (TypeError, ValueError, json.JSONDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        payload = json.dumps([instance.date.isoformat(), instance.created_at.isoformat(), instance.pk])
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'transactions': data,
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+        })
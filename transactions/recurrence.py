@@ -0,0 +1,203 @@
+"""
+Motor de expansión de recurrencias.
+
+Calcula todas las fechas de ocurrencia de una serie entre dos límites en
+una sola operación vectorizada con NumPy datetime64, en lugar de avanzar
+paso a paso. Las frecuencias mensuales, trimestrales y anuales conservan
+el día de la serie y lo ajustan al último día del mes cuando no existe
+(una serie del 31 cae el 28/29 de febrero y vuelve al 31 en marzo).
+"""
+import calendar
+from collections import namedtuple
+
+import numpy as np
+
+FREQUENCY_DAYS = {
+    'daily': 1,
+    'weekly': 7,
+    'biweekly': 14,
+}
+
+FREQUENCY_MONTHS = {
+    'monthly': 1,
+    'quarterly': 3,
+    'yearly': 12,
+}
+
+Occurrence = namedtuple('Occurrence', ['date', 'recurring'])
+
+
+def _day(value):
+    return np.datetime64(value, 'D')
+
+
+def _month(value):
+    return np.datetime64(value, 'M')
+
+
+def anchor_day(recurring):
+    """
+    Día del mes que sigue la serie. Normalmente el de next_occurrence, salvo
+    que esta haya quedado ajustada a fin de mes y la serie empezara un día
+    posterior (p. ej. next_occurrence 28/02 de una serie iniciada el 31/01).
+    """
+    current = recurring.next_occurrence
+    start_day = recurring.start_date.day
+    if start_day > current.day == calendar.monthrange(current.year, current.month)[1]:
+        return start_day
+    return current.day
+
+
+def nth_dates(anchor, frequency, steps, day=None):
+    """
+    Fechas de las ocurrencias número `steps` (array de enteros) de la serie
+    que empieza en `anchor`.
+
+    Returns:
+        numpy.ndarray de datetime64[D]
+    """
+    steps = np.asarray(steps, dtype=np.int64)
+    if frequency in FREQUENCY_DAYS:
+        return _day(anchor) + steps * FREQUENCY_DAYS[frequency]
+    if frequency not in FREQUENCY_MONTHS:
+        raise ValueError(f"Frecuencia no soportada: {frequency}")
+
+    months = _month(anchor) + steps * FREQUENCY_MONTHS[frequency]
+    month_starts = months.astype('datetime64[D]')
+    month_lengths = ((months + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+    days = np.minimum(day or anchor.day, month_lengths)
+    return month_starts + (days - 1)
+
+
+def _step_index(anchor, frequency, value):
+    """Índice aproximado (por defecto) de la ocurrencia en torno a `value`."""
+    if frequency in FREQUENCY_DAYS:
+        return int((_day(value) - _day(anchor)).astype(np.int64)) // FREQUENCY_DAYS[frequency]
+    months = int((_month(value) - _month(anchor)).astype(np.int64))
+    return months // FREQUENCY_MONTHS[frequency]
+
+
+def expand(anchor, frequency, until, since=None, day=None):
+    """
+    Todas las ocurrencias de la serie que empieza en `anchor` dentro de
+    [since, until] (since por defecto es anchor).
+
+    Returns:
+        numpy.ndarray de datetime64[D] ordenado
+    """
+    since = max(since or anchor, anchor)
+    if until < since:
+        return np.array([], dtype='datetime64[D]')
+
+    first = max(0, _step_index(anchor, frequency, since) - 1)
+    last = _step_index(anchor, frequency, until) + 1
+    dates = nth_dates(anchor, frequency, np.arange(first, last + 1), day)
+    return dates[(dates >= _day(since)) & (dates <= _day(until))]
+
+
+def next_after(anchor, frequency, after, day=None):
+    """Primera ocurrencia de la serie estrictamente posterior a `after`."""
+    first = max(0, _step_index(anchor, frequency, after))
+    candidates = nth_dates(anchor, frequency, np.arange(first, first + 3), day)
+    return candidates[candidates > _day(after)][0].astype(object)
+
+
+def occurrences(recurring, until, since=None):
+    """
+    Fechas pendientes de una RecurringTransaction desde next_occurrence (o
+    `since`, si es posterior) hasta `until`, sin pasar de end_date.
+
+    Returns:
+        numpy.ndarray de datetime64[D]
+    """
+    if recurring.end_date and recurring.end_date < until:
+        until = recurring.end_date
+    return expand(
+        recurring.next_occurrence, recurring.frequency, until,
+        since=since, day=anchor_day(recurring),
+    )
+
+
+def following(recurring, after):
+    """Próxima fecha de la serie de `recurring` posterior a `after`."""
+    return next_after(recurring.next_occurrence, recurring.frequency, after, day=anchor_day(recurring))
+
+
+def to_dates(values):
+    """Convierte un array datetime64[D] en una lista de datetime.date."""
+    return values.astype(object).tolist()
+
+
+def expand_series(recurrences, until):
+    """
+    Ocurrencias pendientes de muchas recurrencias a la vez hasta `until`
+    (respetando el end_date de cada una), agrupando por frecuencia para
+    generar todas las fechas de un grupo en una sola operación.
+
+    Returns:
+        tuple: (índices de la recurrencia dueña de cada fecha, fechas datetime64[D]),
+        ordenado por recurrencia
+    """
+    until = _day(until)
+    groups = {}
+    for position, recurring in enumerate(recurrences):
+        groups.setdefault(recurring.frequency, []).append(position)
+
+    owners, dates = [], []
+    for frequency, positions in groups.items():
+        series = [recurrences[position] for position in positions]
+        anchors = np.array([recurring.next_occurrence for recurring in series], dtype='datetime64[D]')
+        limits = np.array(
+            [recurring.end_date or until for recurring in series], dtype='datetime64[D]'
+        )
+        limits = np.minimum(limits, until)
+
+        if frequency in FREQUENCY_DAYS:
+            step = FREQUENCY_DAYS[frequency]
+            counts = np.maximum((limits - anchors).astype(np.int64) // step + 1, 0)
+        elif frequency in FREQUENCY_MONTHS:
+            step = FREQUENCY_MONTHS[frequency]
+            month_span = (limits.astype('datetime64[M]') - anchors.astype('datetime64[M]')).astype(np.int64)
+            counts = np.maximum(month_span // step + 1, 0)
+            counts[limits < anchors] = 0
+        else:
+            raise ValueError(f"Frecuencia no soportada: {frequency}")
+
+        total = int(counts.sum())
+        if not total:
+            continue
+        group_owner = np.repeat(np.arange(len(series)), counts)
+        steps = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        if frequency in FREQUENCY_DAYS:
+            values = anchors[group_owner] + steps * step
+        else:
+            days = np.array([anchor_day(recurring) for recurring in series], dtype=np.int64)
+            months = anchors.astype('datetime64[M]')[group_owner] + steps * step
+            month_starts = months.astype('datetime64[D]')
+            month_lengths = ((months + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+            values = month_starts + (np.minimum(days[group_owner], month_lengths) - 1)
+
+        # El último mes contado puede caer después del límite según el día
+        keep = values <= limits[group_owner]
+        owners.append(np.asarray(positions)[group_owner[keep]])
+        dates.append(values[keep])
+
+    if not owners:
+        return np.array([], dtype=np.int64), np.array([], dtype='datetime64[D]')
+    return np.concatenate(owners), np.concatenate(dates)
+
+
+def upcoming(recurrences, until, limit=None):
+    """
+    Ocurrencias de varias recurrencias hasta `until`, ordenadas por fecha.
+
+    Returns:
+        list[Occurrence]
+    """
+    recurrences = list(recurrences)
+    owners, dates = expand_series(recurrences, until)
+    order = np.argsort(dates, kind='stable')
+    if limit is not None:
+        order = order[:limit]
+    return [Occurrence(dates[i].astype(object), recurrences[owners[i]]) for i in order]
@@ -13,6 +13,19 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def totals_currency_label(converter=None) -> str:
+    """Moneda en la que se expresan los totales (sin conversor se suman las cantidades tal cual)."""
+    return converter.target if converter is not None else 'sin convertir'
+
+
+def unconverted_note(totals: dict, converter) -> str:
+    """Aviso de las transacciones que quedaron fuera de los totales por no tener tasa."""
+    return (
+        f"{totals['unconverted']} transacciones en monedas sin tasa de cambio a {converter.target} "
+        f"({', '.join(converter.unconvertible)}) no se incluyen en los totales."
+    )
+
+
 class ReportGenerator(ABC):
     """
     Interfaz base para generadores de reportes (Inversión de Dependencias).
@@ -28,6 +41,8 @@ class ReportGenerator(ABC):
             queryset: QuerySet de transacciones a incluir en el reporte
             filename: Nombre del archivo para el reporte
             **kwargs: Argumentos adicionales específicos de cada implementación
+                (p. ej. `converter`, un CurrencyConverter para expresar los
+                totales en una sola moneda)
         
         Returns:
             HttpResponse con el reporte generado
@@ -49,25 +64,55 @@ class PDFReportGenerator(ReportGenerator):
     """
     Implementación concreta para generar reportes en formato PDF.
     Usa reportlab para generar PDFs.
+    
+    Las transacciones se leen por bloques con values_list y se dividen en
+    tablas del tamaño de una página, de modo que reportlab no tenga que
+    partir una única tabla gigante. Los totales y los resúmenes por mes y
+    por categoría se calculan con agregados agrupados en la base de datos,
+    usando Decimal, y siempre cubren todas las transacciones.
+    
+    reportlab arma el documento completo en memoria antes de escribirlo, así
+    que el detalle se limita a PDF_REPORT_MAX_ROWS filas (por defecto
+    DEFAULT_MAX_ROWS): más allá el reporte lo indica y remite a la
+    exportación Excel o CSV, que sí escriben en streaming.
     """
     
+    ROWS_PER_TABLE = 40
+    DEFAULT_MAX_ROWS = 5000
+    CHUNK_SIZE = 2000
+    SPOOL_MAX_SIZE = 5 * 1024 * 1024
+    
     def generate(self, queryset: QuerySet, filename: str, **kwargs) -> HttpResponse:
         """Genera un reporte en formato PDF."""
         try:
-            from reportlab.lib.pagesizes import letter, A4
+            from reportlab.lib.pagesizes import A4
             from reportlab.lib import colors
             from reportlab.lib.units import inch
             from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
             from reportlab.lib.styles import getSampleStyleSheet
-            from io import BytesIO
+            from django.conf import settings
+            from django.http import FileResponse
             from django.utils import timezone
+            import tempfile
+            from .models import Transaction
             
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
+            output = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE)
+            doc = SimpleDocTemplate(output, pagesize=A4)
             elements = []
             
             # Estilos
             styles = getSampleStyleSheet()
+            header_style = TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ])
             
             # Título
             title = Paragraph("Reporte de Transacciones Financieras", styles['Title'])
@@ -79,56 +124,77 @@ class PDFReportGenerator(ReportGenerator):
             elements.append(date_info)
             elements.append(Spacer(1, 0.2*inch))
             
-            # Encabezados de tabla
-            data = [['Fecha', 'Tipo', 'Descripción', 'Monto', 'Categoría']]
-            
-            # Datos de transacciones
-            total_income = 0
-            total_expenses = 0
-            
-            for transaction in queryset:
-                row = [
-                    transaction.date.strftime('%d/%m/%Y'),
-                    transaction.get_transaction_type_display(),
-                    transaction.description[:30] if transaction.description else '-',
-                    f"${transaction.amount:.2f}",
-                    transaction.category.name if transaction.category else '-'
-                ]
-                data.append(row)
-                
-                if transaction.transaction_type == 'income':
-                    total_income += float(transaction.amount)
-                else:
-                    total_expenses += float(transaction.amount)
+            # Resumen general (un solo agregado agrupado por tipo)
+            converter = kwargs.get('converter')
+            totals = self.get_totals(queryset, converter)
+            summary = [
+                ['Concepto', f'Monto ({totals_currency_label(converter)})'],
+                ['TOTAL INGRESOS', self.format_amount(totals['income'])],
+                ['TOTAL GASTOS', self.format_amount(totals['expense'])],
+                ['BALANCE', self.format_amount(totals['income'] - totals['expense'])],
+            ]
+            elements.append(Paragraph("Resumen", styles['Heading2']))
+            elements.append(Table(summary, colWidths=[3*inch, 2*inch], style=header_style))
+            if totals.get('unconverted'):
+                elements.append(Paragraph(unconverted_note(totals, converter), styles['Normal']))
+            elements.append(Spacer(1, 0.2*inch))
             
-            # Agregar totales
-            data.append(['', '', 'TOTAL INGRESOS', f"${total_income:.2f}", ''])
-            data.append(['', '', 'TOTAL GASTOS', f"${total_expenses:.2f}", ''])
-            data.append(['', '', 'BALANCE', f"${total_income - total_expenses:.2f}", ''])
+            # Resumen por mes
+            label = totals_currency_label(converter)
+            monthly = [['Mes', f'Ingresos ({label})', f'Gastos ({label})', f'Balance ({label})']]
+            for month, income, expense in self.get_monthly_summary(queryset, converter):
+                monthly.append([
+                    month.strftime('%m/%Y'),
+                    self.format_amount(income),
+                    self.format_amount(expense),
+                    self.format_amount(income - expense),
+                ])
+            elements.append(Paragraph("Resumen por mes", styles['Heading2']))
+            elements.extend(self.build_tables(monthly[0], monthly[1:], header_style, [1.2*inch] + [1.6*inch] * 3))
+            elements.append(Spacer(1, 0.2*inch))
             
-            # Crear tabla
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -4), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ]))
+            # Resumen por categoría
+            by_category = [['Categoría', 'Tipo', 'Transacciones', f'Monto ({label})']]
+            type_display = dict(Transaction.TRANSACTION_TYPES)
+            for row in queryset.category_totals(converter):
+                by_category.append([
+                    row['category__name'] or 'Sin categoría',
+                    type_display.get(row['transaction_type'], row['transaction_type']),
+                    row['count'],
+                    self.format_amount(row['total']),
+                ])
+            elements.append(Paragraph("Resumen por categoría", styles['Heading2']))
+            elements.extend(self.build_tables(by_category[0], by_category[1:], header_style, [2.2*inch, 1*inch, 1.2*inch, 1.6*inch]))
+            elements.append(Spacer(1, 0.2*inch))
             
-            elements.append(table)
+            # Detalle de transacciones en tablas del tamaño de una página
+            elements.append(Paragraph("Detalle de transacciones", styles['Heading2']))
+            max_rows = getattr(settings, 'PDF_REPORT_MAX_ROWS', self.DEFAULT_MAX_ROWS)
+            if totals['count'] > max_rows:
+                elements.append(Paragraph(
+                    f"Se muestran las primeras {max_rows} de {totals['count']} transacciones. "
+                    "Exporte a Excel o CSV para obtener el detalle completo.",
+                    styles['Normal'],
+                ))
+                queryset = queryset[:max_rows]
+            detail_header = ['Fecha', 'Tipo', 'Descripción', 'Monto', 'Moneda', 'Categoría']
+            elements.extend(self.build_tables(
+                detail_header,
+                self.iter_detail_rows(queryset, type_display),
+                header_style,
+                [0.9*inch, 0.8*inch, 2.1*inch, 1.0*inch, 0.6*inch, 1.3*inch],
+            ))
             
             # Generar PDF
             doc.build(elements)
-            buffer.seek(0)
+            output.seek(0)
             
-            response = HttpResponse(buffer.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
-            return response
+            return FileResponse(
+                output,
+                as_attachment=True,
+                filename=f"{filename}.pdf",
+                content_type=self.get_content_type()
+            )
             
         except ImportError:
             logger.error("reportlab no está instalado. Instalar con: pip install reportlab")
@@ -140,6 +206,55 @@ class PDFReportGenerator(ReportGenerator):
             logger.error(f"Error al generar PDF: {str(e)}")
             return HttpResponse(f"Error al generar PDF: {str(e)}", status=500)
     
+    @staticmethod
+    def format_amount(amount) -> str:
+        # La moneda va en el encabezado de cada tabla; None = solo montos sin tasa
+        return f"{amount:.2f}" if amount is not None else '-'
+    
+    @staticmethod
+    def get_totals(queryset: QuerySet, converter=None) -> dict:
+        """Totales exactos (Decimal) de ingresos, gastos y balance en una sola consulta."""
+        return queryset.totals(converter)
+    
+    @staticmethod
+    def get_monthly_summary(queryset: QuerySet, converter=None):
+        """Itera (mes, ingresos, gastos) agrupado por mes en la base de datos."""
+        for row in queryset.monthly_totals(converter):
+            yield row['month'], row['income'], row['expense']
+    
+    def iter_detail_rows(self, queryset: QuerySet, type_display: dict):
+        """Itera las filas de detalle leyendo la base de datos por bloques."""
+        from .exports import iter_transaction_rows
+        
+        rows = iter_transaction_rows(queryset, chunk_size=self.CHUNK_SIZE, with_tags=False)
+        for _, date_value, transaction_type, amount, currency, description, category_name, _ in rows:
+            yield [
+                date_value.strftime('%d/%m/%Y'),
+                type_display.get(transaction_type, transaction_type),
+                description[:30] if description else '-',
+                self.format_amount(amount),
+                currency,
+                category_name or '-',
+            ]
+    
+    def build_tables(self, header, rows, style, col_widths):
+        """
+        Divide las filas en tablas de ROWS_PER_TABLE filas (más el encabezado).
+        Con anchos de columna fijos reportlab no tiene que medir cada celda.
+        """
+        from reportlab.platypus import Table
+        
+        tables = []
+        chunk = [header]
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) > self.ROWS_PER_TABLE:
+                tables.append(Table(chunk, colWidths=col_widths, repeatRows=1, style=style))
+                chunk = [header]
+        if len(chunk) > 1 or not tables:
+            tables.append(Table(chunk, colWidths=col_widths, repeatRows=1, style=style))
+        return tables
+    
     def get_content_type(self) -> str:
         return 'application/pdf'
 
@@ -147,95 +262,75 @@ class PDFReportGenerator(ReportGenerator):
 class ExcelReportGenerator(ReportGenerator):
     """
     Implementación concreta para generar reportes en formato Excel.
-    Usa openpyxl o pandas para generar archivos Excel.
+    Usa openpyxl en modo write-only: las filas se leen por bloques con
+    values_list, los totales se calculan en la base de datos y el archivo
+    se escribe en un temporal que pasa a disco cuando el reporte es grande.
     """
     
+    # Tamaño a partir del cual el archivo temporal deja la RAM y pasa a disco
+    SPOOL_MAX_SIZE = 5 * 1024 * 1024
+    CHUNK_SIZE = 2000
+    
     def generate(self, queryset: QuerySet, filename: str, **kwargs) -> HttpResponse:
         """Genera un reporte en formato Excel."""
         try:
-            import pandas as pd
-            from io import BytesIO
-            from django.utils import timezone
-            
-            # Preparar datos
-            data = []
-            total_income = 0
-            total_expenses = 0
-            
-            for transaction in queryset:
-                row = {
-                    'Fecha': transaction.date.strftime('%d/%m/%Y'),
-                    'Tipo': transaction.get_transaction_type_display(),
-                    'Descripción': transaction.description or '-',
-                    'Monto': float(transaction.amount),
-                    'Categoría': transaction.category.name if transaction.category else '-',
-                }
-                data.append(row)
-                
-                if transaction.transaction_type == 'income':
-                    total_income += float(transaction.amount)
-                else:
-                    total_expenses += float(transaction.amount)
+            from openpyxl import Workbook
+            from django.http import FileResponse
+            import tempfile
+            from .exports import iter_transaction_rows
+            from .models import Transaction
             
-            # Crear DataFrame
-            df = pd.DataFrame(data)
+            workbook = Workbook(write_only=True)
+            worksheet = workbook.create_sheet('Transacciones')
             
-            # Agregar fila de totales
-            totals_row = pd.DataFrame([{
-                'Fecha': '',
-                'Tipo': '',
-                'Descripción': 'TOTAL INGRESOS',
-                'Monto': total_income,
-                'Categoría': ''
-            }])
-            df = pd.concat([df, totals_row], ignore_index=True)
+            # Ajustar ancho de columnas (debe hacerse antes de escribir filas)
+            worksheet.column_dimensions['A'].width = 12
+            worksheet.column_dimensions['B'].width = 12
+            worksheet.column_dimensions['C'].width = 40
+            worksheet.column_dimensions['D'].width = 15
+            worksheet.column_dimensions['E'].width = 10
+            worksheet.column_dimensions['F'].width = 20
             
-            totals_row = pd.DataFrame([{
-                'Fecha': '',
-                'Tipo': '',
-                'Descripción': 'TOTAL GASTOS',
-                'Monto': total_expenses,
-                'Categoría': ''
-            }])
-            df = pd.concat([df, totals_row], ignore_index=True)
+            worksheet.append(['Fecha', 'Tipo', 'Descripción', 'Monto', 'Moneda', 'Categoría'])
             
-            totals_row = pd.DataFrame([{
-                'Fecha': '',
-                'Tipo': '',
-                'Descripción': 'BALANCE',
-                'Monto': total_income - total_expenses,
-                'Categoría': ''
-            }])
-            df = pd.concat([df, totals_row], ignore_index=True)
+            type_display = dict(Transaction.TRANSACTION_TYPES)
+            rows = iter_transaction_rows(queryset, chunk_size=self.CHUNK_SIZE, with_tags=False)
+            for _, date_value, transaction_type, amount, currency, description, category_name, _ in rows:
+                worksheet.append([
+                    date_value.strftime('%d/%m/%Y'),
+                    type_display.get(transaction_type, transaction_type),
+                    description or '-',
+                    amount,
+                    currency,
+                    category_name or '-',
+                ])
             
-            # Generar Excel
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Transacciones')
-                
-                # Obtener la hoja para formatear
-                worksheet = writer.sheets['Transacciones']
-                
-                # Ajustar ancho de columnas
-                worksheet.column_dimensions['A'].width = 12
-                worksheet.column_dimensions['B'].width = 12
-                worksheet.column_dimensions['C'].width = 40
-                worksheet.column_dimensions['D'].width = 15
-                worksheet.column_dimensions['E'].width = 20
+            # Totales calculados en la base de datos, en la moneda del conversor
+            converter = kwargs.get('converter')
+            totals = queryset.totals(converter)
+            label = totals_currency_label(converter)
+            worksheet.append(['', '', f'TOTAL INGRESOS ({label})', totals['income'], label, ''])
+            worksheet.append(['', '', f'TOTAL GASTOS ({label})', totals['expense'], label, ''])
+            worksheet.append(['', '', f'BALANCE ({label})', totals['balance'], label, ''])
+            if totals.get('unconverted'):
+                worksheet.append(['', '', unconverted_note(totals, converter), '', '', ''])
             
+            # Generar Excel en un temporal (RAM para reportes pequeños, disco para grandes)
+            output = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_SIZE)
+            workbook.save(output)
             output.seek(0)
             
-            response = HttpResponse(
-                output.read(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            return FileResponse(
+                output,
+                as_attachment=True,
+                filename=f"{filename}.xlsx",
+                content_type=self.get_content_type()
             )
-            response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
-            return response
             
         except ImportError:
-            logger.error("pandas/openpyxl no están instalados. Instalar con: pip install pandas openpyxl")
+            logger.error("openpyxl no está instalado. Instalar con: pip install openpyxl")
             return HttpResponse(
-                "Error: pandas/openpyxl no están instalados",
+                "Error: openpyxl no está instalado",
                 status=500
             )
         except Exception as e:
@@ -0,0 +1,170 @@
+"""
+Cola de trabajos de reportes en segundo plano.
+
+Las vistas encolan un ReportJob (deduplicando solicitudes idénticas por hash
+de filtros) y el comando run_report_worker los procesa fuera del ciclo de
+la petición, guardando el archivo generado bajo MEDIA_ROOT.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .currency import CurrencyConverter
+from .models import ReportJob, Transaction
+from .report_generators import ReportGeneratorFactory
+
+logger = logging.getLogger(__name__)
+
+# Parámetros GET que filtran el reporte (los mismos que acepta export_report)
+REPORT_FILTERS = ('type', 'date_from', 'date_to', 'category')
+
+FILE_EXTENSIONS = {
+    'pdf': 'pdf',
+    'excel': 'xlsx',
+}
+
+
+def report_filters(params):
+    """Extrae los filtros de reporte no vacíos de un QueryDict o diccionario."""
+    return {key: params.get(key) for key in REPORT_FILTERS if params.get(key)}
+
+
+def report_queryset(user, filters):
+    """Construye el queryset de transacciones del reporte a partir de los filtros."""
+    queryset = Transaction.objects.filter(user=user).select_related('category').order_by('-date')
+
+    if filters.get('type'):
+        queryset = queryset.filter(transaction_type=filters['type'])
+    if filters.get('date_from'):
+        queryset = queryset.filter(date__gte=filters['date_from'])
+    if filters.get('date_to'):
+        queryset = queryset.filter(date__lte=filters['date_to'])
+    if filters.get('category'):
+        queryset = queryset.filter(category_id=filters['category'])
+
+    return queryset
+
+
+def filters_hash(user, format_type, filters):
+    """Hash estable que identifica una solicitud de reporte (usuario, formato y filtros)."""
+    payload = json.dumps(
+        {'user': user.pk, 'format': format_type, 'filters': filters},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def enqueue(user, format_type, filters):
+    """
+    Encola un reporte. Si ya existe un trabajo idéntico pendiente o en
+    proceso, lo reutiliza en lugar de crear otro.
+
+    Returns:
+        tuple: (ReportJob, created)
+
+    Raises:
+        ValueError: Si el formato no es soportado
+    """
+    format_type = format_type.lower()
+    # Validar el formato antes de encolar
+    ReportGeneratorFactory.get_generator(format_type)
+
+    digest = filters_hash(user, format_type, filters)
+    active = ReportJob.objects.filter(
+        filter_hash=digest,
+        status__in=[ReportJob.STATUS_PENDING, ReportJob.STATUS_RUNNING],
+    )
+    existing = active.first()
+    if existing:
+        return existing, False
+
+    # La restricción unique_active_report_job resuelve la carrera entre dos
+    # solicitudes simultáneas: la segunda reutiliza el trabajo de la primera
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(
+                user=user,
+                format_type=format_type,
+                filters=filters,
+                filter_hash=digest,
+            )
+    except IntegrityError:
+        existing = active.first()
+        if existing is None:
+            # El trabajo terminó entre el insert y la lectura
+            raise
+        return existing, False
+    return job, True
+
+
+def claim_next_job():
+    """
+    Toma el trabajo pendiente más antiguo y lo marca como en proceso.
+    El UPDATE condicionado al estado garantiza que dos workers no tomen
+    el mismo trabajo.
+
+    Returns:
+        ReportJob o None si no hay trabajos pendientes
+    """
+    candidates = ReportJob.objects.filter(status=ReportJob.STATUS_PENDING).order_by('created_at')
+    for job_id in candidates.values_list('pk', flat=True)[:10]:
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.STATUS_PENDING).update(
+            status=ReportJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            return ReportJob.objects.select_related('user').get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs(max_age=timedelta(minutes=30)):
+    """Devuelve a pendiente los trabajos en proceso abandonados por un worker caído."""
+    return ReportJob.objects.filter(
+        status=ReportJob.STATUS_RUNNING,
+        started_at__lt=timezone.now() - max_age,
+    ).update(status=ReportJob.STATUS_PENDING, started_at=None)
+
+
+def run_job(job):
+    """Genera el archivo de un trabajo ya reclamado y actualiza su estado."""
+    try:
+        generator = ReportGeneratorFactory.get_generator(job.format_type)
+        queryset = report_queryset(job.user, job.filters)
+        filename = f"reporte_transacciones_{job.created_at.strftime('%Y%m%d_%H%M%S')}"
+
+        response = generator.generate(queryset, filename, converter=CurrencyConverter.for_user(job.user))
+        if response.status_code != 200:
+            raise RuntimeError(response.content.decode('utf-8', errors='replace'))
+
+        extension = FILE_EXTENSIONS.get(job.format_type, job.format_type)
+        name = f"{filename}_{job.pk}.{extension}"
+        if response.streaming:
+            job.file.save(name, File(response.file_to_stream, name=name), save=False)
+        else:
+            job.file.save(name, ContentFile(response.content), save=False)
+        response.close()
+
+        job.status = ReportJob.STATUS_DONE
+        job.error = ''
+    except Exception as e:
+        logger.error(f"Error al generar el reporte {job.pk}: {str(e)}")
+        job.status = ReportJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file', 'error', 'finished_at'])
+    return job
+
+
+def process_next_job():
+    """Reclama y procesa un trabajo. Retorna el trabajo procesado o None."""
+    job = claim_next_job()
+    if job is None:
+        return None
+    return run_job(job)
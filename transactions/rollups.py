@@ -0,0 +1,247 @@
+"""
+Mantenimiento de los acumulados mensuales (MonthlyRollup).
+
+Cada fila acumula una sola moneda; las conversiones se hacen al leer (ver
+currency.CurrencyConverter.expression), no al escribir.
+
+Las señales de Transaction llaman a estas funciones para aplicar deltas
+incrementales; el comando rebuild_rollups usa rebuild() y verify() para
+reconstruir los acumulados desde cero y compararlos contra la fuente.
+"""
+from collections import defaultdict
+from decimal import Decimal
+import logging
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import MonthlyRollup, Transaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def month_start(value):
+    """Normaliza una fecha (o datetime/string) al primer día de su mes."""
+    value = Transaction._meta.get_field('date').to_python(value)
+    return value.replace(day=1)
+
+
+def rollup_key(user_id, date, transaction_type, category_id, currency):
+    """Clave (usuario, mes, tipo, categoría, moneda) que identifica una fila del acumulado."""
+    return (user_id, month_start(date), transaction_type, category_id, currency)
+
+
+def apply_delta(key, amount, count):
+    """
+    Suma `amount` y `count` a la fila del acumulado identificada por `key`.
+    Crea la fila si no existe y el delta es positivo; elimina las filas que
+    quedan sin transacciones.
+    """
+    user_id, month, transaction_type, category_id, currency = key
+    amount = Decimal(str(amount))
+    rows = MonthlyRollup.objects.filter(
+        user_id=user_id,
+        month=month,
+        transaction_type=transaction_type,
+        category_id=category_id,
+        currency=currency,
+    )
+    updated = rows.update(total=F('total') + amount, count=F('count') + count)
+
+    if not updated:
+        if count <= 0:
+            # La fila ya no existe (p. ej. borrado en cascada): nada que descontar
+            return
+        try:
+            with db_transaction.atomic():
+                MonthlyRollup.objects.create(
+                    user_id=user_id,
+                    month=month,
+                    transaction_type=transaction_type,
+                    category_id=category_id,
+                    currency=currency,
+                    total=amount,
+                    count=count,
+                )
+        except IntegrityError:
+            # Otra petición creó la fila en paralelo: aplicar el delta sobre ella
+            rows.update(total=F('total') + amount, count=F('count') + count)
+    elif count < 0:
+        rows.filter(count__lte=0).delete()
+
+
+def record_transactions(transactions, sign=1):
+    """
+    Aplica en bloque el efecto de varias transacciones sobre los acumulados.
+    Pensado para inserciones masivas (bulk_create) que no disparan señales.
+
+    Args:
+        transactions: Iterable de instancias de Transaction
+        sign: 1 para sumar (alta), -1 para restar (baja)
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for instance in transactions:
+        key = rollup_key(
+            instance.user_id, instance.date, instance.transaction_type, instance.category_id, instance.currency
+        )
+        deltas[key][0] += Decimal(str(instance.amount))
+        deltas[key][1] += 1
+
+    for key, (amount, count) in deltas.items():
+        apply_delta(key, sign * amount, sign * count)
+
+
+def fold_category(category):
+    """
+    Traspasa los acumulados de una categoría al grupo sin categoría.
+    Se usa antes de borrar la categoría, ya que las transacciones pasan a
+    category=NULL mediante un UPDATE que no dispara señales.
+    """
+    rows = list(
+        MonthlyRollup.objects.filter(category=category)
+        .values_list('user_id', 'month', 'transaction_type', 'currency', 'total', 'count')
+    )
+    for user_id, month, transaction_type, currency, total, count in rows:
+        apply_delta((user_id, month, transaction_type, None, currency), total, count)
+    MonthlyRollup.objects.filter(category=category).delete()
+
+
+def _source_rows(user=None):
+    """Agrupa las transacciones por clave de acumulado directamente en la base de datos."""
+    queryset = Transaction.objects.all()
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    return (
+        queryset
+        .annotate(rollup_month=TruncMonth('date'))
+        .order_by()
+        .values('user_id', 'rollup_month', 'transaction_type', 'category_id', 'currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+    )
+
+
+def rebuild(user=None):
+    """
+    Reconstruye desde cero los acumulados (de un usuario o de todos).
+
+    Returns:
+        int: Número de filas de acumulado creadas
+    """
+    created = 0
+    with db_transaction.atomic():
+        existing = MonthlyRollup.objects.all()
+        if user is not None:
+            existing = existing.filter(user=user)
+        existing.delete()
+
+        batch = []
+        for row in _source_rows(user).iterator(chunk_size=BATCH_SIZE):
+            batch.append(MonthlyRollup(
+                user_id=row['user_id'],
+                month=row['rollup_month'],
+                transaction_type=row['transaction_type'],
+                category_id=row['category_id'],
+                currency=row['currency'],
+                total=row['total'],
+                count=row['count'],
+            ))
+            if len(batch) >= BATCH_SIZE:
+                MonthlyRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            MonthlyRollup.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def verify(user=None):
+    """
+    Compara los acumulados contra las transacciones de origen.
+
+    Returns:
+        list: Lista de tuplas (clave, esperado, actual) con las diferencias;
+              vacía si todo coincide. esperado/actual son (total, count).
+    """
+    expected = {
+        (row['user_id'], row['rollup_month'], row['transaction_type'], row['category_id'], row['currency']):
+            (row['total'], row['count'])
+        for row in _source_rows(user)
+    }
+
+    actual_qs = MonthlyRollup.objects.all()
+    if user is not None:
+        actual_qs = actual_qs.filter(user=user)
+    actual = {
+        (user_id, month, transaction_type, category_id, currency): (total, count)
+        for user_id, month, transaction_type, category_id, currency, total, count in actual_qs.values_list(
+            'user_id', 'month', 'transaction_type', 'category_id', 'currency', 'total', 'count'
+        )
+    }
+
+    mismatches = []
+    for key in set(expected) | set(actual):
+        exp = expected.get(key, (Decimal('0'), 0))
+        act = actual.get(key, (Decimal('0'), 0))
+        if exp[1] != act[1] or Decimal(exp[0]) != Decimal(act[0]):
+            mismatches.append((key, exp, act))
+    return mismatches
+
+
+def _total_expression(converter):
+    return converter.expression('total') if converter is not None else F('total')
+
+
+def monthly_data_from_rollups(rollups_qs, converter=None):
+    """
+    Construye la serie {'YYYY-MM': {'income': x, 'expense': y}} para los
+    gráficos a partir de un queryset de MonthlyRollup ya filtrado (sumando
+    las monedas convertidas con `converter`, si se indica).
+    """
+    rows = (
+        rollups_qs
+        .order_by()
+        .values('month', 'transaction_type')
+        .annotate(total=Sum(_total_expression(converter)))
+        .order_by('month')
+    )
+    monthly_data = {}
+    for row in rows:
+        month_key = row['month'].strftime('%Y-%m')
+        monthly_data.setdefault(month_key, {'income': 0, 'expense': 0})
+        monthly_data[month_key][row['transaction_type']] = float(row['total'])
+    return monthly_data
+
+
+def chart_data_from_rollups(rollups_qs, converter=None):
+    """
+    Construye en una sola consulta agrupada las dos series de los gráficos:
+    la mensual {'YYYY-MM': {'income': x, 'expense': y}} y la de gastos por
+    categoría {nombre: {'amount': x, 'color': c}} ordenada de mayor a menor.
+    Con `converter` los totales de cada moneda se suman ya convertidos.
+    """
+    rows = (
+        rollups_qs
+        .order_by()
+        .values('month', 'transaction_type', 'category__name', 'category__color')
+        .annotate(total=Sum(_total_expression(converter)))
+        .order_by('month')
+    )
+    monthly_data = {}
+    category_totals = {}
+    for row in rows:
+        month_key = row['month'].strftime('%Y-%m')
+        month = monthly_data.setdefault(month_key, {'income': 0, 'expense': 0})
+        month[row['transaction_type']] += float(row['total'])
+
+        if row['transaction_type'] == 'expense' and row['category__name'] is not None:
+            category = category_totals.setdefault(
+                row['category__name'], {'amount': 0, 'color': row['category__color']}
+            )
+            category['amount'] += float(row['total'])
+
+    category_data = dict(sorted(category_totals.items(), key=lambda item: -item[1]['amount']))
+    return {'monthly_data': monthly_data, 'category_data': category_data}
@@ -0,0 +1,144 @@
+"""
+Procesamiento por lotes de transacciones recurrentes.
+
+Selecciona en una sola consulta indexada todas las recurrencias vencidas
+de todos los usuarios, genera cada ocurrencia pendiente hasta hoy con
+bulk_create y avanza next_occurrence con bulk_update.
+
+Es seguro ejecutarlo en paralelo: las recurrencias de cada lote se
+bloquean con SELECT ... FOR UPDATE SKIP LOCKED (en motores que lo
+soportan) y la restricción única (recurring_transaction, date) de
+Transaction actúa como clave de idempotencia, de modo que una ocurrencia
+nunca se registra dos veces. Si un lote choca con esa restricción se
+reintenta recurrencia por recurrencia, para que solo queden pendientes las
+que realmente tienen el conflicto (y se reportan en 'failed').
+"""
+import logging
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+
+from .models import RecurringTransaction, Transaction
+from . import aggregate_cache, recurrence, rollups, search
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+
+def occurrence_dates(recurring, until):
+    """
+    Fechas de ocurrencia de `recurring` desde next_occurrence hasta `until`
+    (inclusive, y sin pasar de end_date), junto con la siguiente fecha
+    posterior a la última.
+
+    Returns:
+        tuple: (lista de fechas, próxima ocurrencia)
+    """
+    dates = recurrence.to_dates(recurrence.occurrences(recurring, until))
+    if not dates:
+        return [], recurring.next_occurrence
+    return dates, recurrence.following(recurring, dates[-1])
+
+
+def due_recurrences(today=None):
+    """Recurrencias activas con ocurrencias pendientes (usa el índice is_active, next_occurrence)."""
+    today = today or timezone.now().date()
+    return RecurringTransaction.objects.filter(is_active=True, next_occurrence__lte=today)
+
+
+def _process_batch(ids, today):
+    """Genera las ocurrencias de un lote de recurrencias dentro de una transacción."""
+    created = []
+    deactivated = 0
+    with db_transaction.atomic():
+        # Releer bajo bloqueo: otro proceso pudo haber avanzado estas filas
+        recurrences = list(
+            due_recurrences(today)
+            .select_for_update(skip_locked=True)
+            .filter(pk__in=ids)
+            .order_by('pk')
+        )
+        now = timezone.now()
+        for recurring in recurrences:
+            dates, next_occurrence = occurrence_dates(recurring, today)
+            created.extend(
+                Transaction(
+                    user_id=recurring.user_id,
+                    amount=recurring.amount,
+                    currency=recurring.currency,
+                    description=recurring.description or recurring.name,
+                    date=occurrence,
+                    transaction_type=recurring.transaction_type,
+                    category_id=recurring.category_id,
+                    recurring_transaction=recurring,
+                )
+                for occurrence in dates
+            )
+            recurring.next_occurrence = next_occurrence
+            recurring.updated_at = now
+            if recurring.end_date and next_occurrence > recurring.end_date:
+                recurring.is_active = False
+                deactivated += 1
+
+        Transaction.objects.bulk_create(created, batch_size=1000)
+        RecurringTransaction.objects.bulk_update(
+            recurrences, ['next_occurrence', 'is_active', 'updated_at']
+        )
+        # bulk_create no dispara señales: actualizar acumulados e índice de búsqueda a mano
+        rollups.record_transactions(created)
+        search.index_transactions([transaction.pk for transaction in created])
+
+    for user_id in {recurring.user_id for recurring in recurrences}:
+        aggregate_cache.bump_version(user_id)
+    return len(recurrences), created, deactivated
+
+
+def process_due(today=None, queryset=None, batch_size=BATCH_SIZE):
+    """
+    Procesa todas las recurrencias vencidas hasta `today`.
+
+    Args:
+        today: Fecha de corte (por defecto hoy)
+        queryset: Restringe las recurrencias a procesar (p. ej. las de un usuario)
+        batch_size: Recurrencias por transacción de base de datos
+
+    Returns:
+        dict con 'recurrences', 'transactions', 'deactivated', 'by_user'
+        (transacciones creadas por usuario) y 'failed' (ids de las
+        recurrencias que no se pudieron registrar)
+    """
+    today = today or timezone.now().date()
+    due = due_recurrences(today)
+    if queryset is not None:
+        due = due.filter(pk__in=queryset.values('pk'))
+
+    ids = list(due.order_by('next_occurrence', 'pk').values_list('pk', flat=True))
+    result = {'recurrences': 0, 'transactions': 0, 'deactivated': 0, 'by_user': defaultdict(int), 'failed': []}
+
+    def add(processed, created, deactivated):
+        result['recurrences'] += processed
+        result['transactions'] += len(created)
+        result['deactivated'] += deactivated
+        for transaction in created:
+            result['by_user'][transaction.user_id] += 1
+
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        try:
+            add(*_process_batch(batch, today))
+            continue
+        except IntegrityError as e:
+            # Alguna ocurrencia ya existe: el lote se revirtió completo, se
+            # reintenta de a una recurrencia para aislar las conflictivas
+            logger.warning(f"Conflicto al procesar el lote de recurrencias desde {batch[0]}: {str(e)}")
+        for pk in batch:
+            try:
+                add(*_process_batch([pk], today))
+            except IntegrityError as e:
+                logger.error(f"No se pudo registrar la recurrencia {pk}: {str(e)}")
+                result['failed'].append(pk)
+
+    result['by_user'] = dict(result['by_user'])
+    return result
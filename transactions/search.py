@@ -0,0 +1,246 @@
+"""
+Búsqueda de texto completo sobre transacciones.
+
+Mantiene un índice (transactions_search_index) con la descripción, el
+nombre de la categoría y los nombres de las etiquetas de cada transacción:
+
+- En SQLite es una tabla virtual FTS5 (rowid = id de la transacción),
+  ordenada por bm25.
+- En PostgreSQL es una tabla con un tsvector ponderado (descripción A,
+  categoría B, etiquetas C) y un índice GIN, ordenada por ts_rank. Usa la
+  configuración finance_unaccent (simple + unaccent) en el documento y en
+  la consulta, así que, como en SQLite, se ignoran los acentos.
+
+Las señales de Transaction, Category y Tag reindexan las filas afectadas;
+los caminos masivos (importación, recurrencias) llaman a
+index_transactions() explícitamente. Con otros motores se usa un filtro
+icontains como respaldo.
+"""
+import re
+
+from django.db import connection as default_connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+INDEX_TABLE = 'transactions_search_index'
+MAX_TERMS = 8
+CHUNK_SIZE = 500
+
+# Pesos bm25 por columna: description, category, tags, user_id
+SQLITE_WEIGHTS = '10.0, 4.0, 2.0, 0.0'
+
+SQLITE_CREATE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(
+        description, category, tags, user_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+POSTGRES_CONFIG = 'finance_unaccent'
+
+POSTGRES_CREATE = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{POSTGRES_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {POSTGRES_CONFIG} (COPY = simple);
+            ALTER TEXT SEARCH CONFIGURATION {POSTGRES_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+        END IF;
+    END
+    $$
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {INDEX_TABLE} (
+        transaction_id bigint PRIMARY KEY
+            REFERENCES transactions_transaction (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        user_id integer NOT NULL,
+        document tsvector NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_document ON {INDEX_TABLE} USING GIN (document)",
+    f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_user ON {INDEX_TABLE} (user_id)",
+)
+
+# Nombres de etiquetas de una transacción separados por espacios
+_TAG_NAMES = {
+    'sqlite': """
+        SELECT group_concat(g.name, ' ') FROM transactions_transaction_tags tt
+        JOIN transactions_tag g ON g.id = tt.tag_id WHERE tt.transaction_id = t.id
+    """,
+    'postgresql': """
+        SELECT string_agg(g.name, ' ') FROM transactions_transaction_tags tt
+        JOIN transactions_tag g ON g.id = tt.tag_id WHERE tt.transaction_id = t.id
+    """,
+}
+
+_SOURCE_FROM = """
+    FROM transactions_transaction t
+    LEFT JOIN transactions_category c ON c.id = t.category_id
+"""
+
+SQLITE_INSERT = f"""
+    INSERT INTO {INDEX_TABLE} (rowid, description, category, tags, user_id)
+    SELECT t.id, t.description, COALESCE(c.name, ''), COALESCE(({_TAG_NAMES['sqlite']}), ''), t.user_id
+    {_SOURCE_FROM}
+"""
+
+POSTGRES_UPSERT = f"""
+    INSERT INTO {INDEX_TABLE} (transaction_id, user_id, document)
+    SELECT t.id, t.user_id,
+        setweight(to_tsvector('{POSTGRES_CONFIG}', COALESCE(t.description, '')), 'A') ||
+        setweight(to_tsvector('{POSTGRES_CONFIG}', COALESCE(c.name, '')), 'B') ||
+        setweight(to_tsvector('{POSTGRES_CONFIG}', COALESCE(({_TAG_NAMES['postgresql']}), '')), 'C')
+    {_SOURCE_FROM}
+    {{where}}
+    ON CONFLICT (transaction_id) DO UPDATE
+        SET user_id = EXCLUDED.user_id, document = EXCLUDED.document
+"""
+
+
+def backend(connection=None):
+    """Motor de búsqueda disponible para la conexión: 'sqlite', 'postgresql' o None."""
+    vendor = (connection or default_connection).vendor
+    return vendor if vendor in ('sqlite', 'postgresql') else None
+
+
+def create_index(connection):
+    """Crea la tabla de índice para el motor de la conexión."""
+    engine = backend(connection)
+    with connection.cursor() as cursor:
+        if engine == 'sqlite':
+            cursor.execute(SQLITE_CREATE)
+        elif engine == 'postgresql':
+            for statement in POSTGRES_CREATE:
+                cursor.execute(statement)
+
+
+def drop_index(connection):
+    """Elimina la tabla de índice."""
+    if backend(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {INDEX_TABLE}")
+
+
+def _write(cursor, engine, where='', params=()):
+    if engine == 'sqlite':
+        cursor.execute(f"{SQLITE_INSERT} {where}", params)
+    else:
+        cursor.execute(POSTGRES_UPSERT.format(where=where), params)
+
+
+def rebuild(connection=None, user_id=None):
+    """Reconstruye el índice completo (o el de un usuario) desde las transacciones."""
+    connection = connection or default_connection
+    engine = backend(connection)
+    if engine is None:
+        return
+    with connection.cursor() as cursor:
+        if user_id is None:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+            _write(cursor, engine)
+        else:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE user_id = %s", [user_id])
+            _write(cursor, engine, 'WHERE t.user_id = %s', [user_id])
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def remove_transactions(ids, using='default'):
+    """Quita transacciones del índice."""
+    connection = connections[using]
+    engine = backend(connection)
+    if engine is None:
+        return
+    key = 'rowid' if engine == 'sqlite' else 'transaction_id'
+    with connection.cursor() as cursor:
+        for chunk in _chunks(ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE {key} IN ({placeholders})", chunk)
+
+
+def index_transactions(ids, using='default'):
+    """(Re)indexa las transacciones indicadas con su categoría y etiquetas actuales."""
+    connection = connections[using]
+    engine = backend(connection)
+    if engine is None:
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            if engine == 'sqlite':
+                # FTS5 no admite UPSERT: borrar y volver a insertar
+                cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            _write(cursor, engine, f'WHERE t.id IN ({placeholders})', chunk)
+
+
+def parse_terms(text):
+    """Palabras de la búsqueda (sin operadores), en minúsculas."""
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def search_transactions(queryset, user, text, rank=True):
+    """
+    Filtra `queryset` a las transacciones de `user` que coinciden con `text`
+    en descripción, categoría o etiquetas (cada palabra como prefijo).
+
+    Con rank=True las ordena por relevancia (anotada como search_rank) y
+    luego por fecha; con rank=False conserva el orden del queryset (p. ej.
+    para la paginación por cursor de la API).
+    """
+    terms = parse_terms(text)
+    if not terms:
+        return queryset
+
+    engine = backend()
+    if engine == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # La búsqueda MATCH se resuelve una sola vez en la subconsulta IN
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s AND user_id = %s",
+            [match, user.pk],
+        ))
+        if not rank:
+            return queryset
+        # bm25() solo existe dentro de la consulta MATCH. Un "MATCH ... AND
+        # rowid = t.id" por fila repetiría la búsqueda completa por cada
+        # transacción (segundos con términos frecuentes); la CTE MATERIALIZED
+        # (SQLite >= 3.35) calcula los puntajes una vez y cada fila los busca
+        # por id en un índice automático
+        return queryset.annotate(search_rank=RawSQL(
+            f"WITH ranked AS MATERIALIZED ("
+            f"SELECT rowid AS id, -bm25({INDEX_TABLE}, {SQLITE_WEIGHTS}) AS score FROM {INDEX_TABLE} "
+            f"WHERE {INDEX_TABLE} MATCH %s AND user_id = %s"
+            f") SELECT score FROM ranked WHERE ranked.id = transactions_transaction.id",
+            [match, user.pk],
+        )).order_by('-search_rank', '-date', '-id')
+
+    if engine == 'postgresql':
+        match = ' & '.join(f'{term}:*' for term in terms)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT transaction_id FROM {INDEX_TABLE} "
+            f"WHERE document @@ to_tsquery('{POSTGRES_CONFIG}', %s) AND user_id = %s",
+            [match, user.pk],
+        ))
+        if not rank:
+            return queryset
+        # Búsqueda por clave primaria: una lectura del índice por fila
+        return queryset.annotate(search_rank=RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('{POSTGRES_CONFIG}', %s)) FROM {INDEX_TABLE} "
+            f"WHERE transaction_id = transactions_transaction.id",
+            [match],
+        )).order_by('-search_rank', '-date', '-id')
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(description__icontains=term) |
+            Q(category__name__icontains=term) |
+            Q(tags__name__icontains=term)
+        )
+    return queryset.filter(user=user).filter(condition).distinct()
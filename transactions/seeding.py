@@ -0,0 +1,182 @@
+"""
+Generador de datos sintéticos para pruebas de carga.
+
+Crea usuarios con transacciones, etiquetas, presupuestos y recurrencias
+usando bulk_create por lotes y un generador aleatorio con semilla, de modo
+que la misma semilla produce siempre los mismos datos. Como bulk_create no
+dispara señales, al final se reconstruyen los acumulados mensuales y el
+índice de búsqueda de los usuarios creados y se invalida su caché.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction as db_transaction
+
+from accounts.models import UserProfile
+
+from .models import Budget, Category, RecurringTransaction, Tag, Transaction
+from .utils import provision_default_categories
+from . import aggregate_cache, rollups, search
+
+SEED_PASSWORD = 'seedpass123'
+BATCH_SIZE = 5000
+
+TAG_NAMES = [
+    'viaje', 'trabajo', 'familia', 'regalo', 'mascota', 'hogar', 'auto', 'urgente',
+    'suscripción', 'ocio', 'deducible', 'compartido', 'efectivo', 'tarjeta', 'online', 'mensual',
+]
+
+DESCRIPTIONS = {
+    'income': ['Pago de nómina', 'Proyecto freelance', 'Dividendos', 'Reembolso', 'Venta de artículo'],
+    'expense': [
+        'Supermercado', 'Gasolina', 'Alquiler', 'Factura de luz', 'Cine', 'Farmacia', 'Librería',
+        'Restaurante', 'Taxi', 'Ropa de temporada', 'Internet', 'Gimnasio', 'Café', 'Panadería',
+    ],
+}
+
+FREQUENCIES = [choice for choice, _ in RecurringTransaction.FREQUENCY_CHOICES]
+
+
+def _amount(rng, transaction_type):
+    if transaction_type == 'income':
+        return Decimal(rng.randint(50000, 500000)) / 100
+    return Decimal(rng.randint(200, 30000)) / 100
+
+
+def _month_start(value, months_back):
+    month = value.year * 12 + value.month - 1 - months_back
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def _create_users(count, prefix, password_hash):
+    users = User.objects.bulk_create([
+        User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', password=password_hash)
+        for index in range(count)
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+    provision_default_categories(users)
+    return users
+
+
+def _flush_transactions(batch):
+    Transaction.objects.bulk_create([instance for instance, _ in batch])
+    through = Transaction.tags.through
+    links = [
+        through(transaction_id=instance.pk, tag_id=tag_id)
+        for instance, tag_ids in batch
+        for tag_id in tag_ids
+    ]
+    if links:
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def seed(users=1, transactions=1000, budgets=12, recurring=5, tags=8, months=24,
+         seed=42, prefix='seed_user_', today=None, batch_size=BATCH_SIZE):
+    """
+    Genera datos sintéticos.
+
+    Args:
+        users: Usuarios a crear (nombres `prefix`0, `prefix`1, ...; contraseña SEED_PASSWORD)
+        transactions: Transacciones por usuario, repartidas en los últimos `months` meses
+        budgets: Presupuestos por usuario (categoría de gasto y mes distintos)
+        recurring: Transacciones recurrentes por usuario
+        tags: Etiquetas por usuario (como máximo len(TAG_NAMES))
+        seed: Semilla del generador aleatorio
+        today: Fecha de referencia (por defecto hoy)
+        batch_size: Filas por bulk_create
+
+    Returns:
+        dict con los usuarios creados y la cantidad de filas de cada tipo
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = _month_start(today, months - 1)
+    span_days = (today - first_day).days
+    result = {'users': [], 'transactions': 0, 'tags': 0, 'budgets': 0, 'recurring': 0}
+
+    with db_transaction.atomic():
+        created_users = _create_users(users, prefix, make_password(SEED_PASSWORD))
+        result['users'] = created_users
+
+        categories = {}
+        for category in Category.objects.filter(user__in=created_users).order_by('pk'):
+            categories.setdefault((category.user_id, category.transaction_type), []).append(category.pk)
+
+        tag_names = TAG_NAMES[:tags]
+        user_tags = Tag.objects.bulk_create([
+            Tag(user=user, name=name) for user in created_users for name in tag_names
+        ])
+        tag_ids = {}
+        for tag in user_tags:
+            tag_ids.setdefault(tag.user_id, []).append(tag.pk)
+        result['tags'] = len(user_tags)
+
+        batch = []
+        for user in created_users:
+            for _ in range(transactions):
+                transaction_type = 'income' if rng.random() < 0.15 else 'expense'
+                instance = Transaction(
+                    user_id=user.pk,
+                    amount=_amount(rng, transaction_type),
+                    description=rng.choice(DESCRIPTIONS[transaction_type]),
+                    date=first_day + timedelta(days=rng.randint(0, span_days)),
+                    transaction_type=transaction_type,
+                    category_id=rng.choice(categories.get((user.pk, transaction_type), [None])),
+                )
+                chosen_tags = []
+                if tag_ids.get(user.pk) and rng.random() < 0.3:
+                    chosen_tags = rng.sample(tag_ids[user.pk], min(2, len(tag_ids[user.pk])))
+                batch.append((instance, chosen_tags))
+                if len(batch) >= batch_size:
+                    _flush_transactions(batch)
+                    result['transactions'] += len(batch)
+                    batch = []
+        if batch:
+            _flush_transactions(batch)
+            result['transactions'] += len(batch)
+
+        budget_rows = []
+        for user in created_users:
+            expense_categories = categories.get((user.pk, 'expense'), [])
+            slots = [
+                (category_id, _month_start(today, months_back))
+                for months_back in range(months)
+                for category_id in expense_categories
+            ]
+            for category_id, month in rng.sample(slots, min(budgets, len(slots))):
+                budget_rows.append(Budget(
+                    user_id=user.pk, category_id=category_id, month=month,
+                    amount=Decimal(rng.randint(100, 2000)),
+                ))
+        Budget.objects.bulk_create(budget_rows, batch_size=batch_size)
+        result['budgets'] = len(budget_rows)
+
+        recurring_rows = []
+        for user in created_users:
+            for index in range(recurring):
+                transaction_type = 'income' if index == 0 else 'expense'
+                next_occurrence = today + timedelta(days=rng.randint(1, 30))
+                recurring_rows.append(RecurringTransaction(
+                    user_id=user.pk,
+                    name=f'{rng.choice(DESCRIPTIONS[transaction_type])} {index + 1}',
+                    amount=_amount(rng, transaction_type),
+                    transaction_type=transaction_type,
+                    category_id=rng.choice(categories.get((user.pk, transaction_type), [None])),
+                    frequency='monthly' if index == 0 else rng.choice(FREQUENCIES),
+                    start_date=next_occurrence,
+                    next_occurrence=next_occurrence,
+                ))
+        RecurringTransaction.objects.bulk_create(recurring_rows, batch_size=batch_size)
+        result['recurring'] = len(recurring_rows)
+
+        # bulk_create no dispara señales: reconstruir acumulados e índice de búsqueda
+        for user in created_users:
+            rollups.rebuild(user)
+            search.rebuild(user_id=user.pk)
+
+    for user in created_users:
+        aggregate_cache.bump_version(user.pk)
+    return result
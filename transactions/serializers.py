@@ -22,7 +22,7 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = [
-            'id', 'amount', 'description', 'date', 'transaction_type',
+            'id', 'amount', 'currency', 'description', 'date', 'transaction_type',
             'transaction_type_display', 'category', 'category_name',
             'category_color', 'detail_url', 'created_at'
         ]
@@ -49,7 +49,7 @@ class BudgetSerializer(serializers.ModelSerializer):
         model = Budget
         fields = [
             'id', 'category', 'category_name', 'category_color',
-            'amount', 'month', 'spent', 'remaining',
+            'amount', 'currency', 'month', 'spent', 'remaining',
             'percentage_used', 'is_over_budget', 'created_at'
         ]
         read_only_fields = ['id', 'created_at', 'spent', 'remaining', 'percentage_used', 'is_over_budget']
@@ -0,0 +1,276 @@
+"""
+Caché stale-while-revalidate para datos de servicios de terceros.
+
+Cada entrada guarda el valor junto con dos instantes: hasta cuándo está
+fresca (`timeout`) y hasta cuándo puede servirse vencida (`stale_timeout`
+más). Con la entrada fresca se retorna sin más; vencida, se retorna el
+valor viejo y un solo hilo en segundo plano la refresca. Así ningún request
+paga la latencia del servicio mientras haya un valor que servir.
+
+Un lock en la caché (cache.add) evita la estampida: solo quien lo obtiene
+consulta el servicio, tanto al refrescar como cuando no hay entrada; los
+demás esperan a que aparezca el valor. Los fallos (`fetch` retorna None o
+lanza una excepción) también se guardan, durante `negative_timeout`, para no
+reintentar en cada request mientras el servicio está caído; si había un
+valor anterior se sigue sirviendo ese.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'finance:svc'
+
+# Intervalo entre lecturas mientras se espera a que otro proceso traiga el valor
+POLL_INTERVAL = 0.05
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='service-cache')
+_futures = set()
+_futures_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'fresh': 0, 'stale': 0, 'misses': 0, 'negative': 0, 'refreshes': 0}
+
+
+def _key(key):
+    return f'{KEY_PREFIX}:{key}'
+
+
+def _lock_key(key):
+    return f'{KEY_PREFIX}:lock:{key}'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _stale_timeout(stale_timeout):
+    return _setting('SERVICE_CACHE_STALE_TIMEOUT', 86400) if stale_timeout is None else stale_timeout
+
+
+def _negative_timeout(negative_timeout):
+    return _setting('SERVICE_CACHE_NEGATIVE_TIMEOUT', 60) if negative_timeout is None else negative_timeout
+
+
+def _lock_timeout():
+    return _setting('SERVICE_CACHE_LOCK_TIMEOUT', 10)
+
+
+def _build_entry(value, previous, timeout, stale_timeout, negative_timeout):
+    """
+    Retorna (entrada, segundos de vida en la caché) para el resultado de un fetch.
+    """
+    now = time.time()
+    if value is not None:
+        fresh_until = now + timeout
+        return {
+            'value': value,
+            'fresh_until': fresh_until,
+            'stale_until': fresh_until + stale_timeout,
+            'negative': False,
+        }, timeout + stale_timeout
+
+    if previous is not None and not previous['negative'] and previous['stale_until'] > now:
+        # Fallo al refrescar: seguir sirviendo el valor anterior sin reintentar
+        # hasta negative_timeout, sin pasar de su plazo de uso vencido
+        entry = dict(previous, fresh_until=min(now + negative_timeout, previous['stale_until']))
+        return entry, entry['stale_until'] - now
+
+    return {
+        'value': None,
+        'fresh_until': now + negative_timeout,
+        'stale_until': now + negative_timeout,
+        'negative': True,
+    }, negative_timeout
+
+
+def _run_fetch(key, fetch):
+    try:
+        return fetch()
+    except Exception as e:
+        logger.error(f"Error al consultar el servicio para '{key}': {str(e)}")
+        return None
+
+
+def _store(key, value, previous, timeout, stale_timeout, negative_timeout):
+    entry, ttl = _build_entry(value, previous, timeout, stale_timeout, negative_timeout)
+    cache.set(_key(key), entry, ttl)
+    return entry
+
+
+def _release(key, token):
+    if cache.get(_lock_key(key)) == token:
+        cache.delete(_lock_key(key))
+
+
+def _refresh(key, fetch, previous, timeout, stale_timeout, negative_timeout, token):
+    try:
+        _count('refreshes')
+        value = _run_fetch(key, fetch)
+        _store(key, value, previous, timeout, stale_timeout, negative_timeout)
+    finally:
+        _release(key, token)
+
+
+def _schedule_refresh(key, fetch, previous, timeout, stale_timeout, negative_timeout):
+    token = uuid.uuid4().hex
+    if not cache.add(_lock_key(key), token, _lock_timeout()):
+        return  # Otro request ya está refrescando
+    future = _executor.submit(_refresh, key, fetch, previous, timeout, stale_timeout, negative_timeout, token)
+    with _futures_lock:
+        _futures.add(future)
+    future.add_done_callback(_forget)
+
+
+def _forget(future):
+    with _futures_lock:
+        _futures.discard(future)
+
+
+def _served(entry):
+    """Cuenta y retorna el valor de una entrada fresca o vencida (o None si es negativa)."""
+    if entry['negative']:
+        _count('negative')
+    elif entry['fresh_until'] > time.time():
+        _count('fresh')
+    else:
+        _count('stale')
+    return entry['value']
+
+
+def get_or_refresh(key, fetch, timeout, stale_timeout=None, negative_timeout=None):
+    """
+    Retorna el valor de `key`, consultando el servicio con `fetch()` solo cuando hace falta.
+
+    Args:
+        key: Clave del dato (se le agrega KEY_PREFIX)
+        fetch: Función sin argumentos que consulta el servicio; retorna None si falla
+        timeout: Segundos que el valor se considera fresco
+        stale_timeout: Segundos adicionales que se sirve vencido mientras se refresca
+            (por defecto SERVICE_CACHE_STALE_TIMEOUT)
+        negative_timeout: Segundos que se recuerda un fallo (por defecto
+            SERVICE_CACHE_NEGATIVE_TIMEOUT)
+
+    Returns:
+        El valor (posiblemente vencido), o None si el servicio falló
+    """
+    stale_timeout = _stale_timeout(stale_timeout)
+    negative_timeout = _negative_timeout(negative_timeout)
+
+    entry = cache.get(_key(key))
+    if entry is not None:
+        if entry['fresh_until'] <= time.time():
+            _schedule_refresh(key, fetch, entry, timeout, stale_timeout, negative_timeout)
+        return _served(entry)
+
+    _count('misses')
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + _lock_timeout()
+    while not cache.add(_lock_key(key), token, _lock_timeout()):
+        # Otro request está consultando el servicio: esperar su resultado
+        if time.monotonic() >= deadline:
+            return _run_fetch(key, fetch)
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(_key(key))
+        if entry is not None:
+            return entry['value']
+
+    try:
+        # El valor pudo llegar entre la lectura y el lock
+        entry = cache.get(_key(key))
+        if entry is not None:
+            return entry['value']
+        value = _run_fetch(key, fetch)
+        return _store(key, value, None, timeout, stale_timeout, negative_timeout)['value']
+    finally:
+        _release(key, token)
+
+
+async def aget_or_refresh(key, afetch, timeout, refresh, stale_timeout=None, negative_timeout=None):
+    """
+    Versión asíncrona de get_or_refresh.
+
+    Sin entrada, espera a `afetch()` (una corrutina); si se cancela (p. ej.
+    por el plazo del request) guarda el fallo como entrada negativa y
+    propaga la cancelación. Con la entrada vencida,
+    el refresco en segundo plano usa `refresh` (la función síncrona
+    equivalente), ya que debe sobrevivir al event loop del request.
+    """
+    stale_timeout = _stale_timeout(stale_timeout)
+    negative_timeout = _negative_timeout(negative_timeout)
+
+    entry = await cache.aget(_key(key))
+    if entry is not None:
+        if entry['fresh_until'] <= time.time():
+            _schedule_refresh(key, refresh, entry, timeout, stale_timeout, negative_timeout)
+        return _served(entry)
+
+    _count('misses')
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + _lock_timeout()
+    while not await cache.aadd(_lock_key(key), token, _lock_timeout()):
+        if time.monotonic() >= deadline:
+            return await afetch()
+        await asyncio.sleep(POLL_INTERVAL)
+        entry = await cache.aget(_key(key))
+        if entry is not None:
+            return entry['value']
+
+    try:
+        entry = await cache.aget(_key(key))
+        if entry is not None:
+            return entry['value']
+        try:
+            value = await afetch()
+        except asyncio.CancelledError:
+            # Cancelada por el plazo del request: recordar el fallo para que
+            # los siguientes requests no vuelvan a esperar al servicio colgado
+            entry, ttl = _build_entry(None, None, timeout, stale_timeout, negative_timeout)
+            await cache.aset(_key(key), entry, ttl)
+            raise
+        except Exception as e:
+            logger.error(f"Error al consultar el servicio para '{key}': {str(e)}")
+            value = None
+        entry, ttl = _build_entry(value, None, timeout, stale_timeout, negative_timeout)
+        await cache.aset(_key(key), entry, ttl)
+        return entry['value']
+    finally:
+        if await cache.aget(_lock_key(key)) == token:
+            await cache.adelete(_lock_key(key))
+
+
+def invalidate(key):
+    """Elimina la entrada de `key` (el próximo acceso consulta el servicio)."""
+    cache.delete(_key(key))
+
+
+def wait_for_refreshes(timeout=None):
+    """Espera a que terminen los refrescos en segundo plano pendientes."""
+    with _futures_lock:
+        pending = list(_futures)
+    wait(pending, timeout=timeout)
+
+
+def _count(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def stats():
+    """Contadores de la caché de servicios en este proceso."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    """Reinicia los contadores."""
+    with _stats_lock:
+        for counter in _stats:
+            _stats[counter] = 0
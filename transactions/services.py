@@ -1,11 +1,14 @@
 """
 Servicios externos para consumo de APIs de terceros.
 """
-import requests
 from django.conf import settings
 from django.core.cache import cache
 import logging
 
+from finance import caching, http_client
+
+from . import service_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,32 +19,34 @@ class ExchangeRateService:
     """
     
     BASE_URL = "https://api.exchangerate-api.com/v4/latest/USD"
+    CACHE_KEY = 'exchange_rates_usd'
+    CACHE_TIMEOUT = 3600  # 1 hora
     
     @staticmethod
     def get_exchange_rates():
         """
         Obtiene los tipos de cambio actuales desde USD.
-        Retorna un diccionario con las tasas de cambio.
+        Retorna un diccionario con las tasas de cambio (o None si la API falla).
+        """
+        return service_cache.get_or_refresh(
+            ExchangeRateService.CACHE_KEY,
+            ExchangeRateService.fetch_exchange_rates,
+            caching.ttl('exchange_rates', ExchangeRateService.CACHE_TIMEOUT),
+        )
+    
+    @staticmethod
+    def fetch_exchange_rates():
+        """
+        Consulta la API de tipos de cambio sin pasar por la caché.
         """
-        cache_key = 'exchange_rates_usd'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
         try:
-            response = requests.get(ExchangeRateService.BASE_URL, timeout=5)
+            response = http_client.get(ExchangeRateService.BASE_URL, timeout=5)
             if response.status_code == 200:
-                data = response.json()
-                # Cachear por 1 hora
-                cache.set(cache_key, data, 3600)
-                return data
-            else:
-                logger.warning(f"Error al obtener tipos de cambio: {response.status_code}")
-                return None
+                return response.json()
+            logger.warning(f"Error al obtener tipos de cambio: {response.status_code}")
         except Exception as e:
             logger.error(f"Error al consumir API de tipos de cambio: {str(e)}")
-            return None
+        return None
     
     @staticmethod
     def get_currency_rate(currency='EUR'):
@@ -49,7 +54,13 @@ class ExchangeRateService:
         Obtiene la tasa de cambio de USD a una moneda específica.
         currency: código de moneda (EUR, COP, MXN, etc.)
         """
-        rates_data = ExchangeRateService.get_exchange_rates()
+        return ExchangeRateService.extract_rate(ExchangeRateService.get_exchange_rates(), currency)
+    
+    @staticmethod
+    def extract_rate(rates_data, currency='EUR'):
+        """
+        Extrae la tasa de una moneda de la respuesta de la API (o None).
+        """
         if rates_data and 'rates' in rates_data:
             return rates_data['rates'].get(currency.upper(), None)
         return None
@@ -117,47 +128,67 @@ class FreeWeatherService:
     Ejemplo con wttr.in (no requiere API key)
     """
     
+    # wttr.in proporciona datos del clima en formato JSON
+    BASE_URL = "https://wttr.in/{city}?format=j1"
+    CACHE_TIMEOUT = 1800  # 30 minutos
+    
+    @staticmethod
+    def cache_key(city):
+        return f'weather_simple_{city}'
+    
+    @staticmethod
+    def parse_weather(city, data):
+        """
+        Convierte la respuesta de wttr.in al formato usado por el dashboard.
+        """
+        current = data.get('current_condition', [{}])[0]
+        return {
+            'city': city,
+            'temperature': int(current.get('temp_C', 0)),
+            'description': current.get('weatherDesc', [{}])[0].get('value', 'N/A'),
+            'humidity': int(current.get('humidity', 0)),
+            'wind_speed': float(current.get('windspeedKmph', 0)),
+        }
+    
+    @staticmethod
+    def default_weather(city):
+        """
+        Datos por defecto cuando el servicio no responde.
+        """
+        return {
+            'city': city,
+            'temperature': 22,
+            'description': 'Información no disponible',
+            'humidity': 0,
+            'wind_speed': 0,
+        }
+    
     @staticmethod
     def get_weather_simple(city="Medellin"):
         """
         Obtiene información del clima usando wttr.in (API pública gratuita).
+        Si el servicio no responde retorna los datos por defecto.
+        """
+        weather_data = service_cache.get_or_refresh(
+            FreeWeatherService.cache_key(city),
+            lambda: FreeWeatherService.fetch_weather(city),
+            caching.ttl('weather', FreeWeatherService.CACHE_TIMEOUT),
+        )
+        if weather_data is None:
+            return FreeWeatherService.default_weather(city)
+        return weather_data
+    
+    @staticmethod
+    def fetch_weather(city):
+        """
+        Consulta wttr.in sin pasar por la caché.
         """
-        cache_key = f'weather_simple_{city}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
-        
         try:
-            # wttr.in proporciona datos del clima en formato JSON
-            url = f"https://wttr.in/{city}?format=j1"
-            response = requests.get(url, timeout=5)
-            
+            url = FreeWeatherService.BASE_URL.format(city=city)
+            response = http_client.get(url, timeout=5)
             if response.status_code == 200:
-                data = response.json()
-                current = data.get('current_condition', [{}])[0]
-                
-                weather_data = {
-                    'city': city,
-                    'temperature': int(current.get('temp_C', 0)),
-                    'description': current.get('weatherDesc', [{}])[0].get('value', 'N/A'),
-                    'humidity': int(current.get('humidity', 0)),
-                    'wind_speed': float(current.get('windspeedKmph', 0)),
-                }
-                
-                # Cachear por 30 minutos
-                cache.set(cache_key, weather_data, 1800)
-                return weather_data
+                return FreeWeatherService.parse_weather(city, response.json())
+            logger.warning(f"Error al obtener clima desde wttr.in: {response.status_code}")
         except Exception as e:
             logger.error(f"Error al obtener clima desde wttr.in: {str(e)}")
-            # Retornar datos por defecto en caso de error
-            return {
-                'city': city,
-                'temperature': 22,
-                'description': 'Información no disponible',
-                'humidity': 0,
-                'wind_speed': 0,
-            }
-        
         return None
-
@@ -0,0 +1,167 @@
+"""
+Señales de la app de transacciones.
+Mantienen los acumulados mensuales (MonthlyRollup) y el índice de búsqueda
+sincronizados con Transaction e invalidan la caché de agregados del usuario
+en cada escritura.
+"""
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction
+from . import aggregate_cache, rollups, search
+
+
+def _deleting_user(origin):
+    """True si el borrado en curso viene de eliminar usuarios (los acumulados caen en cascada)."""
+    if isinstance(origin, User):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is User
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, raw=False, **kwargs):
+    """Guarda los valores previos de la transacción para poder descontarlos luego."""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        Transaction.objects.filter(pk=instance.pk)
+        .values_list('user_id', 'date', 'transaction_type', 'category_id', 'currency', 'amount')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Aplica el alta o la modificación de una transacción sobre los acumulados."""
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        *key, amount = previous
+        rollups.apply_delta(rollups.rollup_key(*key), -amount, -1)
+    rollups.apply_delta(
+        rollups.rollup_key(
+            instance.user_id, instance.date, instance.transaction_type, instance.category_id, instance.currency
+        ),
+        instance.amount,
+        1,
+    )
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    """Descuenta una transacción eliminada de los acumulados."""
+    if _deleting_user(origin):
+        return
+    rollups.apply_delta(
+        rollups.rollup_key(
+            instance.user_id, instance.date, instance.transaction_type, instance.category_id, instance.currency
+        ),
+        -instance.amount,
+        -1,
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def fold_rollups_on_category_delete(sender, instance, origin=None, **kwargs):
+    """Mueve los acumulados de una categoría eliminada al grupo sin categoría."""
+    if _deleting_user(origin):
+        return
+    rollups.fold_category(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def index_transaction_on_save(sender, instance, raw=False, using='default', **kwargs):
+    """Reindexa la transacción guardada para la búsqueda de texto completo."""
+    if raw:
+        return
+    search.index_transactions([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Transaction)
+def unindex_transaction_on_delete(sender, instance, using='default', **kwargs):
+    """Quita la transacción eliminada del índice de búsqueda."""
+    search.remove_transactions([instance.pk], using=using)
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def index_transaction_on_tags_change(sender, instance, action, reverse, pk_set, using='default', **kwargs):
+    """Reindexa las transacciones cuyas etiquetas cambiaron."""
+    if action == 'pre_clear' and reverse:
+        # Tras el clear ya no se sabe qué transacciones tenía la etiqueta
+        instance._search_transaction_ids = list(instance.transactions.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        ids = [instance.pk]
+    elif action == 'post_clear':
+        ids = getattr(instance, '_search_transaction_ids', [])
+    else:
+        ids = pk_set or []
+    search.index_transactions(ids, using=using)
+
+
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Tag)
+def remember_previous_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda el nombre previo de la categoría o etiqueta para detectar un renombrado."""
+    instance._search_previous_name = None
+    if raw or instance.pk is None or (update_fields is not None and 'name' not in update_fields):
+        return
+    instance._search_previous_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def reindex_on_rename(sender, instance, created=False, raw=False, using='default', **kwargs):
+    """Reindexa las transacciones de una categoría o etiqueta solo si cambió su nombre."""
+    previous_name = getattr(instance, '_search_previous_name', None)
+    instance._search_previous_name = None
+    if raw or created or previous_name is None or previous_name == instance.name:
+        return
+    search.index_transactions(instance.transactions.values_list('pk', flat=True), using=using)
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def remember_indexed_transactions(sender, instance, origin=None, **kwargs):
+    """Guarda las transacciones afectadas antes de que el borrado las desvincule."""
+    instance._search_transaction_ids = []
+    if _deleting_user(origin):
+        return
+    instance._search_transaction_ids = list(instance.transactions.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def reindex_on_delete(sender, instance, using='default', **kwargs):
+    """Reindexa las transacciones que perdieron su categoría o etiqueta."""
+    search.index_transactions(getattr(instance, '_search_transaction_ids', []), using=using)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=SavingsGoal)
+@receiver(post_delete, sender=SavingsGoal)
+@receiver(post_save, sender=RecurringTransaction)
+@receiver(post_delete, sender=RecurringTransaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_user_data_version(sender, instance, raw=False, origin=None, **kwargs):
+    """Invalida los agregados en caché del dueño del objeto modificado."""
+    if raw or _deleting_user(origin):
+        return
+    aggregate_cache.bump_version(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+def bump_version_on_user_delete(sender, instance, **kwargs):
+    """Al eliminar un usuario basta con invalidar una vez sus agregados y los globales."""
+    aggregate_cache.bump_version(instance.pk)
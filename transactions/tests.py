@@ -1,8 +1,29 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db.models.query import QuerySet
+from django.urls import reverse
 from datetime import date, timedelta
-from .models import Transaction, Category, Budget
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
+import json
+import numpy as np
+import socketserver
+import requests
+import tempfile
+import threading
+import time
+from .models import Transaction, Category, Tag, Budget, MonthlyRollup, ReportJob, RecurringTransaction, ExchangeRateSnapshot
+from finance import caching, http_client
+from .exports import iter_csv, iter_transaction_rows
+from .report_generators import ReportGeneratorFactory
+from .services import ExchangeRateService, FreeWeatherService
+from . import aggregate_cache, async_services, benchmark, currency, service_cache, forecast, importers, recurrence, report_jobs, rollups, scheduler, search, seeding, utils
 
 
 class TransactionModelTest(TestCase):
@@ -57,6 +78,30 @@ class TransactionModelTest(TestCase):
         self.assertTrue(transaction.is_expense)
         self.assertFalse(transaction.is_income)
         self.assertEqual(transaction.user, self.user)
+    
+    def test_totals_single_query(self):
+        """totals() y monthly_totals() resuelven todo con una consulta cada uno."""
+        for amount, transaction_type, day in [
+            ('100.00', 'income', date(2025, 1, 5)),
+            ('30.00', 'expense', date(2025, 1, 9)),
+            ('20.00', 'expense', date(2025, 2, 1)),
+        ]:
+            Transaction.objects.create(
+                user=self.user, amount=Decimal(amount), transaction_type=transaction_type, date=day
+            )
+        
+        with self.assertNumQueries(1):
+            totals = Transaction.objects.filter(user=self.user).totals()
+        self.assertEqual(totals, {
+            'income': Decimal('100.00'), 'expense': Decimal('50.00'),
+            'balance': Decimal('50.00'), 'count': 3,
+        })
+        
+        with self.assertNumQueries(1):
+            months = Transaction.objects.filter(user=self.user).monthly_totals()
+        self.assertEqual([row['month'] for row in months], [date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertEqual(months[1]['balance'], Decimal('-20.00'))
+        self.assertEqual(Transaction.objects.none().totals()['balance'], 0)
 
 
 class BudgetModelTest(TestCase):
@@ -137,3 +182,1868 @@ class BudgetModelTest(TestCase):
         self.assertEqual(budget.spent, 550.00)
         self.assertTrue(budget.is_over_budget)
         self.assertGreaterEqual(budget.percentage_used, 100)
+    
+    def test_with_spending_annotates_in_one_query(self):
+        """with_spending() calcula el gasto de todos los presupuestos en una consulta."""
+        other, _ = Category.objects.get_or_create(
+            user=self.user, name='Ocio Test', defaults={'transaction_type': 'expense'}
+        )
+        Budget.objects.create(user=self.user, category=self.category, amount=Decimal('200.00'), month=self.month)
+        Budget.objects.create(user=self.user, category=other, amount=Decimal('100.00'), month=self.month)
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('250.00'), date=self.month,
+            transaction_type='expense', category=self.category
+        )
+        
+        with self.assertNumQueries(1):
+            budgets = {
+                b.category_id: b
+                for b in Budget.objects.filter(user=self.user).with_spending()
+            }
+            self.assertEqual(budgets[self.category.id].spent, Decimal('250.00'))
+            self.assertTrue(budgets[self.category.id].is_over_budget)
+            self.assertEqual(budgets[self.category.id].percentage_used_css, '100.0%')
+            self.assertEqual(budgets[other.id].spent, 0)
+            self.assertEqual(budgets[other.id].remaining, Decimal('100.00'))
+
+
+class MonthlyRollupTest(TestCase):
+    """
+    Pruebas para el mantenimiento incremental de los acumulados mensuales.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='rollupuser', password='testpass123')
+        self.food, _ = Category.objects.get_or_create(
+            user=self.user, name='Comida Test', defaults={'transaction_type': 'expense'}
+        )
+        self.rent, _ = Category.objects.get_or_create(
+            user=self.user, name='Arriendo Test', defaults={'transaction_type': 'expense'}
+        )
+        self.month = date(2025, 3, 1)
+    
+    def _rollup(self, category, month=None):
+        return MonthlyRollup.objects.get(
+            user=self.user, month=month or self.month,
+            transaction_type='expense', category=category
+        )
+    
+    def test_create_update_delete_keep_rollups_in_sync(self):
+        """Alta, modificación y baja de transacciones actualizan los acumulados."""
+        first = Transaction.objects.create(
+            user=self.user, amount=Decimal('100.00'), date=date(2025, 3, 5),
+            transaction_type='expense', category=self.food
+        )
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('50.50'), date=date(2025, 3, 20),
+            transaction_type='expense', category=self.food
+        )
+        rollup = self._rollup(self.food)
+        self.assertEqual(rollup.total, Decimal('150.50'))
+        self.assertEqual(rollup.count, 2)
+        
+        # Cambiar categoría y mes mueve el monto entre filas
+        first.category = self.rent
+        first.date = date(2025, 4, 2)
+        first.save()
+        self.assertEqual(self._rollup(self.food).total, Decimal('50.50'))
+        self.assertEqual(self._rollup(self.rent, date(2025, 4, 1)).total, Decimal('100.00'))
+        
+        first.delete()
+        self.assertFalse(
+            MonthlyRollup.objects.filter(user=self.user, category=self.rent).exists()
+        )
+        self.assertEqual(rollups.verify(self.user), [])
+    
+    def test_category_delete_folds_into_uncategorized(self):
+        """Al borrar una categoría sus acumulados pasan al grupo sin categoría."""
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('80.00'), date=date(2025, 3, 5),
+            transaction_type='expense', category=self.food
+        )
+        self.food.delete()
+        self.assertEqual(self._rollup(None).total, Decimal('80.00'))
+        self.assertEqual(rollups.verify(self.user), [])
+    
+    def test_rebuild_command_restores_rollups(self):
+        """El comando rebuild_rollups reconstruye y verifica los acumulados."""
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('30.00'), date=date(2025, 3, 5),
+            transaction_type='income', category=None
+        )
+        MonthlyRollup.objects.all().delete()
+        self.assertNotEqual(rollups.verify(self.user), [])
+        
+        call_command('rebuild_rollups', user='rollupuser', stdout=StringIO())
+        self.assertEqual(rollups.verify(self.user), [])
+        
+        totals = MonthlyRollup.objects.filter(user=self.user).totals()
+        self.assertEqual(totals['income'], Decimal('30.00'))
+        self.assertEqual(totals['balance'], Decimal('30.00'))
+    
+    def test_check_command_reports_corrupted_rollup(self):
+        """rebuild_rollups --check informa la fila corrupta (con su moneda) sin reconstruir."""
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('30.00'), date=date(2025, 3, 5),
+            transaction_type='expense', category=self.food, currency='EUR'
+        )
+        MonthlyRollup.objects.filter(user=self.user).update(total=Decimal('99.00'))
+        
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', user='rollupuser', stdout=out)
+        self.assertIn('mes=2025-03 tipo=expense', out.getvalue())
+        self.assertIn('moneda=EUR', out.getvalue())
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user).total, Decimal('99.00'))
+
+
+class TransactionExportTest(TestCase):
+    """
+    Pruebas para la exportación de transacciones a CSV en streaming.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='exportuser', password='testpass123')
+        self.client.login(username='exportuser', password='testpass123')
+        self.category, _ = Category.objects.get_or_create(
+            user=self.user, name='Mercado Test', defaults={'transaction_type': 'expense'}
+        )
+        self.tag = Tag.objects.create(user=self.user, name='hogar')
+    
+    def test_export_streams_category_and_tags(self):
+        """El CSV incluye categoría y etiquetas y respeta los filtros."""
+        expense = Transaction.objects.create(
+            user=self.user, amount=Decimal('12.50'), description='Pan', date=date(2025, 1, 10),
+            transaction_type='expense', category=self.category
+        )
+        expense.tags.add(self.tag)
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('500.00'), description='Sueldo', date=date(2025, 1, 1),
+            transaction_type='income'
+        )
+        
+        response = self.client.get(reverse('transactions:export_transactions'), {'type': 'expense'})
+        self.assertTrue(response.streaming)
+        
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'Fecha,Tipo,Monto,Moneda,Descripción,Categoría,Etiquetas')
+        self.assertEqual(lines[1:], ['10/01/2025,Gasto,12.50,COP,Pan,Mercado Test,hogar'])
+    
+    def test_tags_resolved_per_chunk(self):
+        """Las etiquetas se consultan una vez por bloque, no por fila."""
+        for day in range(1, 6):
+            t = Transaction.objects.create(
+                user=self.user, amount=Decimal('1.00'), date=date(2025, 2, day),
+                transaction_type='expense'
+            )
+            t.tags.add(self.tag)
+        
+        queryset = Transaction.objects.filter(user=self.user)
+        # 1 consulta de filas + 1 consulta de etiquetas por cada bloque de 2 filas
+        with self.assertNumQueries(4):
+            rows = list(iter_transaction_rows(queryset, chunk_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row[-1] == ['hogar'] for row in rows))
+
+
+class ExcelReportTest(TestCase):
+    """
+    Pruebas para el generador de reportes Excel en streaming.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='exceluser', password='testpass123')
+        self.client.login(username='exceluser', password='testpass123')
+    
+    def test_excel_report_rows_and_db_totals(self):
+        """El reporte Excel contiene las filas y los totales calculados en BD."""
+        from openpyxl import load_workbook
+        
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('1000.00'), description='Salario',
+            date=date(2025, 5, 1), transaction_type='income'
+        )
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('250.25'), description='Mercado',
+            date=date(2025, 5, 3), transaction_type='expense'
+        )
+        
+        response = self.client.get(reverse('transactions:export_report', args=['excel']))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook['Transacciones'].values)
+        self.assertEqual(rows[0], ('Fecha', 'Tipo', 'Descripción', 'Monto', 'Moneda', 'Categoría'))
+        self.assertEqual(rows[1][4], 'COP')
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[-3][2:5], ('TOTAL INGRESOS (COP)', 1000, 'COP'))
+        self.assertEqual(rows[-2][2:5], ('TOTAL GASTOS (COP)', 250.25, 'COP'))
+        self.assertEqual(rows[-1][2:5], ('BALANCE (COP)', 749.75, 'COP'))
+
+
+class PDFReportTest(TestCase):
+    """
+    Pruebas para el generador de reportes PDF paginado.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='pdfuser', password='testpass123')
+        for amount, transaction_type, day in [('0.10', 'income', 1), ('0.20', 'income', 2), ('0.30', 'expense', 3)]:
+            Transaction.objects.create(
+                user=self.user, amount=Decimal(amount), date=date(2025, 6, day),
+                transaction_type=transaction_type
+            )
+        self.queryset = Transaction.objects.filter(user=self.user).order_by('-date')
+        self.generator = ReportGeneratorFactory.get_generator('pdf')
+    
+    def test_totals_are_exact_decimals(self):
+        """Los totales se calculan en BD con Decimal exacto."""
+        totals = self.generator.get_totals(self.queryset)
+        self.assertEqual(totals['income'], Decimal('0.30'))
+        self.assertEqual(totals['income'] - totals['expense'], Decimal('0'))
+        
+        monthly = list(self.generator.get_monthly_summary(self.queryset))
+        self.assertEqual(monthly, [(date(2025, 6, 1), Decimal('0.30'), Decimal('0.30'))])
+    
+    def test_rows_split_into_page_sized_tables(self):
+        """Las filas se dividen en tablas de ROWS_PER_TABLE filas."""
+        self.generator.ROWS_PER_TABLE = 2
+        tables = self.generator.build_tables(['A'], ([i] for i in range(5)), None, None)
+        self.assertEqual([len(t._cellvalues) for t in tables], [3, 3, 2])
+        
+        response = self.generator.generate(self.queryset, 'reporte')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+    
+    @override_settings(PDF_REPORT_MAX_ROWS=2)
+    def test_detail_rows_are_capped(self):
+        """El detalle se limita a PDF_REPORT_MAX_ROWS filas; los resúmenes cubren todo."""
+        built = []
+        build_tables = self.generator.build_tables
+        
+        def record(header, rows, *args):
+            rows = list(rows)
+            built.append((header[0], len(rows)))
+            return build_tables(header, rows, *args)
+        
+        with mock.patch.object(self.generator, 'build_tables', side_effect=record):
+            response = self.generator.generate(self.queryset, 'reporte')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(('Fecha', 2), built)
+        self.assertIn(('Categoría', 2), built)  # ingresos y gastos sin categoría
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ReportJobTest(TestCase):
+    """
+    Pruebas para la cola de reportes en segundo plano.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='jobuser', password='testpass123')
+        self.client.login(username='jobuser', password='testpass123')
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('40.00'), date=date(2025, 7, 1),
+            transaction_type='expense'
+        )
+    
+    def test_identical_pending_requests_are_deduplicated(self):
+        """Dos solicitudes idénticas pendientes comparten el mismo trabajo."""
+        url = reverse('transactions:request_report_job', args=['excel'])
+        first = self.client.post(url, {'type': 'expense'})
+        second = self.client.post(url, {'type': 'expense'})
+        other = self.client.post(url, {'type': 'income'})
+        
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertNotEqual(first.json()['id'], other.json()['id'])
+        self.assertEqual(ReportJob.objects.count(), 2)
+    
+    def test_list_page_requests_job_in_background(self):
+        """La lista envía el formulario por fetch y muestra el enlace de descarga al terminar."""
+        response = self.client.get(reverse('transactions:transaction_list'), {'type': 'expense'})
+        self.assertContains(response, 'id="request-report-job"')
+        self.assertContains(response, 'id="report-job-status"')
+        self.assertContains(response, 'data.download_url')
+        self.assertContains(response, '<input type="hidden" name="type" value="expense">', html=True)
+    
+    def test_request_requires_post(self):
+        """Un GET no encola trabajos (prefetch de enlaces, crawlers)."""
+        url = reverse('transactions:request_report_job', args=['excel'])
+        response = self.client.get(url, {'type': 'expense'})
+        
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(ReportJob.objects.exists())
+    
+    def test_concurrent_enqueue_reuses_active_job(self):
+        """Si otra solicitud insertó el trabajo entre la lectura y el insert, se reutiliza."""
+        job, _ = report_jobs.enqueue(self.user, 'pdf', {'type': 'expense'})
+        real_first = QuerySet.first
+        calls = []
+        
+        def first_missing_once(queryset):
+            calls.append(1)
+            if len(calls) == 1:
+                return None
+            return real_first(queryset)
+        
+        with mock.patch.object(QuerySet, 'first', first_missing_once):
+            again, created = report_jobs.enqueue(self.user, 'pdf', {'type': 'expense'})
+        
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(ReportJob.objects.count(), 1)
+    
+    def test_worker_generates_downloadable_file(self):
+        """El worker genera el archivo y queda disponible para descarga."""
+        job, _ = report_jobs.enqueue(self.user, 'pdf', {})
+        status_url = reverse('transactions:report_job_status', args=[job.id])
+        self.assertEqual(self.client.get(status_url).json()['status'], 'pending')
+        
+        processed = report_jobs.process_next_job()
+        self.assertEqual(processed.status, ReportJob.STATUS_DONE)
+        self.assertIsNone(report_jobs.process_next_job())
+        
+        data = self.client.get(status_url).json()
+        self.assertEqual(data['status'], 'done')
+        download = self.client.get(data['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+
+
+class TransactionAPIPaginationTest(TestCase):
+    """
+    Pruebas para la paginación por cursor de la API de transacciones.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='apiuser', password='testpass123')
+        self.client.login(username='apiuser', password='testpass123')
+        # Varias transacciones con la misma fecha para probar el desempate por created_at/id
+        for i in range(7):
+            Transaction.objects.create(
+                user=self.user, amount=Decimal('10.00'), date=date(2025, 8, 1 + i // 3),
+                transaction_type='income' if i % 2 else 'expense'
+            )
+    
+    def test_cursor_walks_all_rows_without_duplicates(self):
+        """Recorrer las páginas devuelve todas las filas una sola vez y en orden."""
+        url = reverse('transaction-list') + '?page_size=3'
+        seen = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['transactions']), 3)
+            seen.extend(row['id'] for row in data['transactions'])
+            url = data['next']
+            pages += 1
+        
+        expected = list(
+            Transaction.objects.filter(user=self.user)
+            .order_by('-date', '-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+    
+    def test_invalid_cursor_and_summary(self):
+        """Un cursor inválido da 404 y el resumen se calcula aparte."""
+        response = self.client.get(reverse('transaction-list'), {'cursor': 'no-valido'})
+        self.assertEqual(response.status_code, 404)
+        
+        summary = self.client.get(reverse('transaction-summary')).json()['summary']
+        self.assertEqual(summary['count'], 7)
+        self.assertEqual(summary['total_income'], 30.0)
+        self.assertEqual(summary['balance'], -10.0)
+
+
+class AggregateCacheTest(TestCase):
+    """
+    Pruebas para la caché de agregados versionada por usuario.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        cache.clear()
+        aggregate_cache.reset_stats()
+        self.user = User.objects.create_user(username='cacheuser', password='testpass123')
+        self.other = User.objects.create_user(username='otheruser', password='testpass123')
+    
+    def test_memoized_until_user_data_changes(self):
+        """El valor se reutiliza hasta que una escritura incrementa la versión."""
+        count = lambda: Transaction.objects.filter(user=self.user).count()
+        
+        self.assertEqual(aggregate_cache.memoize(self.user.id, 'count', count), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(aggregate_cache.memoize(self.user.id, 'count', count), 0)
+        
+        # Escribir datos de otro usuario no invalida la caché de este
+        Transaction.objects.create(
+            user=self.other, amount=Decimal('5.00'), transaction_type='income', date=date(2025, 1, 1)
+        )
+        with self.assertNumQueries(0):
+            aggregate_cache.memoize(self.user.id, 'count', count)
+        
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('5.00'), transaction_type='income', date=date(2025, 1, 1)
+        )
+        self.assertEqual(aggregate_cache.memoize(self.user.id, 'count', count), 1)
+        self.assertEqual(aggregate_cache.stats()['hits'], 2)
+        self.assertEqual(aggregate_cache.stats()['misses'], 2)
+    
+    def test_list_view_totals_refresh_after_write(self):
+        """Los totales de la lista de transacciones reflejan los cambios."""
+        self.client.login(username='cacheuser', password='testpass123')
+        url = reverse('transactions:transaction_list')
+        self.assertEqual(self.client.get(url).context['total_income'], 0)
+        
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('70.00'), transaction_type='income', date=date(2025, 1, 1)
+        )
+        self.assertEqual(self.client.get(url).context['total_income'], Decimal('70.00'))
+
+
+class TransactionImportTest(TestCase):
+    """
+    Pruebas de la importación masiva de transacciones.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='importuser', password='testpass123')
+        self.category = Category.objects.create(user=self.user, name='Comida', transaction_type='expense')
+    
+    def test_csv_import_with_categories_tags_and_row_errors(self):
+        """Importa filas válidas, crea categorías/etiquetas nuevas y reporta las inválidas."""
+        content = (
+            'Fecha,Tipo,Monto,Descripción,Categoría,Etiquetas\n'
+            '15/01/2025,Gasto,25.50,Almuerzo,comida,"trabajo, viaje"\n'
+            '2025-01-20,Ingreso,1000,Salario,Sueldo,\n'
+            'no-es-fecha,Gasto,10,Malo,,\n'
+            '21/01/2025,Gasto,-0,Cero,,\n'
+            '22/01/2025,Otro,5,Tipo malo,,\n'
+        ).encode('utf-8')
+        
+        result = importers.import_transactions(self.user, BytesIO(content), 'csv')
+        
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['error_count'], 3)
+        self.assertEqual([error['row'] for error in result['errors']], [4, 5, 6])
+        
+        lunch = Transaction.objects.get(user=self.user, description='Almuerzo')
+        self.assertEqual(lunch.category, self.category)
+        self.assertEqual(sorted(lunch.tags.values_list('name', flat=True)), ['trabajo', 'viaje'])
+        salary = Transaction.objects.get(user=self.user, description='Salario')
+        self.assertEqual(salary.category.name, 'Sueldo')
+        self.assertEqual(salary.transaction_type, 'income')
+        # bulk_create no dispara señales: los acumulados se actualizan igual
+        self.assertEqual(rollups.verify(self.user), [])
+    
+    def test_import_uses_constant_queries_per_batch(self):
+        """El número de consultas depende de los lotes, no de las filas."""
+        Tag.objects.create(user=self.user, name='fijo')
+        lines = ['Fecha,Tipo,Monto,Descripción,Categoría,Etiquetas']
+        lines += [f'2025-02-{day % 28 + 1:02d},Gasto,{day + 1},Fila {day},Comida,fijo' for day in range(200)]
+        content = '\n'.join(lines).encode('utf-8')
+        
+        # 2 lecturas de categorías/etiquetas, el savepoint de la transacción,
+        # 5 consultas por lote (transacciones, etiquetas, acumulado y las dos
+        # del índice de búsqueda) y la creación del acumulado del mes (3 con
+        # su savepoint). Lotes de 50 filas: SQLite limita a 999 los parámetros
+        # de cada INSERT.
+        with self.assertNumQueries(2 + 2 + 4 * 5 + 3):
+            result = importers.import_transactions(self.user, BytesIO(content), 'csv', batch_size=50)
+        self.assertEqual(result['created'], 200)
+        self.assertEqual(Transaction.tags.through.objects.filter(tag__name='fijo').count(), 200)
+    
+    def test_ofx_import(self):
+        """Lee movimientos de un extracto OFX en formato SGML."""
+        content = (
+            'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20250305120000[-5:EST]\n<TRNAMT>-42.10\n<NAME>Supermercado\n</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20250306\n<TRNAMT>300.00\n<MEMO>Reembolso\n</STMTTRN>\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        ).encode('latin-1')
+        
+        result = importers.import_transactions(self.user, BytesIO(content), 'ofx')
+        
+        self.assertEqual(result['created'], 2)
+        expense = Transaction.objects.get(user=self.user, transaction_type='expense')
+        self.assertEqual(expense.amount, Decimal('42.10'))
+        self.assertEqual(expense.date, date(2025, 3, 5))
+        self.assertEqual(expense.description, 'Supermercado')
+    
+    def test_ofx_standard_transaction_types(self):
+        """Los TRNTYPE estándar (POS, DEP, ATM...) se aceptan; la dirección la da el signo de TRNAMT."""
+        content = (
+            'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            '<STMTTRN>\n<TRNTYPE>POS\n<DTPOSTED>20250305\n<TRNAMT>-15.00\n<NAME>Panadería\n</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>DEP\n<DTPOSTED>20250306\n<TRNAMT>1200.00\n<NAME>Nómina\n</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>XFER\n<DTPOSTED>20250307\n<TRNAMT>-200.00\n<NAME>Transferencia\n</STMTTRN>\n'
+            '<STMTTRN>\n<TRNTYPE>ATM\n<DTPOSTED>20250308\n<TRNAMT>50.00\n<NAME>Cajero\n</STMTTRN>\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        ).encode('latin-1')
+        
+        result = importers.import_transactions(self.user, BytesIO(content), 'ofx')
+        
+        self.assertEqual((result['created'], result['error_count']), (4, 0))
+        self.assertEqual(
+            dict(Transaction.objects.filter(user=self.user).values_list('description', 'transaction_type')),
+            {'Panadería': 'expense', 'Nómina': 'income', 'Transferencia': 'expense', 'Cajero': 'expense'},
+        )
+    
+    def test_non_finite_amount_is_row_error(self):
+        """NaN o Infinity se reportan como error de la fila sin abortar la importación."""
+        content = 'Fecha,Tipo,Monto\n2025-01-01,Gasto,NaN\n2025-01-02,Gasto,Infinity\n2025-01-03,Gasto,5\n'.encode('utf-8')
+        
+        result = importers.import_transactions(self.user, BytesIO(content), 'csv')
+        
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3])
+    
+    def test_invalid_row_creates_no_categories_or_tags(self):
+        """Una fila inválida no deja categorías ni etiquetas huérfanas."""
+        content = 'Fecha,Tipo,Monto,Categoría,Etiquetas\nno-es-fecha,Gasto,5,Huérfana,suelta\n'.encode('utf-8')
+        
+        result = importers.import_transactions(self.user, BytesIO(content), 'csv')
+        
+        self.assertEqual(result['error_count'], 1)
+        self.assertFalse(Category.objects.filter(user=self.user, name='Huérfana').exists())
+        self.assertFalse(Tag.objects.filter(user=self.user, name='suelta').exists())
+    
+    def test_import_view(self):
+        """La vista detecta el formato por la extensión y redirige si no hubo errores."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        self.client.login(username='importuser', password='testpass123')
+        upload = SimpleUploadedFile('movimientos.csv', b'Fecha,Monto\n2025-01-01,-12.00\n', content_type='text/csv')
+        
+        response = self.client.post(reverse('transactions:transaction_import'), {'file': upload, 'create_missing': 'on'})
+        
+        self.assertRedirects(response, reverse('transactions:transaction_list'))
+        self.assertEqual(Transaction.objects.get(user=self.user).transaction_type, 'expense')
+
+
+class RecurringSchedulerTest(TestCase):
+    """
+    Pruebas del procesamiento por lotes de transacciones recurrentes.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='recurringuser', password='testpass123')
+        self.other = User.objects.create_user(username='recurringother', password='testpass123')
+    
+    def create_recurring(self, user, frequency, start, **kwargs):
+        return RecurringTransaction.objects.create(
+            user=user,
+            name=kwargs.pop('name', 'Recurrente'),
+            amount=kwargs.pop('amount', Decimal('100.00')),
+            transaction_type=kwargs.pop('transaction_type', 'expense'),
+            frequency=frequency,
+            start_date=start,
+            next_occurrence=start,
+            **kwargs
+        )
+    
+    def test_catch_up_all_missed_occurrences(self):
+        """Genera cada ocurrencia pendiente, con ajuste a fin de mes, y avanza la próxima fecha."""
+        rent = self.create_recurring(self.user, 'monthly', date(2025, 1, 31), name='Arriendo')
+        weekly = self.create_recurring(self.other, 'weekly', date(2025, 3, 1), transaction_type='income')
+        self.create_recurring(self.user, 'daily', date(2025, 6, 1), name='Futura')
+        
+        result = scheduler.process_due(today=date(2025, 5, 15))
+        
+        self.assertEqual(result['recurrences'], 2)
+        self.assertEqual(
+            list(rent.instances.order_by('date').values_list('date', flat=True)),
+            [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)],
+        )
+        self.assertEqual(weekly.instances.count(), 11)
+        self.assertEqual(result['by_user'], {self.user.id: 4, self.other.id: 11})
+        rent.refresh_from_db()
+        self.assertEqual(rent.next_occurrence, date(2025, 5, 31))
+        self.assertEqual(rollups.verify(), [])
+    
+    def test_rerun_is_idempotent_and_end_date_deactivates(self):
+        """Una segunda ejecución no duplica ocurrencias; al pasar end_date se desactiva."""
+        recurring = self.create_recurring(
+            self.user, 'biweekly', date(2025, 1, 1), end_date=date(2025, 2, 1)
+        )
+        
+        first = scheduler.process_due(today=date(2025, 3, 1))
+        second = scheduler.process_due(today=date(2025, 3, 1))
+        
+        self.assertEqual(first['transactions'], 3)
+        self.assertEqual(first['deactivated'], 1)
+        self.assertEqual(second['transactions'], 0)
+        recurring.refresh_from_db()
+        self.assertFalse(recurring.is_active)
+        self.assertEqual(recurring.instances.count(), 3)
+    
+    def test_duplicate_occurrence_isolated_from_batch(self):
+        """
+        Si una ocurrencia ya existe, esa recurrencia no deja datos parciales y
+        se reporta, pero el resto de su lote se registra igual.
+        """
+        recurring = self.create_recurring(self.user, 'monthly', date(2025, 1, 10))
+        healthy = self.create_recurring(self.other, 'monthly', date(2025, 1, 15))
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('100.00'), transaction_type='expense',
+            date=date(2025, 2, 10), recurring_transaction=recurring,
+        )
+        
+        result = scheduler.process_due(today=date(2025, 3, 1))
+        
+        self.assertEqual(result['failed'], [recurring.pk])
+        self.assertEqual(result['transactions'], 2)
+        recurring.refresh_from_db()
+        self.assertEqual(recurring.next_occurrence, date(2025, 1, 10))
+        self.assertEqual(recurring.instances.count(), 1)
+        self.assertEqual(healthy.instances.count(), 2)
+        self.assertEqual(rollups.verify(), [])
+
+    def test_process_view_reports_conflict(self):
+        """El botón de procesar informa el error en lugar de 0 transacciones creadas."""
+        start = timezone.now().date() - timedelta(days=1)
+        recurring = self.create_recurring(self.user, 'daily', start)
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('100.00'), transaction_type='expense',
+            date=start, recurring_transaction=recurring,
+        )
+        self.client.login(username='recurringuser', password='testpass123')
+
+        response = self.client.get(
+            reverse('transactions:process_recurring_transaction', args=[recurring.pk]), follow=True
+        )
+
+        messages = [m for m in response.context['messages']]
+        self.assertEqual([m.level_tag for m in messages], ['error'])
+        self.assertIn('No se pudieron registrar', str(messages[0]))
+
+    def test_command(self):
+        """El comando process_recurring procesa hasta la fecha indicada."""
+        self.create_recurring(self.user, 'quarterly', date(2024, 11, 30))
+        out = StringIO()
+        call_command('process_recurring', '--date', '2025-06-01', stdout=out)
+        self.assertIn('3 transacciones creadas', out.getvalue())
+
+
+class RecurrenceEngineTest(TestCase):
+    """
+    Pruebas del motor vectorizado de fechas de recurrencia.
+    """
+    
+    def test_month_end_clamping(self):
+        """Una serie mensual del 31 se ajusta a fin de mes y recupera el día 31."""
+        dates = recurrence.to_dates(recurrence.expand(date(2024, 1, 31), 'monthly', date(2024, 5, 31)))
+        self.assertEqual(dates, [
+            date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30), date(2024, 5, 31),
+        ])
+        yearly = recurrence.to_dates(recurrence.expand(date(2024, 2, 29), 'yearly', date(2028, 3, 1)))
+        self.assertEqual(yearly[1], date(2025, 2, 28))
+        self.assertEqual(yearly[-1], date(2028, 2, 29))
+    
+    def test_window_and_next_after(self):
+        """Respeta los límites de la ventana y calcula la siguiente ocurrencia."""
+        dates = recurrence.expand(date(2020, 1, 6), 'biweekly', date(2030, 12, 31), since=date(2030, 1, 1))
+        self.assertEqual(len(dates), 26)
+        self.assertTrue(all((value - dates[0]).astype(int) % 14 == 0 for value in dates))
+        self.assertEqual(
+            recurrence.next_after(date(2025, 1, 31), 'quarterly', date(2025, 4, 30)),
+            date(2025, 7, 31),
+        )
+    
+    def test_expand_series_matches_single_expansion(self):
+        """La expansión conjunta de muchas series coincide con la individual."""
+        series = [
+            RecurringTransaction(
+                frequency=frequency, start_date=start, next_occurrence=start, end_date=end,
+            )
+            for frequency, start, end in [
+                ('monthly', date(2025, 1, 31), None),
+                ('weekly', date(2025, 1, 3), date(2025, 3, 1)),
+                ('yearly', date(2024, 2, 29), None),
+                ('daily', date(2026, 1, 1), None),
+                ('monthly', date(2025, 5, 15), None),
+            ]
+        ]
+        until = date(2027, 12, 31)
+        owners, dates = recurrence.expand_series(series, until)
+        for position, recurring in enumerate(series):
+            self.assertEqual(
+                recurrence.to_dates(dates[owners == position]),
+                recurring.occurrences(until),
+            )
+    
+    def test_calculate_next_occurrence_keeps_schedule(self):
+        """calculate_next_occurrence no salta a hoy ni falla el día 31."""
+        user = User.objects.create_user(username='engineuser', password='testpass123')
+        recurring = RecurringTransaction.objects.create(
+            user=user, name='Arriendo', amount=Decimal('10.00'), transaction_type='expense',
+            frequency='monthly', start_date=date(2020, 1, 31), next_occurrence=date(2020, 2, 29),
+        )
+        self.assertEqual(recurring.calculate_next_occurrence(), date(2020, 3, 31))
+        self.assertEqual(
+            recurring.occurrences(date(2020, 6, 30)),
+            [date(2020, 2, 29), date(2020, 3, 31), date(2020, 4, 30), date(2020, 5, 31), date(2020, 6, 30)],
+        )
+
+
+class ForecastTest(TestCase):
+    """
+    Pruebas de la proyección de flujo de caja.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        cache.clear()
+        self.user = User.objects.create_user(username='forecastuser', password='testpass123')
+        self.category = Category.objects.create(user=self.user, name='Mercado', transaction_type='expense')
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('1000.00'), transaction_type='income', date=date(2024, 6, 5)
+        )
+    
+    def test_projection_from_recurrences_and_history(self):
+        """Combina recurrencias y promedios históricos en la serie diaria y mensual."""
+        RecurringTransaction.objects.create(
+            user=self.user, name='Salario', amount=Decimal('500.00'), transaction_type='income',
+            frequency='monthly', start_date=date(2025, 3, 1), next_occurrence=date(2025, 3, 1),
+        )
+        RecurringTransaction.objects.create(
+            user=self.user, name='Gimnasio', amount=Decimal('10.00'), transaction_type='expense',
+            frequency='weekly', start_date=date(2025, 2, 24), next_occurrence=date(2025, 2, 24),
+        )
+        # Historial de gasto no recurrente: 60 en el mes completo anterior
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('60.00'), transaction_type='expense',
+            date=date(2025, 1, 20), category=self.category,
+        )
+        
+        result = forecast.build_forecast(self.user, months=2, history_months=1, today=date(2025, 2, 28))
+        
+        self.assertEqual(result['start_date'], '2025-03-01')
+        self.assertEqual(result['end_date'], '2025-04-30')
+        self.assertEqual(result['starting_balance'], 940.0)
+        self.assertEqual(len(result['daily']['dates']), 61)
+        self.assertEqual(result['recurring_income'], 1000.0)
+        # Ocurrencia vencida del 24/02 más 9 semanales en marzo-abril
+        self.assertEqual(result['recurring_expense'], 100.0)
+        self.assertEqual(
+            [(row['category'], row['monthly_average']) for row in result['category_averages']],
+            [('Mercado', 60.0)],
+        )
+        self.assertEqual([row['month'] for row in result['monthly']], ['2025-03', '2025-04'])
+        expected_end = 940 + 1000 - 100 - 60 * 12 / 365 * 61
+        self.assertAlmostEqual(result['ending_balance'], expected_end, places=1)
+        self.assertEqual(result['monthly'][-1]['balance'], result['ending_balance'])
+    
+    def test_api_cached_per_data_version(self):
+        """El endpoint se memoiza y se recalcula cuando cambian los datos."""
+        self.client.login(username='forecastuser', password='testpass123')
+        url = reverse('forecast')
+        
+        first = self.client.get(url, {'months': 24})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['months'], 24)
+        with self.assertNumQueries(2):  # sesión y usuario; la proyección sale de la caché
+            self.client.get(url, {'months': 24})
+        
+        RecurringTransaction.objects.create(
+            user=self.user, name='Arriendo', amount=Decimal('300.00'), transaction_type='expense',
+            frequency='monthly', start_date=timezone.now().date(), next_occurrence=timezone.now().date(),
+        )
+        self.assertEqual(self.client.get(url, {'months': 24}).json()['recurring_count'], 1)
+
+
+class TransactionStatsAPITest(TestCase):
+    """
+    Pruebas de las series de gráficos de transaction_stats_api.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='statsuser', password='testpass123')
+        self.client.login(username='statsuser', password='testpass123')
+        self.category = Category.objects.create(
+            user=self.user, name='Peajes', transaction_type='expense', color='#123456'
+        )
+        self.today = timezone.now().date()
+        for days_ago, amount, transaction_type in [(0, '40.00', 'expense'), (0, '100.00', 'income'), (2, '10.00', 'expense')]:
+            Transaction.objects.create(
+                user=self.user, amount=Decimal(amount), transaction_type=transaction_type,
+                date=self.today - timedelta(days=days_ago),
+                category=self.category if transaction_type == 'expense' else None,
+            )
+        self.url = reverse('transactions:transaction_stats_api')
+    
+    def test_monthly_series_and_categories(self):
+        """La serie mensual sale de los acumulados, con ceros en meses vacíos."""
+        with self.assertNumQueries(4):  # sesión, usuario, serie y categorías
+            data = self.client.get(self.url, {'months': 3}).json()
+        
+        self.assertEqual(data['series']['labels'][-1], self.today.strftime('%Y-%m'))
+        self.assertEqual(len(data['series']['labels']), len(data['series']['income']))
+        self.assertIn(0, data['series']['income'])
+        self.assertEqual(data['series']['expense'][-1] + data['series']['expense'][-2], 50.0)
+        self.assertEqual(data['category_data']['expense'][0], {
+            'category': 'Peajes', 'color': '#123456', 'total': 50.0, 'count': 2,
+        })
+        self.assertIn('monthly_data', data)
+    
+    def test_daily_and_weekly_granularity(self):
+        """Las series diarias y semanales agrupan en la base de datos."""
+        daily = self.client.get(self.url, {'granularity': 'day', 'months': 1}).json()
+        self.assertEqual(daily['series']['labels'][-1], self.today.isoformat())
+        self.assertEqual(daily['series']['expense'][-1], 40.0)
+        self.assertEqual(daily['series']['expense'][-3], 10.0)
+        self.assertEqual(daily['series']['balance'][-1], 60.0)
+        
+        weekly = self.client.get(self.url, {'granularity': 'week', 'months': 1}).json()
+        monday = self.today - timedelta(days=self.today.weekday())
+        self.assertEqual(weekly['series']['labels'][-1], monday.isoformat())
+        self.assertEqual(sum(weekly['series']['expense']), 50.0)
+        
+        self.assertEqual(self.client.get(self.url, {'granularity': 'hour'}).status_code, 400)
+
+
+class TransactionSearchTest(TestCase):
+    """
+    Pruebas de la búsqueda de texto completo.
+    """
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        self.user = User.objects.create_user(username='searchuser', password='testpass123')
+        self.client.login(username='searchuser', password='testpass123')
+        self.category = Category.objects.create(user=self.user, name='Cafetería', transaction_type='expense')
+        self.tag = Tag.objects.create(user=self.user, name='vacaciones')
+        self.coffee = Transaction.objects.create(
+            user=self.user, amount=Decimal('3.50'), transaction_type='expense',
+            description='Café con leche', date=date(2025, 3, 1), category=self.category,
+        )
+        self.bakery = Transaction.objects.create(
+            user=self.user, amount=Decimal('8.00'), transaction_type='expense',
+            description='Panadería y cafe para llevar', date=date(2025, 3, 2),
+        )
+        self.hotel = Transaction.objects.create(
+            user=self.user, amount=Decimal('120.00'), transaction_type='expense',
+            description='Hotel', date=date(2025, 3, 3),
+        )
+        self.hotel.tags.add(self.tag)
+    
+    def _search(self, text, user=None):
+        return list(search.search_transactions(Transaction.objects.all(), user or self.user, text))
+    
+    def test_matches_description_category_and_tags(self):
+        """Busca sin distinguir acentos, por prefijo y en categoría y etiquetas."""
+        self.assertEqual(self._search('cafe')[0], self.coffee)
+        self.assertEqual(set(self._search('CAFÉ')), {self.coffee, self.bakery})
+        self.assertEqual(self._search('cafeter'), [self.coffee])
+        self.assertEqual(self._search('vacacion'), [self.hotel])
+        self.assertEqual(self._search('hotel vacaciones'), [self.hotel])
+        self.assertEqual(self._search('"hotel*'), [self.hotel])  # sin inyectar sintaxis FTS
+        
+        other = User.objects.create_user(username='otheruser', password='testpass123')
+        self.assertEqual(self._search('hotel', user=other), [])
+    
+    def test_index_follows_changes(self):
+        """Ediciones, etiquetas, renombres y borrados actualizan el índice."""
+        self.coffee.description = 'Desayuno'
+        self.coffee.save()
+        self.assertEqual(self._search('desayuno'), [self.coffee])
+        
+        self.hotel.tags.remove(self.tag)
+        self.assertEqual(self._search('vacaciones'), [])
+        self.tag.transactions.add(self.bakery)
+        self.assertEqual(self._search('vacaciones'), [self.bakery])
+        self.tag.delete()
+        self.assertEqual(self._search('vacaciones'), [])
+        
+        self.category.name = 'Bar'
+        self.category.save()
+        self.assertEqual(self._search('bar'), [self.coffee])
+        self.category.delete()
+        self.assertEqual(self._search('bar'), [])
+        
+        self.hotel.delete()
+        search.rebuild()
+        self.assertEqual(self._search('hotel'), [])
+    
+    def test_saving_without_rename_skips_reindex(self):
+        """Guardar una categoría o etiqueta sin cambiar el nombre no reindexa sus transacciones."""
+        with mock.patch.object(search, 'index_transactions') as index_mock:
+            self.category.color = '#000000'
+            self.category.save()
+            self.tag.save()
+            self.category.name = 'Bar'
+            self.category.save(update_fields=['color'])
+            self.assertFalse(index_mock.called)
+            
+            self.category.save()
+            self.assertEqual(index_mock.call_count, 1)
+    
+    def test_bulk_import_is_indexed(self):
+        """Las transacciones importadas con bulk_create quedan indexadas."""
+        content = 'Fecha,Tipo,Monto,Descripción,Categoría,Etiquetas\n2025-04-01,Gasto,15,Librería,,lectura\n'
+        importers.import_transactions(self.user, BytesIO(content.encode('utf-8')), 'csv')
+        self.assertEqual([t.description for t in self._search('lectura')], ['Librería'])
+    
+    def test_list_view_and_export_use_search(self):
+        """La lista, la exportación y la API filtran por la búsqueda."""
+        response = self.client.get(reverse('transactions:transaction_list'), {'search': 'cafe'})
+        self.assertEqual(list(response.context['transactions']), [self.coffee, self.bakery])
+        
+        response = self.client.get(reverse('transactions:export_transactions'), {'search': 'vacaciones'})
+        lines = b''.join(response.streaming_content).decode('utf-8').strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Hotel', lines[1])
+        
+        response = self.client.get(reverse('transaction-list'), {'search': 'cafe'})
+        self.assertEqual({item['id'] for item in response.json()['transactions']}, {self.coffee.pk, self.bakery.pk})
+
+
+class SeedAndBenchmarkTest(TestCase):
+    """
+    Pruebas del generador de datos sintéticos y de la suite de benchmark.
+    """
+    
+    # El dashboard consulta servicios externos y los reportes son lentos
+    SKIP = ('dashboard', 'export_excel', 'export_pdf')
+    
+    def test_seed_is_deterministic_and_consistent(self):
+        """La misma semilla genera los mismos datos, con acumulados e índice al día."""
+        first = seeding.seed(users=2, transactions=50, budgets=3, recurring=2, tags=4, seed=7, prefix='a_')
+        second = seeding.seed(users=1, transactions=50, budgets=3, recurring=2, tags=4, seed=7, prefix='b_')
+        self.assertEqual(first['transactions'], 100)
+        self.assertEqual(first['budgets'], 6)
+        self.assertEqual(first['recurring'], 4)
+        
+        user_a, user_b = first['users'][0], second['users'][0]
+        amounts = lambda user: list(
+            Transaction.objects.filter(user=user).order_by('pk').values_list('amount', 'date', 'description')
+        )
+        self.assertEqual(amounts(user_a), amounts(user_b))
+        self.assertEqual(rollups.verify(user_a), [])
+        self.assertTrue(self.client.login(username='a_1', password=seeding.SEED_PASSWORD))
+        self.assertEqual(
+            Transaction.objects.filter(user=user_a, description='Supermercado').count(),
+            len(search.search_transactions(Transaction.objects.all(), user_a, 'supermercado')),
+        )
+    
+    def test_query_counts_do_not_grow_with_rows(self):
+        """Cada endpoint hace la misma cantidad de consultas con 5 y con 300 filas."""
+        # Con la semilla 2 el usuario chico también tiene resultados para la búsqueda del benchmark
+        small = seeding.seed(transactions=5, seed=2, prefix='small_')['users'][0]
+        large = seeding.seed(transactions=300, seed=2, prefix='large_')['users'][0]
+        self.assertTrue(search.search_transactions(Transaction.objects.all(), small, 'super').exists())
+        
+        counts = {}
+        for user in (small, large):
+            results = benchmark.run(user, repeat=1, skip=self.SKIP)
+            for result in results:
+                self.assertEqual(result['status'], 200, result['endpoint'])
+            counts[user.pk] = {result['endpoint']: result['cold_queries'] for result in results}
+        self.assertEqual(counts[small.pk], counts[large.pk])
+
+
+class DefaultCategoriesTest(TestCase):
+    """
+    Pruebas de la creación masiva de categorías por defecto.
+    """
+    
+    def test_signup_creates_defaults(self):
+        """Un usuario nuevo recibe todas las categorías por defecto."""
+        user = User.objects.create_user(username='nuevo', password='testpass123')
+        self.assertEqual(
+            set(Category.objects.filter(user=user, is_default=True).values_list('name', flat=True)),
+            {cat_data['name'] for cat_data in utils.DEFAULT_CATEGORIES},
+        )
+    
+    def test_provisioning_uses_three_queries_for_many_users(self):
+        """Una consulta de existencia, un bulk_create y un conteo, sin importar cuántos usuarios."""
+        users = [User.objects.create_user(username=f'prov{index}') for index in range(5)]
+        Category.objects.filter(user__in=users[1:]).delete()
+        Category.objects.filter(user=users[0], name='Salario').delete()
+        
+        with self.assertNumQueries(3):
+            created = utils.provision_default_categories(users)
+        self.assertEqual(created, 4 * len(utils.DEFAULT_CATEGORIES))
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(utils.provision_default_categories(users), 0)
+    
+    def test_deleted_defaults_are_only_restored_on_request(self):
+        """Una categoría por defecto borrada no reaparece salvo con fill_missing."""
+        user = User.objects.create_user(username='borra')
+        Category.objects.filter(user=user, name='Salario').delete()
+        
+        self.assertEqual(utils.provision_default_categories([user]), 0)
+        self.assertFalse(Category.objects.filter(user=user, name='Salario').exists())
+        
+        self.assertEqual(utils.provision_default_categories([user], fill_missing=True), 1)
+        self.assertTrue(Category.objects.filter(user=user, name='Salario').exists())
+    
+    def test_command_batches_users(self):
+        """El comando completa las categorías de los usuarios que no tienen ninguna."""
+        users = [User.objects.create_user(username=f'cmd{index}') for index in range(3)]
+        Category.objects.filter(user__in=users).delete()
+        
+        out = StringIO()
+        call_command('create_default_categories', '--batch-size', '2', stdout=out)
+        self.assertIn(f'{3 * len(utils.DEFAULT_CATEGORIES)} categorías creadas para 3 usuarios', out.getvalue())
+        self.assertEqual(Category.objects.filter(user__in=users).count(), 3 * len(utils.DEFAULT_CATEGORIES))
+    
+    def test_command_all_skips_users_with_categories(self):
+        """--all no recrea las categorías borradas; --fill-missing sí."""
+        user = User.objects.create_user(username='cmdall')
+        Category.objects.filter(user=user, name='Salario').delete()
+        
+        out = StringIO()
+        call_command('create_default_categories', '--all', stdout=out)
+        self.assertIn('0 categorías creadas', out.getvalue())
+        self.assertFalse(Category.objects.filter(user=user, name='Salario').exists())
+        
+        out = StringIO()
+        call_command('create_default_categories', '--all', '--fill-missing', stdout=out)
+        self.assertIn('1 categorías creadas', out.getvalue())
+        self.assertTrue(Category.objects.filter(user=user, name='Salario').exists())
+
+
+class DatabaseTuningTest(TestCase):
+    """
+    Pruebas de los ajustes por conexión de SQLite.
+    """
+    
+    def test_sqlite_pragmas_applied(self):
+        """Cada conexión SQLite nueva recibe synchronous=NORMAL, busy_timeout y mmap."""
+        from django.db import connection
+        if connection.vendor != 'sqlite':
+            self.skipTest('Solo aplica a SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+
+class StubServiceHandler(BaseHTTPRequestHandler):
+    """
+    Servidor HTTP local que imita wttr.in y exchangerate-api.
+
+    /rates y /weather/<ciudad> responden tras `delay` segundos; /error responde
+    500 y /unavailable 503. Usa HTTP/1.1 para poder reutilizar conexiones.
+    """
+    protocol_version = 'HTTP/1.1'
+    delay = 0
+    paths = []
+    client_ports = []
+    
+    def do_GET(self):
+        StubServiceHandler.paths.append(self.path)
+        StubServiceHandler.client_ports.append(self.client_address[1])
+        time.sleep(self.delay)
+        if self.path.startswith('/rates'):
+            payload = {'base': 'USD', 'rates': {'COP': 4000.5, 'EUR': 0.9}}
+        elif self.path.startswith('/weather/'):
+            payload = {'current_condition': [{
+                'temp_C': '18', 'humidity': '70', 'windspeedKmph': '7',
+                'weatherDesc': [{'value': 'Lluvia ligera'}],
+            }]}
+        else:
+            self.send_response(503 if self.path.startswith('/unavailable') else 500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServerMixin:
+    """
+    Levanta StubServiceHandler en un puerto libre durante la clase de pruebas.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubServiceHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class HangingHandler(socketserver.BaseRequestHandler):
+    """
+    Acepta la conexión y nunca responde (un servicio colgado, no caído).
+    """
+    release = threading.Event()
+    
+    def handle(self):
+        self.release.wait(10)
+
+
+class AsyncExternalServicesTest(StubServerMixin, TestCase):
+    """
+    Pruebas del cliente asíncrono de servicios externos contra un servidor local.
+    """
+    
+    def setUp(self):
+        cache.clear()
+        StubServiceHandler.delay = 0
+        StubServiceHandler.paths = []
+        StubServiceHandler.client_ports = []
+        http_client.reset()
+        async_services.reset()
+        self.addCleanup(async_services.reset)
+        patches = [
+            mock.patch.object(ExchangeRateService, 'BASE_URL', f'{self.base_url}/rates'),
+            mock.patch.object(FreeWeatherService, 'BASE_URL', f'{self.base_url}/weather/{{city}}'),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def fetch(self, **kwargs):
+        from asgiref.sync import async_to_sync
+        return async_to_sync(async_services.fetch_dashboard_data)('Bogota', **kwargs)
+    
+    def test_fetches_both_services_and_caches(self):
+        """Retorna clima y tasas, y los deja en la caché compartida con services.py."""
+        result = self.fetch()
+        self.assertEqual(result['weather_data']['temperature'], 18)
+        self.assertEqual(result['weather_data']['description'], 'Lluvia ligera')
+        self.assertEqual(result['usd_to_cop'], 4000.5)
+        self.assertEqual(FreeWeatherService.get_weather_simple('Bogota'), result['weather_data'])
+        self.assertEqual(ExchangeRateService.get_currency_rate('EUR'), 0.9)
+    
+    def test_calls_run_concurrently(self):
+        """Dos servicios de 0.5 s tardan en total lo que el más lento, no la suma."""
+        self.fetch()  # Calentar httpx (carga de certificados) antes de medir
+        cache.clear()
+        StubServiceHandler.delay = 0.5
+        started = time.perf_counter()
+        result = self.fetch()
+        elapsed = time.perf_counter() - started
+        self.assertEqual(result['usd_to_cop'], 4000.5)
+        self.assertLess(elapsed, 0.9)
+    
+    def test_deadline_returns_defaults(self):
+        """Al vencer el plazo común se cancelan las consultas y se usan los valores por defecto."""
+        StubServiceHandler.delay = 1.5
+        started = time.perf_counter()
+        result = self.fetch(deadline=0.2)
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(result['weather_data'], FreeWeatherService.default_weather('Bogota'))
+        self.assertIsNone(result['exchange_rates'])
+        self.assertIsNone(result['usd_to_cop'])
+    
+    def test_hanging_upstream_counts_as_failure(self):
+        """
+        Un servicio que acepta la conexión y no responde falla por timeout antes
+        del plazo, cuenta en su circuit breaker y no se vuelve a esperar.
+        """
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), HangingHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        HangingHandler.release.clear()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(HangingHandler.release.set)
+        hanging_url = f'http://127.0.0.1:{server.server_address[1]}'
+        
+        with mock.patch.object(ExchangeRateService, 'BASE_URL', f'{hanging_url}/rates'):
+            started = time.perf_counter()
+            result = self.fetch(deadline=0.5)
+            self.assertLess(time.perf_counter() - started, 1.0)
+            self.assertIsNone(result['usd_to_cop'])
+            self.assertEqual(result['weather_data']['temperature'], 18)
+            breaker = http_client.breaker_for(hanging_url)
+            self.assertEqual(breaker.snapshot()['failures'], 1)
+            
+            # El fallo queda en caché: el siguiente render no espera al servicio
+            started = time.perf_counter()
+            self.assertIsNone(self.fetch(deadline=0.5)['usd_to_cop'])
+            self.assertLess(time.perf_counter() - started, 0.2)
+        self.assertEqual(breaker.snapshot()['failures'], 1)
+    
+    def test_cancelled_request_counts_as_failure(self):
+        """Una petición cancelada por el plazo cuenta como fallo del host, no se libera sin más."""
+        import asyncio
+        import httpx
+        
+        async def run():
+            async with httpx.AsyncClient() as client:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(async_services.fetch_json(client, f'{self.base_url}/rates', 5), 0.1)
+        
+        StubServiceHandler.delay = 1
+        from asgiref.sync import async_to_sync
+        async_to_sync(run)()
+        self.assertEqual(http_client.breaker_for(self.base_url).snapshot()['failures'], 1)
+    
+    def test_client_is_shared_between_requests(self):
+        """Las consultas sucesivas en el mismo event loop reutilizan cliente y conexiones."""
+        from asgiref.sync import async_to_sync
+        
+        async def run():
+            client = async_services.get_client()
+            await async_services.fetch_dashboard_data('Bogota')
+            await cache.aclear()
+            await async_services.fetch_dashboard_data('Bogota')
+            self.assertIs(async_services.get_client(), client)
+            await async_services.aclose()
+            self.assertTrue(client.is_closed)
+        
+        async_to_sync(run)()
+        self.assertEqual(len(StubServiceHandler.paths), 4)
+        self.assertEqual(len(set(StubServiceHandler.client_ports)), 2)
+    
+    def test_upstream_error(self):
+        """Un status distinto de 200 no rompe el dashboard y se recuerda como fallo."""
+        with mock.patch.object(ExchangeRateService, 'BASE_URL', f'{self.base_url}/error'):
+            result = self.fetch()
+            self.assertIsNone(self.fetch()['usd_to_cop'])
+        self.assertIsNone(result['usd_to_cop'])
+        self.assertEqual(StubServiceHandler.paths.count('/error'), 1)
+    
+    def test_dashboard_view(self):
+        """El dashboard asíncrono exige sesión y expone los datos externos en el contexto."""
+        response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.status_code, 302)
+        
+        User.objects.create_user(username='asyncdash', password='testpass123')
+        self.client.login(username='asyncdash', password='testpass123')
+        with mock.patch('dashboard.views.WEATHER_CITY', 'Bogota'):
+            response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['weather_data']['city'], 'Bogota')
+        self.assertEqual(response.context['usd_to_cop'], 4000.5)
+
+
+class ServiceCacheTest(TestCase):
+    """
+    Pruebas de la caché stale-while-revalidate de servicios externos.
+    """
+    
+    def setUp(self):
+        cache.clear()
+        service_cache.reset_stats()
+    
+    def test_cancelled_async_fetch_stores_negative_entry(self):
+        """Si el plazo cancela la consulta asíncrona, el fallo se recuerda y no se vuelve a esperar."""
+        import asyncio
+        from asgiref.sync import async_to_sync
+        
+        calls = []
+        
+        async def hanging():
+            calls.append(1)
+            await asyncio.sleep(5)
+        
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(service_cache.aget_or_refresh('hung', hanging, 60, refresh=lambda: None), 0.1)
+            return await service_cache.aget_or_refresh('hung', hanging, 60, refresh=lambda: None)
+        
+        self.assertIsNone(async_to_sync(run)())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(service_cache.stats()['negative'], 1)
+    
+    def test_fresh_value_not_refetched(self):
+        """Mientras el valor está fresco no se vuelve a consultar el servicio."""
+        fetch = mock.Mock(return_value={'a': 1})
+        for _ in range(3):
+            self.assertEqual(service_cache.get_or_refresh('fresh', fetch, 60), {'a': 1})
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(service_cache.stats()['fresh'], 2)
+    
+    def test_stale_value_served_while_refreshing(self):
+        """Un valor vencido se sirve de inmediato y se refresca en segundo plano."""
+        values = iter([1, 2, 3])
+        fetch = mock.Mock(side_effect=lambda: next(values))
+        self.assertEqual(service_cache.get_or_refresh('stale', fetch, 0), 1)
+        self.assertEqual(service_cache.get_or_refresh('stale', fetch, 0), 1)
+        service_cache.wait_for_refreshes(5)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(service_cache.get_or_refresh('stale', fetch, 0), 2)
+        service_cache.wait_for_refreshes(5)
+    
+    def test_single_background_refresh(self):
+        """Con el lock tomado, los demás requests no lanzan otro refresco."""
+        release = threading.Event()
+        fetch = mock.Mock(side_effect=lambda: release.wait(5) and 'nuevo')
+        service_cache.get_or_refresh('single', lambda: 'viejo', 0)
+        for _ in range(5):
+            self.assertEqual(service_cache.get_or_refresh('single', fetch, 0), 'viejo')
+        release.set()
+        service_cache.wait_for_refreshes(5)
+        self.assertEqual(fetch.call_count, 1)
+    
+    def test_failed_refresh_keeps_stale_value(self):
+        """Si el refresco falla se sigue sirviendo el valor anterior."""
+        service_cache.get_or_refresh('keep', lambda: 'viejo', 0)
+        failing = mock.Mock(side_effect=RuntimeError('caído'))
+        self.assertEqual(service_cache.get_or_refresh('keep', failing, 0, negative_timeout=60), 'viejo')
+        service_cache.wait_for_refreshes(5)
+        # Durante negative_timeout el valor anterior cuenta como fresco
+        self.assertEqual(service_cache.get_or_refresh('keep', failing, 0, negative_timeout=60), 'viejo')
+        self.assertEqual(failing.call_count, 1)
+    
+    def test_negative_caching(self):
+        """Un fallo sin valor anterior se recuerda durante negative_timeout."""
+        fetch = mock.Mock(return_value=None)
+        self.assertIsNone(service_cache.get_or_refresh('down', fetch, 60, negative_timeout=0.2))
+        self.assertIsNone(service_cache.get_or_refresh('down', fetch, 60, negative_timeout=0.2))
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(service_cache.stats()['negative'], 1)
+        time.sleep(0.3)
+        service_cache.get_or_refresh('down', fetch, 60, negative_timeout=0.2)
+        self.assertEqual(fetch.call_count, 2)
+    
+    def test_concurrent_misses_fetch_once(self):
+        """Sin entrada, solo quien obtiene el lock consulta el servicio; el resto espera su valor."""
+        def fetch():
+            time.sleep(0.3)
+            return 'valor'
+        fetch_mock = mock.Mock(side_effect=fetch)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service_cache.get_or_refresh('miss', fetch_mock, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['valor'] * 5)
+        self.assertEqual(fetch_mock.call_count, 1)
+
+
+@override_settings(OUTBOUND_RETRY_BACKOFF=0.01, OUTBOUND_CIRCUIT_FAILURE_THRESHOLD=3)
+class HttpClientTest(StubServerMixin, TestCase):
+    """
+    Pruebas del cliente HTTP compartido: pool de conexiones, reintentos y circuit breaker.
+    """
+    
+    def setUp(self):
+        StubServiceHandler.delay = 0
+        StubServiceHandler.paths = []
+        StubServiceHandler.client_ports = []
+        http_client.reset()
+        self.addCleanup(http_client.reset)
+    
+    def test_connections_are_reused(self):
+        """Las peticiones al mismo host reutilizan la conexión keep-alive."""
+        for _ in range(3):
+            self.assertEqual(http_client.get(f'{self.base_url}/rates').status_code, 200)
+        self.assertEqual(len(set(StubServiceHandler.client_ports)), 1)
+    
+    def test_transient_errors_are_retried(self):
+        """Un 503 se reintenta OUTBOUND_RETRIES veces; un 500 no."""
+        response = http_client.get(f'{self.base_url}/unavailable', retries=1)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(StubServiceHandler.paths, ['/unavailable'] * 2)
+        
+        http_client.get(f'{self.base_url}/error')
+        self.assertEqual(StubServiceHandler.paths.count('/error'), 1)
+    
+    def test_read_timeout_is_not_retried(self):
+        """Un host colgado falla una sola vez dentro del timeout, sin reintentos."""
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), HangingHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        HangingHandler.release.clear()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(HangingHandler.release.set)
+        hanging_url = f'http://127.0.0.1:{server.server_address[1]}'
+        
+        started = time.perf_counter()
+        with self.assertRaises(requests.Timeout):
+            http_client.get(f'{hanging_url}/rates', timeout=0.3, retries=2)
+        self.assertLess(time.perf_counter() - started, 0.6)
+        self.assertEqual(http_client.breaker_for(hanging_url).snapshot()['failures'], 1)
+    
+    def test_retries_stop_at_total_timeout(self):
+        """Los reintentos no esperan más allá del timeout total de la llamada."""
+        with mock.patch.object(http_client, 'backoff_delay', return_value=1):
+            started = time.perf_counter()
+            response = http_client.get(f'{self.base_url}/unavailable', timeout=0.5, retries=2)
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(StubServiceHandler.paths, ['/unavailable'])
+    
+    def test_circuit_opens_and_fails_fast(self):
+        """Tras el umbral de fallos seguidos el circuito se abre y no se toca la red."""
+        with self.assertLogs('finance.http_client', level='WARNING'):
+            http_client.get(f'{self.base_url}/unavailable', retries=2)
+        self.assertEqual(len(StubServiceHandler.paths), 3)
+        
+        with self.assertRaises(http_client.CircuitOpenError):
+            http_client.get(f'{self.base_url}/rates')
+        self.assertEqual(len(StubServiceHandler.paths), 3)
+        
+        metrics = http_client.metrics()[0]
+        self.assertEqual(metrics['state'], http_client.OPEN)
+        self.assertEqual(metrics['failures'], 3)
+        self.assertEqual(metrics['rejected'], 1)
+        self.assertEqual(metrics['opened'], 1)
+    
+    @override_settings(OUTBOUND_CIRCUIT_RESET_TIMEOUT=0.1)
+    def test_half_open_trial_closes_circuit(self):
+        """Pasado el reset_timeout, una petición de prueba exitosa cierra el circuito."""
+        http_client.get(f'{self.base_url}/unavailable', retries=2)
+        breaker = http_client.breaker_for(self.base_url)
+        self.assertEqual(breaker.state, http_client.OPEN)
+        time.sleep(0.15)
+        
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, http_client.HALF_OPEN)
+        self.assertFalse(breaker.allow())  # Solo una petición de prueba a la vez
+        breaker.release()
+        
+        self.assertEqual(http_client.get(f'{self.base_url}/rates').status_code, 200)
+        self.assertEqual(breaker.state, http_client.CLOSED)
+    
+    @override_settings(OUTBOUND_CIRCUIT_RESET_TIMEOUT=0.1)
+    def test_half_open_failure_reopens(self):
+        """Si la petición de prueba falla el circuito vuelve a abrirse."""
+        http_client.get(f'{self.base_url}/unavailable', retries=2)
+        time.sleep(0.15)
+        http_client.get(f'{self.base_url}/unavailable', retries=0)
+        self.assertEqual(http_client.metrics()[0]['state'], http_client.OPEN)
+        self.assertEqual(http_client.metrics()[0]['opened'], 2)
+    
+    def test_services_use_breaker(self):
+        """Con el circuito abierto los servicios retornan su valor por defecto sin esperar."""
+        cache.clear()
+        with mock.patch.object(FreeWeatherService, 'BASE_URL', f'{self.base_url}/unavailable/{{city}}'):
+            self.assertEqual(FreeWeatherService.fetch_weather('Cali'), None)
+            started = time.perf_counter()
+            self.assertEqual(
+                FreeWeatherService.get_weather_simple('Cali'), FreeWeatherService.default_weather('Cali')
+            )
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(http_client.metrics()[0]['state'], http_client.OPEN)
+
+
+class CurrencyConversionTest(TestCase):
+    """
+    Pruebas de las monedas y la conversión a la moneda principal.
+    """
+    
+    RATES = {'rates': {'USD': 1, 'COP': 4000, 'EUR': 0.8}}
+    
+    def setUp(self):
+        """Configuración inicial para las pruebas."""
+        cache.clear()
+        self.user = User.objects.create_user(username='currencyuser', password='testpass123')
+        self.category = Category.objects.create(user=self.user, name='Viajes', transaction_type='expense')
+        currency.snapshot_rates(date(2025, 3, 1), data=self.RATES)
+        self.today = date(2025, 3, 15)
+    
+    def tearDown(self):
+        cache.clear()
+    
+    def create(self, amount, code, transaction_type='expense', **kwargs):
+        return Transaction.objects.create(
+            user=self.user, amount=Decimal(amount), currency=code, transaction_type=transaction_type,
+            date=kwargs.pop('date', date(2025, 3, 10)), category=kwargs.pop('category', self.category), **kwargs
+        )
+    
+    def test_snapshot_and_rates_lookup(self):
+        """Guarda las tasas soportadas y usa las de la última fecha no posterior."""
+        self.assertEqual(ExchangeRateSnapshot.objects.count(), 3)
+        currency.snapshot_rates(date(2025, 3, 20), data={'rates': {'COP': 4200, 'XYZ': 5}})
+        
+        rates, rates_date = currency.rates_on(self.today)
+        self.assertEqual(rates_date, date(2025, 3, 1))
+        self.assertEqual(rates['COP'], Decimal('4000'))
+        with self.assertNumQueries(0):  # En caché
+            currency.rates_on(self.today)
+        rates, rates_date = currency.rates_on(date(2025, 3, 25))
+        self.assertEqual((rates_date, rates['COP']), (date(2025, 3, 20), Decimal('4200')))
+        self.assertNotIn('XYZ', rates)
+        self.assertEqual(currency.rates_on(date(2025, 2, 1)), ({'USD': Decimal('1')}, None))
+    
+    def test_snapshot_command(self):
+        """El comando guarda las tasas del servicio y falla si no responde."""
+        with mock.patch.object(ExchangeRateService, 'get_exchange_rates', return_value=self.RATES):
+            call_command('snapshot_exchange_rates', '--date', '2025-03-02', stdout=StringIO())
+        self.assertEqual(ExchangeRateSnapshot.objects.filter(date=date(2025, 3, 2)).count(), 3)
+        with mock.patch.object(ExchangeRateService, 'get_exchange_rates', return_value=None):
+            with self.assertRaises(CommandError):
+                call_command('snapshot_exchange_rates', stdout=StringIO())
+    
+    def test_converter(self):
+        """Convierte montos sueltos y arreglos; sin tasa no inventa un monto."""
+        converter = currency.CurrencyConverter('COP', *currency.rates_on(self.today))
+        self.assertEqual(converter.convert(Decimal('8'), 'EUR'), Decimal('40000.00'))
+        with self.assertLogs('transactions.currency', 'WARNING'):
+            self.assertIsNone(converter.convert(Decimal('5'), 'GBP'))
+        self.assertEqual(converter.missing, {'GBP'})
+        self.assertIn('GBP', converter.unconvertible)
+        self.assertNotIn('EUR', converter.unconvertible)
+        self.assertEqual(converter.cache_tag, 'COP@2025-03-01')
+        self.assertEqual(
+            converter.convert_array([1, 2, 1000, 3], ['USD', 'EUR', 'COP', 'USD']).tolist(),
+            [4000.0, 10000.0, 1000.0, 12000.0],
+        )
+        self.assertTrue(np.isnan(converter.convert_array([5], ['GBP'])[0]))
+        self.create('8', 'EUR')
+        self.create('1', 'USD')
+        self.assertEqual(
+            sorted(converter.convert_queryset(Transaction.objects.filter(user=self.user)).tolist()),
+            [4000.0, 40000.0],
+        )
+    
+    def test_totals_and_rollups_in_home_currency(self):
+        """Los totales convierten cada moneda en la misma consulta agregada."""
+        self.create('100', 'USD', 'income')
+        self.create('40000', 'COP')
+        self.create('8', 'EUR')
+        converter = currency.CurrencyConverter.for_user(self.user, self.today)
+        
+        with self.assertNumQueries(1):
+            totals = Transaction.objects.filter(user=self.user).totals(converter)
+        self.assertEqual(totals['income'], Decimal('400000'))
+        self.assertEqual(totals['expense'], Decimal('80000'))
+        self.assertEqual(MonthlyRollup.objects.filter(user=self.user).totals(converter)['balance'], Decimal('320000'))
+        # Sin conversor se suman las cantidades tal cual
+        self.assertEqual(Transaction.objects.filter(user=self.user).totals()['expense'], Decimal('40008'))
+        
+        # Un acumulado por moneda
+        self.assertEqual(
+            sorted(MonthlyRollup.objects.filter(user=self.user).values_list('currency', flat=True)),
+            ['COP', 'EUR', 'USD'],
+        )
+        expense = Transaction.objects.get(user=self.user, currency='EUR')
+        expense.currency = 'USD'
+        expense.save()
+        self.assertEqual(rollups.verify(self.user), [])
+    
+    def test_amounts_without_rate_are_left_out_of_totals(self):
+        """Un monto sin tasa no se suma a los totales convertidos; se cuenta en 'unconverted'."""
+        self.create('100', 'USD', 'income')
+        self.create('50', 'GBP')
+        converter = currency.CurrencyConverter.for_user(self.user, self.today)
+        
+        with self.assertNumQueries(1):
+            totals = Transaction.objects.filter(user=self.user).totals(converter)
+        self.assertEqual((totals['income'], totals['expense'], totals['unconverted']), (Decimal('400000'), 0, 1))
+        rollup_totals = MonthlyRollup.objects.filter(user=self.user).totals(converter)
+        self.assertEqual((rollup_totals['expense'], rollup_totals['unconverted']), (0, 1))
+        
+        self.client.login(username='currencyuser', password='testpass123')
+        response = self.client.get(reverse('transactions:transaction_list'))
+        self.assertContains(response, 'COP')
+        self.assertContains(response, 'no se incluye')
+    
+    def test_exports_include_currency(self):
+        """El CSV y el Excel muestran la moneda de cada transacción."""
+        self.create('8', 'EUR', description='Hotel')
+        rows = b''.join(
+            line.encode('utf-8') for line in iter_csv(Transaction.objects.filter(user=self.user))
+        ).decode('utf-8').splitlines()
+        self.assertIn('Moneda', rows[0])
+        self.assertIn('8.00,EUR', rows[1])
+        
+        from openpyxl import load_workbook
+        response = ReportGeneratorFactory.get_generator('excel').generate(
+            Transaction.objects.filter(user=self.user), 'reporte',
+            converter=currency.CurrencyConverter.for_user(self.user, self.today),
+        )
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        values = [[cell.value for cell in row] for row in sheet.iter_rows()]
+        self.assertEqual(values[0][4], 'Moneda')
+        self.assertEqual(values[1][4], 'EUR')
+        self.assertIn('TOTAL GASTOS (COP)', [row[2] for row in values])
+    
+    def test_budget_spending_in_budget_currency(self):
+        """El gasto de un presupuesto se expresa en la moneda del presupuesto."""
+        self.create('40000', 'COP')
+        self.create('5', 'USD')
+        budget = Budget.objects.create(
+            user=self.user, category=self.category, amount=Decimal('20'), currency='USD', month=date(2025, 3, 1)
+        )
+        
+        annotated = Budget.objects.filter(pk=budget.pk).with_spending(currency.rates_on(self.today)[0]).get()
+        self.assertEqual(annotated.spent, Decimal('15'))
+        self.assertEqual(Budget.objects.get(pk=budget.pk).spent, Decimal('15'))
+    
+    def test_import_currency_column(self):
+        """La columna Moneda es opcional; sin ella se usa la moneda principal del usuario."""
+        self.user.profile.home_currency = 'EUR'
+        self.user.profile.save()
+        content = (
+            'Fecha,Tipo,Monto,Descripción,Moneda\n'
+            '2025-03-01,Gasto,10,Hotel,usd\n'
+            '2025-03-02,Gasto,20,Tren,\n'
+            '2025-03-03,Gasto,30,Museo,XXX\n'
+        ).encode('utf-8')
+        
+        result = importers.import_transactions(self.user, BytesIO(content), 'csv')
+        
+        self.assertEqual(result['created'], 2)
+        self.assertEqual([error['row'] for error in result['errors']], [4])
+        self.assertEqual(
+            dict(Transaction.objects.filter(user=self.user).values_list('description', 'currency')),
+            {'Hotel': 'USD', 'Tren': 'EUR'},
+        )
+        self.assertEqual(rollups.verify(self.user), [])
+    
+    def test_stats_api_in_home_currency(self):
+        """El API del dashboard reporta los montos en la moneda principal del usuario."""
+        self.user.profile.home_currency = 'USD'
+        self.user.profile.save()
+        today = timezone.now().date()
+        currency.snapshot_rates(today, data=self.RATES)
+        self.create('20000', 'COP', date=today)
+        self.create('10', 'USD', 'income', date=today)
+        self.client.login(username='currencyuser', password='testpass123')
+        
+        data = self.client.get(reverse('dashboard:dashboard_stats_api')).json()
+        
+        self.assertEqual(data['currency'], 'USD')
+        self.assertEqual(data['month_expenses'], 5.0)
+        self.assertEqual(data['month_balance'], 5.0)
+
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """
+    Servidor local que habla el protocolo de Redis (RESP) con los comandos
+    que usa la RedisCache de Django. Guarda los datos en memoria de la clase,
+    compartidos por todas las conexiones, como un Redis real.
+    """
+    store = {}
+    expires = {}
+    lock = threading.Lock()
+    protocol = b'2'
+    
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            with self.lock:
+                self.drop_expired()
+                command = getattr(self, f'cmd_{args[0].decode().lower()}', None)
+                reply = command(*args[1:]) if command else b'-ERR unknown command\r\n'
+            self.wfile.write(reply)
+    
+    @classmethod
+    def reset(cls):
+        with cls.lock:
+            cls.store.clear()
+            cls.expires.clear()
+    
+    @classmethod
+    def ttl(cls, key):
+        """Segundos de vida restantes de la clave que termina en `key` (None si no expira)."""
+        with cls.lock:
+            full_key = next(stored for stored in cls.store if stored.endswith(key.encode()))
+            return cls.expires[full_key] - time.monotonic() if full_key in cls.expires else None
+    
+    def drop_expired(self):
+        now = time.monotonic()
+        for key in [key for key, expires in self.expires.items() if expires <= now]:
+            self.store.pop(key, None)
+            self.expires.pop(key)
+    
+    def null(self):
+        return b'_\r\n' if self.protocol == b'3' else b'$-1\r\n'
+    
+    def bulk(self, value):
+        return self.null() if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+    
+    def cmd_ping(self, *args):
+        return b'+PONG\r\n'
+    
+    def cmd_hello(self, protocol=b'2', *args):
+        # Respuesta mínima del handshake (redis-py 8 negocia RESP3)
+        self.protocol = protocol
+        return b'%%1\r\n$5\r\nproto\r\n:%s\r\n' % protocol
+    
+    def cmd_client(self, *args):
+        return b'+OK\r\n'
+    
+    def cmd_get(self, key):
+        return self.bulk(self.store.get(key))
+    
+    def cmd_mget(self, *keys):
+        return b'*%d\r\n' % len(keys) + b''.join(self.bulk(self.store.get(key)) for key in keys)
+    
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() if not option.isdigit() else option for option in options]
+        if b'NX' in options and key in self.store:
+            return self.null()
+        self.store[key] = value
+        self.expires.pop(key, None)
+        if b'EX' in options:
+            self.expires[key] = time.monotonic() + int(options[options.index(b'EX') + 1])
+        return b'+OK\r\n'
+    
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.store.pop(key, None) is not None:
+                deleted += 1
+            self.expires.pop(key, None)
+        return b':%d\r\n' % deleted
+    
+    def cmd_exists(self, *keys):
+        return b':%d\r\n' % sum(key in self.store for key in keys)
+    
+    def cmd_incrby(self, key, delta):
+        value = int(self.store.get(key, b'0')) + int(delta)
+        self.store[key] = str(value).encode()
+        return b':%d\r\n' % value
+    
+    def cmd_expire(self, key, seconds):
+        if key not in self.store:
+            return b':0\r\n'
+        self.expires[key] = time.monotonic() + int(seconds)
+        return b':1\r\n'
+    
+    def cmd_persist(self, key):
+        return b':%d\r\n' % (self.expires.pop(key, None) is not None)
+    
+    def cmd_flushdb(self, *args):
+        self.store.clear()
+        self.expires.clear()
+        return b'+OK\r\n'
+
+
+class CacheConfigurationTest(TestCase):
+    """
+    Pruebas de la configuración de la caché compartida (finance.caching).
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeRedisHandler)
+        cls.server.daemon_threads = True
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.redis_url = f'redis://127.0.0.1:{cls.server.server_address[1]}/0'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+    
+    def setUp(self):
+        FakeRedisHandler.reset()
+        self.user = User.objects.create_user(username='cacheuser', password='testpass123')
+    
+    def redis_settings(self, **env):
+        return override_settings(CACHES=caching.build_caches({'REDIS_URL': self.redis_url, **env}))
+    
+    def test_backend_from_environment(self):
+        """Elige el backend según CACHE_BACKEND (o REDIS_URL) y aplica versión y prefijo."""
+        self.assertEqual(caching.build_caches({})['default']['BACKEND'], caching.BACKENDS['locmem'])
+        config = caching.build_caches({'REDIS_URL': 'redis://cache:6379/1', 'CACHE_VERSION': '3'})['default']
+        self.assertEqual(config['BACKEND'], caching.BACKENDS['redis'])
+        self.assertEqual(config['LOCATION'], 'redis://cache:6379/1')
+        self.assertEqual(config['VERSION'], 3)
+        config = caching.build_caches({'CACHE_BACKEND': 'database', 'CACHE_KEY_PREFIX': 'staging'})['default']
+        self.assertEqual((config['LOCATION'], config['KEY_PREFIX']), ('finance_cache', 'staging'))
+        config = caching.build_caches({'CACHE_BACKEND': 'file', 'CACHE_LOCATION': '/srv/cache'})['default']
+        self.assertEqual((config['BACKEND'], config['LOCATION']), (caching.BACKENDS['file'], '/srv/cache'))
+        with self.assertRaises(ImproperlyConfigured):
+            caching.build_caches({'CACHE_BACKEND': 'memcached'})
+    
+    def test_namespace_ttls(self):
+        """CACHE_TTL_<NOMBRE> cambia el TTL de un espacio de nombres; 'none' lo deja sin expiración."""
+        ttls = caching.build_ttls({'CACHE_TTL_WEATHER': '900', 'CACHE_TTL_FX_RATES': 'none'})
+        self.assertEqual(ttls['weather'], 900)
+        self.assertIsNone(ttls['fx_rates'])
+        self.assertEqual(ttls['exchange_rates'], caching.TTL_DEFAULTS['exchange_rates'])
+        with override_settings(CACHE_TTLS=ttls):
+            self.assertEqual(caching.ttl('weather', 1800), 900)
+            self.assertEqual(caching.ttl('unknown', 42), 42)
+    
+    def test_redis_cache_shared_between_workers(self):
+        """Con Redis, lo que un worker guarda lo ve otro y el servicio se consulta una sola vez."""
+        fetch = mock.Mock(return_value={'rates': {'COP': 4000}})
+        with self.redis_settings():
+            other_worker = caches.create_connection('default')
+            self.assertEqual(service_cache.get_or_refresh('rates', fetch, 60), {'rates': {'COP': 4000}})
+            self.assertEqual(other_worker.get(f'{service_cache.KEY_PREFIX}:rates')['value'], {'rates': {'COP': 4000}})
+            self.assertEqual(service_cache.get_or_refresh('rates', fetch, 60), {'rates': {'COP': 4000}})
+            
+            # Versiones de datos (incr) y agregados memoizados
+            self.assertEqual(aggregate_cache.memoize(self.user.id, 'total', lambda: 10), 10)
+            aggregate_cache.bump_version(self.user.id)
+            self.assertEqual(aggregate_cache.memoize(self.user.id, 'total', lambda: 20), 20)
+        fetch.assert_called_once()
+        self.assertTrue(any(key.startswith(b':1:finance:svc:rates') for key in FakeRedisHandler.store))
+    
+    def test_cache_version_isolates_entries(self):
+        """Con otro CACHE_VERSION las entradas anteriores quedan inalcanzables."""
+        with self.redis_settings():
+            cache.set('finance:test', 'v1')
+        with self.redis_settings(CACHE_VERSION='2'):
+            self.assertIsNone(cache.get('finance:test'))
+            cache.set('finance:test', 'v2')
+        with self.redis_settings():
+            self.assertEqual(cache.get('finance:test'), 'v1')
+    
+    def test_namespace_ttl_applied(self):
+        """Los módulos guardan sus entradas con el TTL de su espacio de nombres."""
+        with self.redis_settings(), override_settings(CACHE_TTLS={'aggregates': 120, 'fx_rates': 30}):
+            aggregate_cache.memoize(self.user.id, 'total', lambda: 10)
+            currency.rates_on(date(2025, 3, 1))
+        self.assertAlmostEqual(FakeRedisHandler.ttl(':total'), 120, delta=5)
+        self.assertAlmostEqual(FakeRedisHandler.ttl(':2025-03-01'), 30, delta=5)
+    
+    def test_file_backend_shared(self):
+        """La caché en archivos comparte valores y locks entre procesos del mismo host."""
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES=caching.build_caches({'CACHE_BACKEND': 'file', 'CACHE_LOCATION': location})):
+                other_worker = caches.create_connection('default')
+                self.assertTrue(cache.add('finance:lock', 'a', 10))
+                self.assertFalse(other_worker.add('finance:lock', 'b', 10))
+                aggregate_cache.bump_version(self.user.id)
+                self.assertEqual(other_worker.get(aggregate_cache._version_key(self.user.id)),
+                                 aggregate_cache.get_version(self.user.id))
+    
+    def test_database_backend(self):
+        """La caché en base de datos usa la tabla creada con createcachetable."""
+        call_command('createcachetable', 'finance_cache_test', verbosity=0)
+        env = {'CACHE_BACKEND': 'database', 'CACHE_LOCATION': 'finance_cache_test'}
+        with override_settings(CACHES=caching.build_caches(env)):
+            self.assertEqual(aggregate_cache.memoize(self.user.id, 'total', lambda: 7), 7)
+            self.assertEqual(aggregate_cache.memoize(self.user.id, 'total', lambda: 8), 7)
@@ -46,6 +46,7 @@ TRANSLATIONS = {
         
         # Common
         'Save': 'Guardar',
+        'Main Currency': 'Moneda principal',
         'Cancel': 'Cancelar',
         'Delete': 'Eliminar',
         'Edit': 'Editar',
@@ -257,6 +258,7 @@ TRANSLATIONS = {
         
         # Common
         'Save': 'Save',
+        'Main Currency': 'Main Currency',
         'Cancel': 'Cancel',
         'Delete': 'Delete',
         'Edit': 'Edit',
@@ -13,7 +13,11 @@ urlpatterns = [
     
     # Exportación y API
     path('export/', views.export_transactions, name='export_transactions'),
+    path('import/', views.import_transactions, name='transaction_import'),
     path('export/<str:format_type>/', views.export_report, name='export_report'),
+    path('export/<str:format_type>/job/', views.request_report_job, name='request_report_job'),
+    path('reports/jobs/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('reports/jobs/<int:job_id>/download/', views.report_job_download, name='report_job_download'),
     path('api/stats/', views.transaction_stats_api, name='transaction_stats_api'),
     
     # Categorías
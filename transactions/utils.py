@@ -2,59 +2,96 @@
 Utilidades para la aplicación de transacciones.
 """
 from .models import Category
+from . import aggregate_cache
 
+# Categorías de Ingresos
+DEFAULT_INCOME_CATEGORIES = [
+    {'name': 'Salario', 'icon': 'fas fa-briefcase', 'color': '#28a745', 'transaction_type': 'income'},
+    {'name': 'Freelance', 'icon': 'fas fa-laptop-code', 'color': '#17a2b8', 'transaction_type': 'income'},
+    {'name': 'Inversiones', 'icon': 'fas fa-chart-line', 'color': '#ffc107', 'transaction_type': 'income'},
+    {'name': 'Otros Ingresos', 'icon': 'fas fa-money-bill-wave', 'color': '#6c757d', 'transaction_type': 'income'},
+]
 
-def create_default_categories(user):
+# Categorías de Gastos
+DEFAULT_EXPENSE_CATEGORIES = [
+    {'name': 'Alimentación', 'icon': 'fas fa-utensils', 'color': '#dc3545', 'transaction_type': 'expense'},
+    {'name': 'Transporte', 'icon': 'fas fa-car', 'color': '#007bff', 'transaction_type': 'expense'},
+    {'name': 'Vivienda', 'icon': 'fas fa-home', 'color': '#6610f2', 'transaction_type': 'expense'},
+    {'name': 'Servicios', 'icon': 'fas fa-bolt', 'color': '#fd7e14', 'transaction_type': 'expense'},
+    {'name': 'Entretenimiento', 'icon': 'fas fa-film', 'color': '#e83e8c', 'transaction_type': 'expense'},
+    {'name': 'Salud', 'icon': 'fas fa-heartbeat', 'color': '#dc3545', 'transaction_type': 'expense'},
+    {'name': 'Educación', 'icon': 'fas fa-graduation-cap', 'color': '#20c997', 'transaction_type': 'expense'},
+    {'name': 'Ropa', 'icon': 'fas fa-tshirt', 'color': '#6f42c1', 'transaction_type': 'expense'},
+    {'name': 'Otros Gastos', 'icon': 'fas fa-shopping-cart', 'color': '#6c757d', 'transaction_type': 'expense'},
+]
+
+DEFAULT_CATEGORIES = DEFAULT_INCOME_CATEGORIES + DEFAULT_EXPENSE_CATEGORIES
+
+
+def provision_default_categories(users, fill_missing=False):
     """
-    Crea categorías por defecto para un nuevo usuario.
-    
+    Crea las categorías por defecto de varios usuarios.
+
+    Por defecto solo provisiona a los usuarios que no tienen ninguna
+    categoría, así no reaparecen las categorías por defecto que un usuario
+    borró. Con fill_missing=True completa las que le falten a cada usuario.
+
+    Hace una consulta para saber qué usuarios (o categorías) ya existen, un
+    solo bulk_create para el resto (ignore_conflicts cubre altas concurrentes
+    del mismo nombre) y un conteo para saber cuántas se insertaron de verdad.
+
     Args:
-        user: Instancia de User para el cual crear las categorías
+        users: Iterable de instancias de User (o de sus ids)
+        fill_missing: Completar también a usuarios que ya tienen categorías
+
+    Returns:
+        int: Número de categorías creadas
     """
-    # Categorías de Ingresos
-    income_categories = [
-        {'name': 'Salario', 'icon': 'fas fa-briefcase', 'color': '#28a745', 'transaction_type': 'income'},
-        {'name': 'Freelance', 'icon': 'fas fa-laptop-code', 'color': '#17a2b8', 'transaction_type': 'income'},
-        {'name': 'Inversiones', 'icon': 'fas fa-chart-line', 'color': '#ffc107', 'transaction_type': 'income'},
-        {'name': 'Otros Ingresos', 'icon': 'fas fa-money-bill-wave', 'color': '#6c757d', 'transaction_type': 'income'},
-    ]
-    
-    # Categorías de Gastos
-    expense_categories = [
-        {'name': 'Alimentación', 'icon': 'fas fa-utensils', 'color': '#dc3545', 'transaction_type': 'expense'},
-        {'name': 'Transporte', 'icon': 'fas fa-car', 'color': '#007bff', 'transaction_type': 'expense'},
-        {'name': 'Vivienda', 'icon': 'fas fa-home', 'color': '#6610f2', 'transaction_type': 'expense'},
-        {'name': 'Servicios', 'icon': 'fas fa-bolt', 'color': '#fd7e14', 'transaction_type': 'expense'},
-        {'name': 'Entretenimiento', 'icon': 'fas fa-film', 'color': '#e83e8c', 'transaction_type': 'expense'},
-        {'name': 'Salud', 'icon': 'fas fa-heartbeat', 'color': '#dc3545', 'transaction_type': 'expense'},
-        {'name': 'Educación', 'icon': 'fas fa-graduation-cap', 'color': '#20c997', 'transaction_type': 'expense'},
-        {'name': 'Ropa', 'icon': 'fas fa-tshirt', 'color': '#6f42c1', 'transaction_type': 'expense'},
-        {'name': 'Otros Gastos', 'icon': 'fas fa-shopping-cart', 'color': '#6c757d', 'transaction_type': 'expense'},
-    ]
-    
-    # Crear categorías de ingresos
-    for cat_data in income_categories:
-        Category.objects.get_or_create(
-            user=user,
-            name=cat_data['name'],
-            defaults={
-                'transaction_type': cat_data['transaction_type'],
-                'icon': cat_data['icon'],
-                'color': cat_data['color'],
-                'is_default': True,
-            }
+    user_ids = [getattr(user, 'pk', user) for user in users]
+    if not user_ids:
+        return 0
+
+    names = [cat_data['name'] for cat_data in DEFAULT_CATEGORIES]
+    if fill_missing:
+        existing = set(
+            Category.objects.filter(user_id__in=user_ids, name__in=names).values_list('user_id', 'name')
+        )
+    else:
+        with_categories = set(
+            Category.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True).distinct()
         )
-    
-    # Crear categorías de gastos
-    for cat_data in expense_categories:
-        Category.objects.get_or_create(
-            user=user,
+        user_ids = [user_id for user_id in user_ids if user_id not in with_categories]
+        existing = set()
+    missing = [
+        Category(
+            user_id=user_id,
             name=cat_data['name'],
-            defaults={
-                'transaction_type': cat_data['transaction_type'],
-                'icon': cat_data['icon'],
-                'color': cat_data['color'],
-                'is_default': True,
-            }
+            transaction_type=cat_data['transaction_type'],
+            icon=cat_data['icon'],
+            color=cat_data['color'],
+            is_default=True,
         )
+        for user_id in user_ids
+        for cat_data in DEFAULT_CATEGORIES
+        if (user_id, cat_data['name']) not in existing
+    ]
+    if not missing:
+        return 0
+
+    Category.objects.bulk_create(missing, ignore_conflicts=True)
+    # ignore_conflicts omite en silencio las filas en conflicto: contar lo que quedó
+    created = Category.objects.filter(user_id__in=user_ids, name__in=names).count() - len(existing)
+    # bulk_create no dispara señales: invalidar la caché de los usuarios afectados
+    for user_id in {category.user_id for category in missing}:
+        aggregate_cache.bump_version(user_id)
+    return created
+
+
+def create_default_categories(user):
+    """
+    Crea categorías por defecto para un nuevo usuario.
 
+    Args:
+        user: Instancia de User para el cual crear las categorías
+    """
+    return provision_default_categories([user])
@@ -3,20 +3,25 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.db.models import Sum, Q, F
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404
 from django.core.paginator import Paginator
+from django.views.decorators.http import require_POST
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
-import csv
 import json
+import os
 
-from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction
+from .models import Transaction, Category, Tag, Budget, SavingsGoal, RecurringTransaction, MonthlyRollup, ReportJob
+from .rollups import chart_data_from_rollups
+from .currency import CurrencyConverter
+from .exports import iter_csv
+from . import aggregate_cache, importers, report_jobs, scheduler, search
 from .forms import (
     TransactionForm, CategoryForm, TagForm, BudgetForm, 
-    SavingsGoalForm, RecurringTransactionForm
+    SavingsGoalForm, RecurringTransactionForm, TransactionImportForm
 )
 from .services import ExchangeRateService, FreeWeatherService
 # Importar vista externa (se importa al final para evitar dependencias circulares)
@@ -33,13 +38,17 @@ class TransactionListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
+        queryset = (
+            Transaction.objects.filter(user=self.request.user)
+            .select_related('category')
+            .prefetch_related('tags')
+        )
         
         # Filtros
         transaction_type = self.request.GET.get('type')
         date_from = self.request.GET.get('date_from')
         date_to = self.request.GET.get('date_to')
-        search = self.request.GET.get('search')
+        search_text = self.request.GET.get('search')
         
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
@@ -50,8 +59,9 @@ class TransactionListView(LoginRequiredMixin, ListView):
         if date_to:
             queryset = queryset.filter(date__lte=date_to)
         
-        if search:
-            queryset = queryset.filter(description__icontains=search)
+        if search_text:
+            # Descripción, categoría y etiquetas, ordenado por relevancia
+            queryset = search.search_transactions(queryset, self.request.user, search_text)
         
         return queryset
     
@@ -59,22 +69,30 @@ class TransactionListView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['transaction_types'] = Transaction.TRANSACTION_TYPES
         
-        # Estadísticas rápidas
-        total_income = Transaction.objects.filter(
-            user=self.request.user, 
-            transaction_type='income'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        total_expenses = Transaction.objects.filter(
-            user=self.request.user, 
-            transaction_type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Estadísticas rápidas (en caché hasta que cambien los datos del usuario)
+        user = self.request.user
+        converter = CurrencyConverter.for_user(user)
+        total_income, total_expenses, unconverted = aggregate_cache.memoize(
+            user.id, f'transaction_list_totals:{converter.cache_tag}:v2', lambda: self.get_totals(user, converter)
+        )
         
         context['total_income'] = total_income
         context['total_expenses'] = total_expenses
         context['balance'] = total_income - total_expenses
+        context['home_currency'] = converter.target
+        context['unconverted_count'] = unconverted
+        context['unconvertible_currencies'] = converter.unconvertible
         
         return context
+    
+    @staticmethod
+    def get_totals(user, converter=None):
+        """
+        Calcula los totales de ingresos y gastos del usuario en una sola
+        consulta, y cuántas transacciones quedaron fuera por no tener tasa.
+        """
+        totals = Transaction.objects.filter(user=user).totals(converter)
+        return totals['income'], totals['expense'], totals.get('unconverted', 0)
 
 
 class TransactionCreateView(LoginRequiredMixin, CreateView):
@@ -141,19 +159,15 @@ class TransactionDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView)
 def export_transactions(request):
     """
     Vista para exportar transacciones a CSV.
+    La respuesta se genera en streaming para mantener la memoria constante.
     """
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="transacciones.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Fecha', 'Tipo', 'Monto', 'Descripción'])
-    
     # Aplicar filtros si existen
     queryset = Transaction.objects.filter(user=request.user)
     
     transaction_type = request.GET.get('type')
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
+    search_text = request.GET.get('search')
     
     if transaction_type:
         queryset = queryset.filter(transaction_type=transaction_type)
@@ -161,18 +175,47 @@ def export_transactions(request):
         queryset = queryset.filter(date__gte=date_from)
     if date_to:
         queryset = queryset.filter(date__lte=date_to)
+    if search_text:
+        queryset = search.search_transactions(queryset, request.user, search_text)
     
-    for transaction in queryset:
-        writer.writerow([
-            transaction.date.strftime('%d/%m/%Y'),
-            transaction.get_transaction_type_display(),
-            transaction.amount,
-            transaction.description
-        ])
-    
+    response = StreamingHttpResponse(iter_csv(queryset), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="transacciones.csv"'
     return response
 
 
+@login_required
+def import_transactions(request):
+    """
+    Vista para importar transacciones desde un archivo CSV u OFX.
+    Las filas inválidas se listan con su número sin impedir que el resto se importe.
+    """
+    result = None
+    if request.method == 'POST':
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            result = importers.import_transactions(
+                request.user,
+                form.cleaned_data['file'],
+                file_format=form.cleaned_data['file_format'],
+                create_missing=form.cleaned_data['create_missing'],
+            )
+            if result['created']:
+                messages.success(request, f'Se importaron {result["created"]} transacciones.')
+            if result['error_count']:
+                messages.warning(request, f'{result["error_count"]} filas no se pudieron importar.')
+            elif not result['created']:
+                messages.info(request, 'El archivo no contenía transacciones.')
+            if not result['error_count']:
+                return redirect('transactions:transaction_list')
+    else:
+        form = TransactionImportForm()
+
+    return render(request, 'transactions/transaction_import.html', {
+        'form': form,
+        'result': result,
+    })
+
+
 @login_required
 def export_report(request, format_type='pdf'):
     """
@@ -182,22 +225,7 @@ def export_report(request, format_type='pdf'):
     from .report_generators import ReportGeneratorFactory
     
     # Obtener transacciones del usuario con filtros opcionales
-    queryset = Transaction.objects.filter(user=request.user).select_related('category').order_by('-date')
-    
-    # Aplicar filtros si existen
-    transaction_type = request.GET.get('type')
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    category_id = request.GET.get('category')
-    
-    if transaction_type:
-        queryset = queryset.filter(transaction_type=transaction_type)
-    if date_from:
-        queryset = queryset.filter(date__gte=date_from)
-    if date_to:
-        queryset = queryset.filter(date__lte=date_to)
-    if category_id:
-        queryset = queryset.filter(category_id=category_id)
+    queryset = report_jobs.report_queryset(request.user, report_jobs.report_filters(request.GET))
     
     try:
         # Usar Factory para obtener el generador correcto (Inversión de Dependencias)
@@ -208,20 +236,120 @@ def export_report(request, format_type='pdf'):
         filename = f"reporte_transacciones_{timezone.now().strftime('%Y%m%d_%H%M%S')}"
         
         # Generar el reporte
-        return generator.generate(queryset, filename)
+        return generator.generate(queryset, filename, converter=CurrencyConverter.for_user(request.user))
     except ValueError as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect('transactions:transaction_list')
 
 
+@login_required
+@require_POST
+def request_report_job(request, format_type='pdf'):
+    """
+    Encola la generación de un reporte en segundo plano (solo POST, ya que
+    crea un trabajo). Acepta los mismos filtros que export_report y
+    reutiliza un trabajo idéntico si ya está pendiente.
+    """
+    try:
+        job, created = report_jobs.enqueue(request.user, format_type, report_jobs.report_filters(request.POST))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(_report_job_data(job), status=202 if created else 200)
+
+
+@login_required
+def report_job_status(request, job_id):
+    """API para consultar el estado de un trabajo de reporte."""
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+    return JsonResponse(_report_job_data(job))
+
+
+@login_required
+def report_job_download(request, job_id):
+    """Descarga el archivo generado por un trabajo de reporte."""
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+    if job.status != ReportJob.STATUS_DONE or not job.file:
+        raise Http404('El reporte aún no está disponible.')
+    
+    return FileResponse(
+        job.file.open('rb'),
+        as_attachment=True,
+        filename=os.path.basename(job.file.name)
+    )
+
+
+def _report_job_data(job):
+    """Representación JSON de un trabajo de reporte."""
+    data = {
+        'id': job.id,
+        'format': job.format_type,
+        'filters': job.filters,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('transactions:report_job_status', args=[job.id]),
+    }
+    if job.status == ReportJob.STATUS_DONE:
+        data['download_url'] = reverse('transactions:report_job_download', args=[job.id])
+    if job.status == ReportJob.STATUS_FAILED:
+        data['error'] = job.error
+    return data
+
+
+STATS_GRANULARITIES = ('month', 'week', 'day')
+STATS_MAX_MONTHS = 120
+STATS_MAX_SPAN = {
+    'month': timedelta(days=365 * STATS_MAX_MONTHS),
+    'week': timedelta(weeks=260),
+    'day': timedelta(days=366),
+}
+STATS_LABEL_FORMATS = {
+    'month': '%Y-%m',
+    'week': '%Y-%m-%d',
+    'day': '%Y-%m-%d',
+}
+
+
+def iter_periods(start_date, end_date, granularity):
+    """Itera el primer día de cada periodo (día, semana o mes) entre dos fechas."""
+    current = start_date
+    while current <= end_date:
+        yield current
+        if granularity == 'day':
+            current += timedelta(days=1)
+        elif granularity == 'week':
+            current += timedelta(weeks=1)
+        elif current.month == 12:
+            current = current.replace(year=current.year + 1, month=1)
+        else:
+            current = current.replace(month=current.month + 1)
+
+
 @login_required
 def transaction_stats_api(request):
     """
     API para obtener estadísticas de transacciones para gráficos.
+    
+    Parámetros opcionales:
+        period: 'month' (months = meses) o 'year' (months = años)
+        months: tamaño de la ventana (por defecto 6)
+        granularity: 'month', 'week' o 'day' (por defecto 'month')
+    
+    Retorna series listas para graficar (etiquetas y valores alineados, con
+    ceros en los periodos sin movimientos) y el desglose por categoría.
     """
     # Obtener parámetros
     period = request.GET.get('period', 'month')  # month, year
-    months = int(request.GET.get('months', 6))
+    granularity = request.GET.get('granularity', 'month')
+    if granularity not in STATS_GRANULARITIES:
+        return JsonResponse({'error': 'Granularidad no soportada. Use month, week o day.'}, status=400)
+    try:
+        months = int(request.GET.get('months', 6))
+    except (TypeError, ValueError):
+        months = 6
+    months = max(1, min(months, STATS_MAX_MONTHS))
     
     # Calcular fechas
     end_date = timezone.now().date()
@@ -229,29 +357,78 @@ def transaction_stats_api(request):
         start_date = end_date - timedelta(days=30 * months)
     else:  # year
         start_date = end_date - timedelta(days=365 * months)
-    
-    # Obtener datos
-    transactions = Transaction.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=end_date
-    )
-    
-    # Datos para gráfico de línea (ingresos vs gastos por mes)
-    monthly_data = {}
-    for transaction in transactions:
-        month_key = transaction.date.strftime('%Y-%m')
-        if month_key not in monthly_data:
-            monthly_data[month_key] = {'income': 0, 'expense': 0}
-        
-        if transaction.transaction_type == 'income':
-            monthly_data[month_key]['income'] += float(transaction.amount)
-        else:
-            monthly_data[month_key]['expense'] += float(transaction.amount)
-    
-    return JsonResponse({
-        'monthly_data': monthly_data,
-    })
+    # Limitar la cantidad de puntos de las series finas
+    start_date = max(start_date, end_date - STATS_MAX_SPAN[granularity])
+    
+    # Montos en la moneda principal del usuario
+    converter = CurrencyConverter.for_user(request.user)
+    
+    if granularity == 'month':
+        start_date = start_date.replace(day=1)
+        # Meses completos: se leen de los acumulados mensuales
+        rollups = MonthlyRollup.objects.filter(
+            user=request.user,
+            month__gte=start_date,
+            month__lte=end_date
+        )
+        chart_data = chart_data_from_rollups(rollups, converter)
+        monthly_data = chart_data['monthly_data']
+        buckets = {
+            datetime.strptime(key, '%Y-%m').date(): (values['income'], values['expense'])
+            for key, values in monthly_data.items()
+        }
+        category_rows = (
+            rollups.order_by()
+            .values('category__name', 'category__color', 'transaction_type')
+            .annotate(total=Sum(converter.expression('total')), count=Sum('count'))
+            .order_by('transaction_type', '-total')
+        )
+    else:
+        if granularity == 'week':
+            start_date -= timedelta(days=start_date.weekday())
+        transactions = Transaction.objects.filter(
+            user=request.user,
+            date__gte=start_date,
+            date__lte=end_date
+        )
+        buckets = {
+            row['period']: (float(row['income']), float(row['expense']))
+            for row in transactions.bucketed_totals(granularity, converter)
+        }
+        category_rows = transactions.category_totals(converter)
+    
+    labels, income, expense = [], [], []
+    for bucket in iter_periods(start_date, end_date, granularity):
+        bucket_income, bucket_expense = buckets.get(bucket, (0, 0))
+        labels.append(bucket.strftime(STATS_LABEL_FORMATS[granularity]))
+        income.append(bucket_income)
+        expense.append(bucket_expense)
+    
+    categories = {'income': [], 'expense': []}
+    for row in category_rows:
+        categories[row['transaction_type']].append({
+            'category': row['category__name'] or 'Sin categoría',
+            'color': row['category__color'] or '#6c757d',
+            'total': float(row['total']),
+            'count': row['count'],
+        })
+    
+    response = {
+        'granularity': granularity,
+        'currency': converter.target,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'series': {
+            'labels': labels,
+            'income': income,
+            'expense': expense,
+            'balance': [round(i - e, 2) for i, e in zip(income, expense)],
+        },
+        'category_data': categories,
+    }
+    if granularity == 'month':
+        response['monthly_data'] = monthly_data
+    return JsonResponse(response)
 
 
 # ========== VISTAS PARA CATEGORÍAS ==========
@@ -375,7 +552,7 @@ class BudgetListView(LoginRequiredMixin, ListView):
     context_object_name = 'budgets'
     
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user).select_related('category').order_by('-month', 'category__name')
+        return Budget.objects.filter(user=self.request.user).select_related('category').with_spending().order_by('-month', 'category__name')
 
 
 class BudgetCreateView(LoginRequiredMixin, CreateView):
@@ -503,6 +680,8 @@ def add_to_savings_goal(request, goal_id):
                 SavingsGoal.objects.filter(id=goal_id).update(
                     current_amount=F('current_amount') + amount
                 )
+                # update() no dispara señales: invalidar la caché de agregados
+                aggregate_cache.bump_version(request.user.id)
                 # Refrescar el objeto desde la base de datos
                 goal.refresh_from_db()
                 
@@ -595,12 +774,25 @@ class RecurringTransactionDeleteView(LoginRequiredMixin, UserPassesTestMixin, De
 
 @login_required
 def process_recurring_transactions(request, recurring_id):
-    """Vista para procesar manualmente una transacción recurrente."""
+    """
+    Vista para procesar manualmente una transacción recurrente.
+    Registra de una vez todas las ocurrencias pendientes hasta hoy.
+    """
     recurring = get_object_or_404(RecurringTransaction, id=recurring_id, user=request.user)
     
     if recurring.is_active and recurring.next_occurrence <= timezone.now().date():
-        transaction = recurring.create_transaction()
-        messages.success(request, f'Transacción "{transaction.description}" creada exitosamente.')
+        result = scheduler.process_due(queryset=RecurringTransaction.objects.filter(pk=recurring.pk))
+        if result['failed']:
+            messages.error(
+                request,
+                f'No se pudieron registrar las ocurrencias de "{recurring.name}": '
+                'alguna de ellas ya existe.'
+            )
+        else:
+            messages.success(
+                request,
+                f'Se crearon {result["transactions"]} transacciones de "{recurring.name}".'
+            )
     else:
         messages.warning(request, 'Esta transacción recurrente no está lista para ser procesada.')
     